@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Sequence
+
+from ..config import CALENDAR_BACKEND
+from ..engine.bazi import GANZHI_INDEX, Pillars
+from . import sxtwl_adapter, table_calendar
+
+__all__ = [
+    "CalendarBackend",
+    "active_calendar_backend",
+    "cross_check",
+    "next_jieqi_datetime",
+    "pillar_indices_from_solar",
+    "pillars_from_lunar",
+    "pillars_from_solar",
+    "prev_jieqi_datetime",
+    "register_calendar_backend",
+    "use_calendar_backend",
+    "warm_calendar_tables",
+]
+
+
+@dataclass(frozen=True)
+class CalendarBackend:
+    name: str
+    pillars_from_solar: Callable[[int, int, int, int], Pillars]
+    pillars_from_lunar: Callable[[int, int, int, int, bool], Pillars]
+    next_jieqi_datetime: Callable[[datetime], datetime]
+    prev_jieqi_datetime: Callable[[datetime], datetime]
+
+
+SXTWL_BACKEND = CalendarBackend(
+    name="sxtwl",
+    pillars_from_solar=sxtwl_adapter.pillars_from_solar,
+    pillars_from_lunar=sxtwl_adapter.pillars_from_lunar,
+    next_jieqi_datetime=sxtwl_adapter.next_jieqi_datetime,
+    prev_jieqi_datetime=sxtwl_adapter.prev_jieqi_datetime,
+)
+
+TABLE_BACKEND = CalendarBackend(
+    name="table",
+    pillars_from_solar=table_calendar.pillars_from_solar,
+    pillars_from_lunar=table_calendar.pillars_from_lunar,
+    next_jieqi_datetime=sxtwl_adapter.next_jieqi_datetime,
+    prev_jieqi_datetime=sxtwl_adapter.prev_jieqi_datetime,
+)
+
+_BACKENDS = {backend.name: backend for backend in (SXTWL_BACKEND, TABLE_BACKEND)}
+_active_name = CALENDAR_BACKEND
+
+
+def register_calendar_backend(backend: CalendarBackend) -> None:
+    # 注册额外的日历后端（如基准测试中不依赖 sxtwl 的桩实现）。
+    _BACKENDS[backend.name] = backend
+
+
+def use_calendar_backend(name: str) -> str:
+    # 切换当前进程使用的日历后端，返回切换前的名称以便恢复。
+    global _active_name
+    if name != "crosscheck" and name not in _BACKENDS:
+        raise RuntimeError(f"未知日历后端：{name}")
+    previous, _active_name = _active_name, name
+    return previous
+
+
+def active_calendar_backend() -> str:
+    return _active_name
+
+
+def _backend() -> CalendarBackend:
+    backend = _BACKENDS.get("sxtwl" if _active_name == "crosscheck" else _active_name)
+    if backend is None:
+        raise RuntimeError(f"未知日历后端：{_active_name}")
+    return backend
+
+
+def _ensure_agree(fast: Pillars, reference: Pillars, where: str) -> None:
+    if fast != reference:
+        raise RuntimeError(f"日历后端校验失败（{where}）：table={fast}，sxtwl={reference}")
+
+
+def pillars_from_solar(year: int, month: int, day: int, hour: int) -> Pillars:
+    if _active_name == "crosscheck":
+        reference = SXTWL_BACKEND.pillars_from_solar(year, month, day, hour)
+        fast = TABLE_BACKEND.pillars_from_solar(year, month, day, hour)
+        _ensure_agree(fast, reference, f"公历 {year:04d}-{month:02d}-{day:02d} {hour:02d} 时")
+        return reference
+    return _backend().pillars_from_solar(year, month, day, hour)
+
+
+def pillar_indices_from_solar(year: int, month: int, day: int, hour: int) -> tuple[int, int, int, int]:
+    # 返回 (年, 月, 日, 时) 六十甲子序号，table 后端可直接得到序号而无需构造 Pillar。
+    if _active_name == "table":
+        indices = table_calendar.pillar_indices_from_solar(year, month, day, hour)
+        if indices is not None:
+            return indices
+    pillars = pillars_from_solar(year, month, day, hour)
+    return (
+        GANZHI_INDEX[(pillars.year.stem, pillars.year.branch)],
+        GANZHI_INDEX[(pillars.month.stem, pillars.month.branch)],
+        GANZHI_INDEX[(pillars.day.stem, pillars.day.branch)],
+        GANZHI_INDEX[(pillars.hour.stem, pillars.hour.branch)],
+    )
+
+
+def pillars_from_lunar(year: int, month: int, day: int, hour: int, is_leap: bool) -> Pillars:
+    if _active_name == "crosscheck":
+        reference = SXTWL_BACKEND.pillars_from_lunar(year, month, day, hour, is_leap)
+        fast = TABLE_BACKEND.pillars_from_lunar(year, month, day, hour, is_leap)
+        _ensure_agree(fast, reference, f"农历 {year:04d}-{month:02d}-{day:02d} {hour:02d} 时")
+        return reference
+    return _backend().pillars_from_lunar(year, month, day, hour, is_leap)
+
+
+def next_jieqi_datetime(dt: datetime) -> datetime:
+    return _backend().next_jieqi_datetime(dt)
+
+
+def prev_jieqi_datetime(dt: datetime) -> datetime:
+    return _backend().prev_jieqi_datetime(dt)
+
+
+def warm_calendar_tables() -> None:
+    # 预先构建节气表与节边界（惰性缓存），供进程启动时调用。
+    sxtwl_adapter.jieqi_table()
+    table_calendar.jie_boundaries()
+
+
+def cross_check(start: date, end: date, hours: Sequence[int] = tuple(range(24))) -> list[str]:
+    # 逐日比较 table 与 sxtwl 两个后端，返回不一致的时间点描述。
+    mismatches = []
+    cursor = start
+    while cursor <= end:
+        for hour in hours:
+            fast = TABLE_BACKEND.pillars_from_solar(cursor.year, cursor.month, cursor.day, hour)
+            reference = SXTWL_BACKEND.pillars_from_solar(cursor.year, cursor.month, cursor.day, hour)
+            if fast != reference:
+                mismatches.append(f"{cursor.isoformat()} {hour:02d} 时：table={fast}，sxtwl={reference}")
+        cursor += timedelta(days=1)
+    return mismatches
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="校验 table 与 sxtwl 日历后端的四柱结果是否一致。")
+    parser.add_argument("start", type=date.fromisoformat, help="起始公历日期，如 1900-02-04")
+    parser.add_argument("end", type=date.fromisoformat, help="结束公历日期（含）")
+    parser.add_argument("--hours", type=int, nargs="*", default=list(range(24)), help="需要校验的小时")
+    args = parser.parse_args(argv)
+    mismatches = cross_check(args.start, args.end, args.hours)
+    for line in mismatches:
+        print(line)
+    print(f"不一致 {len(mismatches)} 处。")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+from ..config import CALENDAR_FILE_PATH, JIEQI_TABLE_END_YEAR, JIEQI_TABLE_START_YEAR
+
+# 文件布局（小端）：64 字节文件头，随后依次为
+#   节气时刻 int64[n_jieqi]、节日期序数 int32[n_jie]、
+#   节气序号 uint8[n_jieqi]、节起年柱序号 uint8[n_jie]、节起月柱序号 uint8[n_jie]。
+# 宽字段在前，各数组均按自身宽度对齐，可直接在映射内存上按类型读取。
+# 日柱、时柱由公历序数算术得出，不入文件。
+_MAGIC = b"TSHCAL\x00\x00"
+# 文件格式或节边界校准逻辑变化时递增，旧文件随之失效。
+CALENDAR_FILE_VERSION = 1
+# 魔数、格式版本、起止年份、节气条数、节条数、SHA-256（覆盖摘要以外的文件头与全部数据）。
+_HEADER = struct.Struct("<8sIiiII32s")
+_HEADER_SIZE = 64
+
+
+@dataclass(frozen=True)
+class CalendarData:
+    jieqi_seconds: Sequence[int]
+    jieqi_indices: Sequence[int]
+    jie_ordinals: Sequence[int]
+    jie_year_indices: Sequence[int]
+    jie_month_indices: Sequence[int]
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _digest(header_fields: bytes, payload: bytes | memoryview) -> bytes:
+    digest = hashlib.sha256(header_fields)
+    digest.update(payload)
+    return digest.digest()
+
+
+def write_calendar_file(path: Path, data: CalendarData, start_year: int, end_year: int) -> None:
+    n_jieqi = len(data.jieqi_seconds)
+    n_jie = len(data.jie_ordinals)
+    if len(data.jieqi_indices) != n_jieqi or not len(data.jie_year_indices) == len(data.jie_month_indices) == n_jie:
+        raise ValueError("日历数据各列长度不一致。")
+    payload = b"".join(
+        (
+            _little_endian(array("q", data.jieqi_seconds)),
+            _little_endian(array("i", data.jie_ordinals)),
+            bytes(data.jieqi_indices),
+            bytes(data.jie_year_indices),
+            bytes(data.jie_month_indices),
+        )
+    )
+    fields = _HEADER.pack(_MAGIC, CALENDAR_FILE_VERSION, start_year, end_year, n_jieqi, n_jie, bytes(32))[:-32]
+    header = fields + _digest(fields, payload)
+    # 先写临时文件再原地替换，已映射旧文件的进程不受影响。
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_bytes(header.ljust(_HEADER_SIZE, b"\x00") + payload)
+    temp_path.replace(path)
+
+
+def _verified_counts(view: memoryview, start_year: int, end_year: int) -> Optional[tuple[int, int]]:
+    # 文件头、长度与校验和均符合时返回（节气条数, 节条数），否则返回 None。
+    if len(view) < _HEADER_SIZE:
+        return None
+    magic, version, file_start, file_end, n_jieqi, n_jie, checksum = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != CALENDAR_FILE_VERSION or (file_start, file_end) != (start_year, end_year):
+        return None
+    if len(view) != _HEADER_SIZE + n_jieqi * 9 + n_jie * 6:
+        return None
+    if _digest(bytes(view[: _HEADER.size - 32]), view[_HEADER_SIZE:]) != checksum:
+        return None
+    return n_jieqi, n_jie
+
+
+def load_calendar_file(
+    path: Path,
+    start_year: int = JIEQI_TABLE_START_YEAR,
+    end_year: int = JIEQI_TABLE_END_YEAR,
+) -> Optional[CalendarData]:
+    # 返回直接引用映射内存的只读视图；文件缺失、版本或年份范围不符、校验和不匹配时返回 None。
+    if sys.byteorder != "little":
+        return None
+    try:
+        with open(path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    view = memoryview(mapped)
+    counts = None
+    try:
+        counts = _verified_counts(view, start_year, end_year)
+    finally:
+        if counts is None:
+            # 拒绝时关闭映射及其持有的文件描述符（该函数在每个 worker 导入时执行）；须先释放导出的视图。
+            view.release()
+            mapped.close()
+    if counts is None:
+        return None
+    n_jieqi, n_jie = counts
+    offset = _HEADER_SIZE
+
+    def take(count: int, typecode: str, width: int) -> memoryview:
+        nonlocal offset
+        column = view[offset : offset + count * width].cast(typecode)
+        offset += count * width
+        return column
+
+    return CalendarData(
+        jieqi_seconds=take(n_jieqi, "q", 8),
+        jie_ordinals=take(n_jie, "i", 4),
+        jieqi_indices=take(n_jieqi, "B", 1),
+        jie_year_indices=take(n_jie, "B", 1),
+        jie_month_indices=take(n_jie, "B", 1),
+    )
+
+
+# 导入时映射一次；同一文件在多个 worker 进程间共享物理页。
+_MAPPED = load_calendar_file(CALENDAR_FILE_PATH)
+
+
+def mapped_calendar() -> Optional[CalendarData]:
+    return _MAPPED
+
+
+def build_calendar_data() -> CalendarData:
+    # 直接由 sxtwl 构建，不经过已映射的文件。
+    from . import sxtwl_adapter, table_calendar
+
+    table = sxtwl_adapter.build_jieqi_table()
+    bounds = table_calendar.build_jie_boundaries(table)
+    return CalendarData(
+        jieqi_seconds=table.seconds,
+        jieqi_indices=table.indices,
+        jie_ordinals=bounds.ordinals,
+        jie_year_indices=bounds.year_indices,
+        jie_month_indices=bounds.month_indices,
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="生成供各 worker 进程 mmap 共享的预计算日历文件。")
+    parser.add_argument("--output", type=Path, default=CALENDAR_FILE_PATH, help="输出文件路径")
+    parser.add_argument("--check", action="store_true", help="只校验已有文件能否被当前配置加载")
+    args = parser.parse_args(argv)
+    if args.check:
+        data = load_calendar_file(args.output)
+        if data is None:
+            print(f"{args.output} 缺失、已过期或校验失败。")
+            return 1
+        print(f"{args.output} 有效：节气 {len(data.jieqi_seconds)} 条，节 {len(data.jie_ordinals)} 条。")
+        return 0
+    data = build_calendar_data()
+    write_calendar_file(args.output, data, JIEQI_TABLE_START_YEAR, JIEQI_TABLE_END_YEAR)
+    print(
+        f"已写入 {args.output}（{JIEQI_TABLE_START_YEAR}–{JIEQI_TABLE_END_YEAR} 年，"
+        f"节气 {len(data.jieqi_seconds)} 条，节 {len(data.jie_ordinals)} 条）。"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Sequence
 
-from ..config import CHINA_TZ
+from ..config import CHINA_TZ, JIEQI_TABLE_END_YEAR, JIEQI_TABLE_START_YEAR
 from ..engine.bazi import Pillar, Pillars
 from ..engine.constants import BRANCHES, STEMS
+from ..metrics import count_sxtwl_call, stage_timer
+from .calendar_file import mapped_calendar
 
 
 @dataclass(frozen=True)
@@ -14,6 +18,17 @@ class GanzhiPillars:
     pillars: Pillars
 
 
+@dataclass(frozen=True)
+class JieqiTable:
+    # 节气精确时刻（北京时间墙上时间，1970-01-01 起的秒数），升序排列。
+    seconds: Sequence[int]
+    # 与 seconds 对应的 sxtwl 节气序号（0=冬至，3=立春，奇数为“节”）。
+    indices: Sequence[int]
+
+
+_WALL_EPOCH = datetime(1970, 1, 1)
+
+
 def _require_sxtwl():
     try:
         import sxtwl
@@ -33,6 +48,7 @@ def _gz_to_pillar(gz) -> Pillar:
 
 def pillars_from_solar(year: int, month: int, day: int, hour: int) -> Pillars:
     sxtwl = _require_sxtwl()
+    count_sxtwl_call("pillars_from_solar")
     solar_day = sxtwl.fromSolar(year, month, day)
     year_gz = solar_day.getYearGZ()
     month_gz = solar_day.getMonthGZ()
@@ -48,6 +64,7 @@ def pillars_from_solar(year: int, month: int, day: int, hour: int) -> Pillars:
 
 def pillars_from_lunar(year: int, month: int, day: int, hour: int, is_leap: bool) -> Pillars:
     sxtwl = _require_sxtwl()
+    count_sxtwl_call("pillars_from_lunar")
     lunar_day = sxtwl.fromLunar(year, month, day, is_leap)
     year_gz = lunar_day.getYearGZ()
     month_gz = lunar_day.getMonthGZ()
@@ -61,15 +78,14 @@ def pillars_from_lunar(year: int, month: int, day: int, hour: int, is_leap: bool
     )
 
 
-def _jieqi_datetime_for_day(sxtwl, year: int, month: int, day: int) -> Optional[datetime]:
-    solar_day = sxtwl.fromSolar(year, month, day)
-    if hasattr(solar_day, "hasJieQi") and not solar_day.hasJieQi():
-        return None
-    if hasattr(solar_day, "getJieQi") and solar_day.getJieQi() < 0:
-        return None
-    if not hasattr(solar_day, "getJieQiJD"):
-        raise RuntimeError("sxtwl 未提供节气精确时间接口，无法计算起运。")
-    jd = solar_day.getJieQiJD()
+def lunar_to_solar(year: int, month: int, day: int, is_leap: bool) -> tuple[int, int, int]:
+    sxtwl = _require_sxtwl()
+    count_sxtwl_call("lunar_to_solar")
+    lunar_day = sxtwl.fromLunar(year, month, day, is_leap)
+    return lunar_day.getSolarYear(), lunar_day.getSolarMonth(), lunar_day.getSolarDay()
+
+
+def _jd_to_datetime(sxtwl, jd: float) -> datetime:
     dd = sxtwl.JD2DD(jd)
     if isinstance(dd, tuple):
         year, month, day, hour, minute, second = dd[:6]
@@ -95,10 +111,63 @@ def _jieqi_datetime_for_day(sxtwl, year: int, month: int, day: int) -> Optional[
     )
 
 
-def next_jieqi_datetime(dt: datetime) -> datetime:
-    sxtwl = _require_sxtwl()
+def _jieqi_datetime_for_day(sxtwl, year: int, month: int, day: int) -> Optional[datetime]:
+    count_sxtwl_call("jieqi_for_day")
+    solar_day = sxtwl.fromSolar(year, month, day)
+    if hasattr(solar_day, "hasJieQi") and not solar_day.hasJieQi():
+        return None
+    if hasattr(solar_day, "getJieQi") and solar_day.getJieQi() < 0:
+        return None
+    if not hasattr(solar_day, "getJieQiJD"):
+        raise RuntimeError("sxtwl 未提供节气精确时间接口，无法计算起运。")
+    return _jd_to_datetime(sxtwl, solar_day.getJieQiJD())
+
+
+def _wall_seconds(dt: datetime) -> tuple[int, bool]:
+    # 与逐日扫描一致：按北京时间墙上时间比较；第二项表示是否带有不足一秒的部分。
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=CHINA_TZ)
+    elif dt.tzinfo is not CHINA_TZ:
+        dt = dt.astimezone(CHINA_TZ)
+    delta = dt.replace(tzinfo=None) - _WALL_EPOCH
+    return delta.days * 86400 + delta.seconds, delta.microseconds > 0
+
+
+def _wall_datetime(seconds: int) -> datetime:
+    return (_WALL_EPOCH + timedelta(seconds=seconds)).replace(tzinfo=CHINA_TZ)
+
+
+@stage_timer("jieqi_table_build")
+def build_jieqi_table() -> JieqiTable:
+    # 按年批量读取节气，覆盖 [JIEQI_TABLE_START_YEAR 立春, JIEQI_TABLE_END_YEAR + 1 立春]。
+    sxtwl = _require_sxtwl()
+    seconds: list[int] = []
+    indices: list[int] = []
+    if not hasattr(sxtwl, "getJieQiByYear"):
+        return JieqiTable(seconds=seconds, indices=indices)
+    for year in range(JIEQI_TABLE_START_YEAR, JIEQI_TABLE_END_YEAR + 1):
+        count_sxtwl_call("jieqi_by_year")
+        for info in sxtwl.getJieQiByYear(year):
+            wall, _ = _wall_seconds(_jd_to_datetime(sxtwl, info.jd))
+            if seconds and wall <= seconds[-1]:
+                continue
+            seconds.append(wall)
+            indices.append(int(info.jqIndex))
+    return JieqiTable(seconds=seconds, indices=indices)
+
+
+@lru_cache(maxsize=1)
+def jieqi_table() -> JieqiTable:
+    # 优先使用 mmap 映射的预计算日历文件，否则首次使用时由 sxtwl 构建。
+    mapped = mapped_calendar()
+    if mapped is not None:
+        return JieqiTable(seconds=mapped.jieqi_seconds, indices=mapped.jieqi_indices)
+    return build_jieqi_table()
+
+
+@stage_timer("jieqi_scan")
+def _scan_next_jieqi_datetime(dt: datetime) -> datetime:
+    sxtwl = _require_sxtwl()
     cursor = dt.date()
     for _ in range(400):
         jieqi_dt = _jieqi_datetime_for_day(sxtwl, cursor.year, cursor.month, cursor.day)
@@ -108,10 +177,9 @@ def next_jieqi_datetime(dt: datetime) -> datetime:
     raise RuntimeError("无法定位下一个节气，请检查 sxtwl 可用性。")
 
 
-def prev_jieqi_datetime(dt: datetime) -> datetime:
+@stage_timer("jieqi_scan")
+def _scan_prev_jieqi_datetime(dt: datetime) -> datetime:
     sxtwl = _require_sxtwl()
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=CHINA_TZ)
     cursor = dt.date()
     for _ in range(400):
         jieqi_dt = _jieqi_datetime_for_day(sxtwl, cursor.year, cursor.month, cursor.day)
@@ -119,3 +187,26 @@ def prev_jieqi_datetime(dt: datetime) -> datetime:
             return jieqi_dt
         cursor -= timedelta(days=1)
     raise RuntimeError("无法定位上一个节气，请检查 sxtwl 可用性。")
+
+
+def next_jieqi_datetime(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=CHINA_TZ)
+    table = jieqi_table()
+    wall, fractional = _wall_seconds(dt)
+    idx = bisect_left(table.seconds, wall + 1 if fractional else wall)
+    # 表首之前可能还有未收录的节气，只有前方存在表项时才能直接采用。
+    if 0 < idx < len(table.seconds):
+        return _wall_datetime(table.seconds[idx])
+    return _scan_next_jieqi_datetime(dt)
+
+
+def prev_jieqi_datetime(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=CHINA_TZ)
+    table = jieqi_table()
+    wall, _ = _wall_seconds(dt)
+    idx = bisect_right(table.seconds, wall) - 1
+    if 0 <= idx < len(table.seconds) - 1:
+        return _wall_datetime(table.seconds[idx])
+    return _scan_prev_jieqi_datetime(dt)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from ..engine.bazi import GANZHI_CYCLE, GANZHI_INDEX, Pillars
+from ..engine.constants import BRANCHES, STEMS
+from . import sxtwl_adapter
+from .calendar_file import mapped_calendar
+from .sxtwl_adapter import JieqiTable, jieqi_table
+
+# 公历序数 + 1721425 为儒略日数；(儒略日数 + 49) % 60 为日柱六十甲子序号（0=甲子）。
+_DAY_CYCLE_SHIFT = (1721425 + 49) % 60
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_LICHUN = 3
+_MIDNIGHT_MARGIN_SECONDS = 3600
+
+
+def _hour_indices(day_stem: int) -> list[int]:
+    # 五鼠遁：甲己日起甲子时；23 时属次日子时，时干按次日日干推（与 sxtwl getHourGZ 一致）。
+    indices = []
+    for hour in range(24):
+        branch = (hour + 1) // 2 % 12
+        stem_base = (day_stem + (1 if hour == 23 else 0)) % 5 * 2
+        indices.append(GANZHI_INDEX[(STEMS[(stem_base + branch) % 10], BRANCHES[branch])])
+    return indices
+
+
+_HOUR_INDICES = [_hour_indices(day_stem) for day_stem in range(10)]
+
+
+@dataclass(frozen=True)
+class JieBoundaries:
+    # 每个“节”所在日期（公历序数），以及当日起生效的年柱、月柱六十甲子序号。
+    ordinals: Sequence[int]
+    year_indices: Sequence[int]
+    month_indices: Sequence[int]
+
+
+def _calibrated_ordinal(ordinal: int, seconds: int, month_index: int) -> int:
+    # 节气交接在子夜前后时，sxtwl 月柱的切换日可能与节气日期相差一天，以 sxtwl 月柱为准。
+    time_of_day = seconds % 86400
+    if _MIDNIGHT_MARGIN_SECONDS <= time_of_day <= 86400 - _MIDNIGHT_MARGIN_SECONDS:
+        return ordinal
+    for candidate in (ordinal - 1, ordinal, ordinal + 1):
+        day = date.fromordinal(candidate)
+        month = sxtwl_adapter.pillars_from_solar(day.year, day.month, day.day, 12).month
+        if GANZHI_INDEX[(month.stem, month.branch)] == month_index:
+            return candidate
+    return ordinal
+
+
+def build_jie_boundaries(table: JieqiTable) -> JieBoundaries:
+    # sxtwl 的年柱、月柱按“节”所在日期整日切换，此处保持同样的日粒度。
+    ordinals: list[int] = []
+    year_indices: list[int] = []
+    month_indices: list[int] = []
+    year_index: Optional[int] = None
+    month_index = 0
+    for seconds, jieqi in zip(table.seconds, table.indices):
+        if jieqi % 2 == 0:
+            continue
+        ordinal = _EPOCH_ORDINAL + seconds // 86400
+        if jieqi == _LICHUN:
+            # 五虎遁：甲己之年丙作首，立春起寅月。
+            year_index = (date.fromordinal(ordinal).year - 4) % 60
+            month_index = GANZHI_INDEX[(STEMS[(year_index % 5 * 2 + 2) % 10], BRANCHES[2])]
+        elif year_index is None:
+            continue
+        else:
+            month_index = (month_index + 1) % 60
+        ordinals.append(_calibrated_ordinal(ordinal, seconds, month_index))
+        year_indices.append(year_index)
+        month_indices.append(month_index)
+    return JieBoundaries(ordinals=ordinals, year_indices=year_indices, month_indices=month_indices)
+
+
+@lru_cache(maxsize=1)
+def jie_boundaries() -> JieBoundaries:
+    # 预计算日历文件中已含校准后的节边界，可省去启动时逐个节气调用 sxtwl 校准。
+    mapped = mapped_calendar()
+    if mapped is not None:
+        return JieBoundaries(
+            ordinals=mapped.jie_ordinals,
+            year_indices=mapped.jie_year_indices,
+            month_indices=mapped.jie_month_indices,
+        )
+    return build_jie_boundaries(jieqi_table())
+
+
+def day_index(year: int, month: int, day: int) -> int:
+    return (date(year, month, day).toordinal() + _DAY_CYCLE_SHIFT) % 60
+
+
+def hour_index(day_idx: int, hour: int) -> int:
+    return _HOUR_INDICES[day_idx % 10][hour]
+
+
+def pillar_indices_from_solar(year: int, month: int, day: int, hour: int) -> Optional[tuple[int, int, int, int]]:
+    # 返回 (年, 月, 日, 时) 六十甲子序号；超出节气表覆盖范围时返回 None。
+    bounds = jie_boundaries()
+    ordinal = date(year, month, day).toordinal()
+    idx = bisect_right(bounds.ordinals, ordinal) - 1
+    if not 0 <= idx < len(bounds.ordinals) - 1:
+        return None
+    day_idx = (ordinal + _DAY_CYCLE_SHIFT) % 60
+    return (
+        bounds.year_indices[idx],
+        bounds.month_indices[idx],
+        day_idx,
+        hour_index(day_idx, hour),
+    )
+
+
+def pillars_from_indices(indices: tuple[int, int, int, int]) -> Pillars:
+    year_idx, month_idx, day_idx, hour_idx = indices
+    return Pillars(
+        year=GANZHI_CYCLE[year_idx],
+        month=GANZHI_CYCLE[month_idx],
+        day=GANZHI_CYCLE[day_idx],
+        hour=GANZHI_CYCLE[hour_idx],
+    )
+
+
+def pillars_from_solar(year: int, month: int, day: int, hour: int) -> Pillars:
+    indices = pillar_indices_from_solar(year, month, day, hour)
+    if indices is None:
+        return sxtwl_adapter.pillars_from_solar(year, month, day, hour)
+    return pillars_from_indices(indices)
+
+
+def pillars_from_lunar(year: int, month: int, day: int, hour: int, is_leap: bool) -> Pillars:
+    # 农历换算公历仍依赖 sxtwl，仅在出生信息处调用一次。
+    solar_year, solar_month, solar_day = sxtwl_adapter.lunar_to_solar(year, month, day, is_leap)
+    return pillars_from_solar(solar_year, solar_month, solar_day, hour)
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+from .adapters.calendar import (
+    CalendarBackend,
+    next_jieqi_datetime,
+    pillars_from_solar,
+    prev_jieqi_datetime,
+    register_calendar_backend,
+    use_calendar_backend,
+    warm_calendar_tables,
+)
+from .adapters.table_calendar import day_index, hour_index, pillars_from_indices
+from .config import BENCHMARK_REGRESSION_THRESHOLD, CHINA_TZ, HIDDEN_STEM_WEIGHT, STEM_WEIGHT
+from .engine.bazi import GANZHI_CYCLE, GANZHI_INDEX, compute_bazi_profile
+from .engine.constants import BRANCHES, STEMS
+from .engine.scoring import score_pillar
+from .models import BehaviorRequest, HeatmapRequest
+from .services.analysis_service import (
+    build_behavior_response,
+    clear_natal_cache,
+    compute_heatmap_payload,
+)
+
+BASELINE_VERSION = 1
+DEFAULT_BASELINE_PATH = Path(__file__).resolve().parent.parent / "benchmark_baseline.json"
+
+# 固定语料：覆盖公历/农历、男女、子夜前后与立春附近的出生时刻。
+CORPUS = (
+    {"gender": "male", "calendar": "solar", "birth_date": "1958-03-12", "birth_time": "06:20:00"},
+    {"gender": "female", "calendar": "solar", "birth_date": "1966-11-30", "birth_time": "23:40:00"},
+    {"gender": "male", "calendar": "lunar", "birth_date": "1973-07-15", "birth_time": "12:00:00"},
+    {"gender": "female", "calendar": "solar", "birth_date": "1981-02-04", "birth_time": "04:10:00"},
+    {"gender": "male", "calendar": "solar", "birth_date": "1987-09-08", "birth_time": "00:30:00"},
+    {"gender": "female", "calendar": "lunar", "birth_date": "1992-01-01", "birth_time": "18:45:00"},
+    {"gender": "male", "calendar": "solar", "birth_date": "1999-12-31", "birth_time": "21:05:00"},
+    {"gender": "female", "calendar": "solar", "birth_date": "2004-06-21", "birth_time": "09:55:00"},
+)
+
+_VIEW_ARGS = {
+    "year": {"year": 2026},
+    "month": {"year": 2026},
+    "day": {"year": 2026, "month": 2},
+    "hour": {"year": 2026, "month": 2, "day": 4},
+}
+
+_JIEQI_PROBES = tuple(
+    datetime(1950, 1, 1, tzinfo=CHINA_TZ) + timedelta(days=days, hours=days % 24) for days in range(0, 36500, 151)
+)
+
+# 桩日历：节气取常见的固定日期（零点交接），四柱按节气日与算术推得，不依赖 sxtwl。
+# 仅用于基准测试的可重复计时，结果与真实历法存在偏差。
+_STUB_JIE_DAYS = (6, 4, 6, 5, 6, 6, 7, 8, 8, 8, 7, 7)
+_STUB_QI_DAYS = (20, 19, 21, 20, 21, 21, 23, 23, 23, 23, 22, 22)
+
+
+def _stub_pillars_from_solar(year: int, month: int, day: int, hour: int):
+    after_jie = day >= _STUB_JIE_DAYS[month - 1]
+    jie_year = year if (month, after_jie) >= (2, True) else year - 1
+    year_idx = (jie_year - 4) % 60
+    branch = month % 12 if after_jie else (month - 1) % 12
+    # 五虎遁：甲己之年丙作首，立春起寅月。
+    stem = (year_idx % 5 * 2 + 2 + (branch - 2) % 12) % 10
+    month_idx = GANZHI_INDEX[(STEMS[stem], BRANCHES[branch])]
+    day_idx = day_index(year, month, day)
+    return pillars_from_indices((year_idx, month_idx, day_idx, hour_index(day_idx, hour)))
+
+
+def _stub_pillars_from_lunar(year: int, month: int, day: int, hour: int, is_leap: bool):
+    solar = date(year, month, 1) + timedelta(days=day - 1)
+    return _stub_pillars_from_solar(solar.year, solar.month, solar.day, hour)
+
+
+@lru_cache(maxsize=None)
+def _stub_jieqi_datetimes(year: int) -> tuple[datetime, ...]:
+    moments = []
+    for candidate in (year - 1, year, year + 1):
+        for month in range(1, 13):
+            for day in (_STUB_JIE_DAYS[month - 1], _STUB_QI_DAYS[month - 1]):
+                moments.append(datetime(candidate, month, day, tzinfo=CHINA_TZ))
+    return tuple(sorted(moments))
+
+
+def _stub_next_jieqi_datetime(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=CHINA_TZ)
+    return next(moment for moment in _stub_jieqi_datetimes(dt.year) if moment >= dt)
+
+
+def _stub_prev_jieqi_datetime(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=CHINA_TZ)
+    return [moment for moment in _stub_jieqi_datetimes(dt.year) if moment <= dt][-1]
+
+
+STUB_BACKEND = CalendarBackend(
+    name="stub",
+    pillars_from_solar=_stub_pillars_from_solar,
+    pillars_from_lunar=_stub_pillars_from_lunar,
+    next_jieqi_datetime=_stub_next_jieqi_datetime,
+    prev_jieqi_datetime=_stub_prev_jieqi_datetime,
+)
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    name: str
+    # 执行一轮并返回本轮的操作次数，用于折算单次耗时。
+    run: Callable[[], int]
+
+
+@dataclass(frozen=True)
+class CaseResult:
+    name: str
+    ops: int
+    rounds: int
+    median_us: float
+    min_us: float
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "ops": self.ops,
+            "rounds": self.rounds,
+            "median_us": round(self.median_us, 3),
+            "min_us": round(self.min_us, 3),
+        }
+
+
+def _heatmap_case(view: str) -> BenchmarkCase:
+    requests = [HeatmapRequest(birth=birth, view=view, **_VIEW_ARGS[view]) for birth in CORPUS]
+
+    def run() -> int:
+        # 直接走未缓存的计算路径，否则第二轮起测到的只是缓存命中。
+        for request in requests:
+            compute_heatmap_payload(request)
+        return len(requests)
+
+    return BenchmarkCase(name=f"heatmap_{view}", run=run)
+
+
+def _behavior_case(cold: bool) -> BenchmarkCase:
+    requests = [BehaviorRequest(birth=birth, focus_datetime="2026-05-20T10:00:00") for birth in CORPUS]
+
+    def run() -> int:
+        # cold 每轮清空命盘缓存，计入四柱换算、命盘、起运与本命基准的完整开销。
+        if cold:
+            clear_natal_cache()
+        for request in requests:
+            build_behavior_response(request)
+        return len(requests)
+
+    return BenchmarkCase(name="behavior_cold" if cold else "behavior", run=run)
+
+
+def _corpus_pillars() -> list:
+    pillars = []
+    for birth in CORPUS:
+        birth_date = date.fromisoformat(birth["birth_date"])
+        hour = int(birth["birth_time"][:2])
+        pillars.append(pillars_from_solar(birth_date.year, birth_date.month, birth_date.day, hour))
+    return pillars
+
+
+def _profile_case() -> BenchmarkCase:
+    corpus_pillars = _corpus_pillars()
+
+    def run() -> int:
+        for pillars in corpus_pillars:
+            compute_bazi_profile(pillars, STEM_WEIGHT, HIDDEN_STEM_WEIGHT)
+        return len(corpus_pillars)
+
+    return BenchmarkCase(name="compute_bazi_profile", run=run)
+
+
+def _score_pillar_case() -> BenchmarkCase:
+    profiles = [compute_bazi_profile(pillars, STEM_WEIGHT, HIDDEN_STEM_WEIGHT) for pillars in _corpus_pillars()]
+
+    def run() -> int:
+        for profile in profiles:
+            for pillar in GANZHI_CYCLE:
+                score_pillar(profile, pillar)
+        return len(profiles) * len(GANZHI_CYCLE)
+
+    return BenchmarkCase(name="score_pillar", run=run)
+
+
+def _jieqi_case(name: str, fn: Callable[[datetime], datetime]) -> BenchmarkCase:
+    def run() -> int:
+        for probe in _JIEQI_PROBES:
+            fn(probe)
+        return len(_JIEQI_PROBES)
+
+    return BenchmarkCase(name=name, run=run)
+
+
+def benchmark_cases() -> list[BenchmarkCase]:
+    return [
+        *(_heatmap_case(view) for view in ("year", "month", "day", "hour")),
+        _behavior_case(cold=False),
+        _behavior_case(cold=True),
+        _profile_case(),
+        _score_pillar_case(),
+        _jieqi_case("next_jieqi_datetime", next_jieqi_datetime),
+        _jieqi_case("prev_jieqi_datetime", prev_jieqi_datetime),
+    ]
+
+
+def time_case(case: BenchmarkCase, rounds: int) -> CaseResult:
+    # 先跑一轮预热（惰性表、评分缓存），再按轮计时，取单次操作耗时的中位数与最小值。
+    case.run()
+    per_op = []
+    ops = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        ops = case.run()
+        per_op.append((time.perf_counter() - started) / max(1, ops) * 1e6)
+    return CaseResult(
+        name=case.name,
+        ops=ops,
+        rounds=rounds,
+        median_us=statistics.median(per_op),
+        min_us=min(per_op),
+    )
+
+
+def run_benchmarks(calendar: str, rounds: int, names: Optional[Sequence[str]] = None) -> list[CaseResult]:
+    register_calendar_backend(STUB_BACKEND)
+    previous = use_calendar_backend(calendar)
+    # 命盘缓存中的结果依赖日历后端，切换前后都需清空。
+    clear_natal_cache()
+    try:
+        if calendar != "stub":
+            warm_calendar_tables()
+        cases = [case for case in benchmark_cases() if not names or case.name in names]
+        return [time_case(case, rounds) for case in cases]
+    finally:
+        use_calendar_backend(previous)
+        clear_natal_cache()
+
+
+def load_baseline(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {"version": BASELINE_VERSION, "runs": {}}
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"基线文件版本不匹配：{path}")
+    return baseline
+
+
+def save_baseline(path: Path, calendar: str, results: Sequence[CaseResult]) -> None:
+    # 按日历后端分别记录，同一文件可同时保存 sxtwl、table 与 stub 的基线。
+    baseline = load_baseline(path)
+    baseline["runs"][calendar] = {
+        "recorded_at": datetime.now(CHINA_TZ).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {result.name: result.as_dict() for result in results},
+    }
+    path.write_text(json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def find_regressions(
+    results: Sequence[CaseResult],
+    baseline_cases: dict[str, Any],
+    threshold: float,
+) -> list[str]:
+    regressions = []
+    for result in results:
+        reference = baseline_cases.get(result.name)
+        if reference is None:
+            continue
+        limit = reference["median_us"] * (1 + threshold)
+        if result.median_us > limit:
+            regressions.append(
+                f"{result.name}：{result.median_us:.1f}µs > 基线 {reference['median_us']:.1f}µs × {1 + threshold:.2f}"
+            )
+    return regressions
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="分析引擎与服务层基准测试，可与 JSON 基线比较并在性能回退时失败。")
+    parser.add_argument("--calendar", choices=("table", "sxtwl", "stub"), default="table", help="使用的日历后端")
+    parser.add_argument("--rounds", type=int, default=5, help="每个用例的计时轮数")
+    parser.add_argument("--cases", nargs="*", help="只运行指定名称的用例")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE_PATH, help="JSON 基线文件路径")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=BENCHMARK_REGRESSION_THRESHOLD,
+        help="允许的中位耗时增幅（0.25 表示 25%%）",
+    )
+    parser.add_argument("--save", action="store_true", help="将本次结果写入基线文件（覆盖同一日历后端的记录）")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.calendar, args.rounds, args.cases)
+    baseline_cases = load_baseline(args.baseline)["runs"].get(args.calendar, {}).get("cases", {})
+    for result in results:
+        reference = baseline_cases.get(result.name)
+        compared = f"（基线 {reference['median_us']:.1f}µs）" if reference else ""
+        print(f"{result.name:<24} 中位 {result.median_us:>10.1f}µs  最小 {result.min_us:>10.1f}µs  ×{result.ops}{compared}")
+
+    if args.save:
+        save_baseline(args.baseline, args.calendar, results)
+        print(f"已写入基线：{args.baseline}（{args.calendar}）")
+        return 0
+    # 缺少基线时无从比较，门禁按失败处理，避免未录基线的环境静默通过。
+    missing = [result.name for result in results if result.name not in baseline_cases]
+    if missing:
+        print(f"基线 {args.baseline} 中没有 {args.calendar} 后端的以下用例：{'、'.join(missing)}；请先用 --save 在参考环境录入基线。")
+        return 2
+    regressions = find_regressions(results, baseline_cases, args.threshold)
+    for line in regressions:
+        print(f"性能回退：{line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
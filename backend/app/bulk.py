@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+
+from pydantic import ValidationError
+
+from .config import CONFIG_VERSION
+from .engine.ten_gods import TEN_GODS
+from .engine.vectorized import LAYERS, require_numpy
+from .models import BirthInput
+from .services.analysis_service import (
+    BirthInfo,
+    ViewSpec,
+    ViewTimeline,
+    columnar_heatmap_payload,
+    normalize_birth,
+    view_timeline,
+)
+from .services.calibration_table import calibration_table
+
+CHECKPOINT_NAME = "_checkpoint.json"
+# 检查点格式或输出列变化时递增，旧目录不再续跑。
+CHECKPOINT_VERSION = 1
+# Parquet 输出攒够该行数（出生信息 × 格子）再写一个行组，内存占用与块大小无关。
+_ROW_GROUP_ROWS = 65536
+_INPUT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+_OUTPUT_SUFFIXES = {"parquet": ".parquet", "csv": ".csv"}
+# 输出列：行号与可选 id 之后为格子字段，十神评分与各层柱序号各占一列。
+_TEN_GOD_COLUMNS = tuple(f"ten_god_{god}" for god in TEN_GODS)
+_PILLAR_COLUMNS = tuple(f"pillar_{layer}" for layer in LAYERS)
+_COLUMNS = ("row", "id", "label", "iso_datetime", "value", *_TEN_GOD_COLUMNS, *_PILLAR_COLUMNS)
+
+
+@dataclass(frozen=True)
+class _UnreadableRow:
+    # JSONL 中无法解析为对象的行：占用一个行号并记入错误文件，不中断任务。
+    line: int
+    error: str
+
+
+@dataclass(frozen=True)
+class BulkJob:
+    # 决定输出内容的全部参数；续跑时与检查点中的记录逐项比较。
+    input_path: str
+    spec: ViewSpec
+    normalization: str
+    chunk_size: int
+    output_format: str
+    id_column: str
+
+    def fingerprint(self) -> dict:
+        spec = {name: value.isoformat() if isinstance(value, datetime) else value for name, value in asdict(self.spec).items()}
+        return {
+            "checkpoint_version": CHECKPOINT_VERSION,
+            "config_version": CONFIG_VERSION,
+            "input_path": self.input_path,
+            "spec": spec,
+            "normalization": self.normalization,
+            "chunk_size": self.chunk_size,
+            "output_format": self.output_format,
+            "id_column": self.id_column,
+        }
+
+
+def require_parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+
+        return pyarrow, pyarrow.parquet
+    except Exception as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("pyarrow 未安装或不可用，无法读写 Parquet。") from exc
+
+
+def _input_format(path: Path, declared: Optional[str]) -> str:
+    if declared:
+        return declared
+    try:
+        return _INPUT_FORMATS[path.suffix.lower()]
+    except KeyError:
+        raise ValueError(f"无法从扩展名判断输入格式：{path.name}，请用 --input-format 指定") from None
+
+
+def _read_rows(path: Path, input_format: str, batch_size: int) -> Iterator[dict | _UnreadableRow]:
+    # 逐行（Parquet 按批）读取，不把整个输入载入内存。
+    if input_format == "csv":
+        with open(path, newline="", encoding="utf-8") as handle:
+            yield from csv.DictReader(handle)
+    elif input_format == "jsonl":
+        with open(path, encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield _UnreadableRow(line_number, f"第 {line_number} 行不是有效的 JSON：{exc.msg}（第 {exc.colno} 列）")
+                    continue
+                if not isinstance(record, dict):
+                    yield _UnreadableRow(line_number, f"第 {line_number} 行应为 JSON 对象")
+                    continue
+                yield record
+    else:
+        _, parquet = require_parquet()
+        for batch in parquet.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+
+
+def _chunks(rows: Iterator[dict | _UnreadableRow], size: int) -> Iterator[tuple[int, list[tuple[int, dict | _UnreadableRow]]]]:
+    numbered = enumerate(rows)
+    index = 0
+    while True:
+        chunk = list(islice(numbered, size))
+        if not chunk:
+            return
+        yield index, chunk
+        index += 1
+
+
+def _parse_birth(row: dict, id_column: str) -> BirthInfo:
+    # CSV 中的空单元格视为未提供（如 is_leap_month 取默认值）。
+    fields = {name: value for name, value in row.items() if name != id_column and value not in ("", None)}
+    return normalize_birth(BirthInput.model_validate(fields))
+
+
+@lru_cache(maxsize=4)
+def _timeline(spec: ViewSpec, normalization: str) -> ViewTimeline:
+    # 同一任务的所有块共用一条时间线，每个进程只解析一次。
+    return view_timeline(spec, normalization)
+
+
+def _part_path(output_dir: Path, chunk_index: int, suffix: str) -> Path:
+    return output_dir / f"part-{chunk_index:06d}{suffix}"
+
+
+class _PartWriter:
+    # 逐个出生信息追加格子，按输出格式流式写入临时文件，commit 时原子改名。
+
+    def __init__(self, path: Path, output_format: str) -> None:
+        self.path = path
+        self.output_format = output_format
+        self._temp_path = path.with_name(path.name + ".tmp")
+        self._pending: list[Any] = []
+        self._pending_rows = 0
+        if output_format == "parquet":
+            self._pa, parquet = require_parquet()
+            self._schema = self._pa.schema(
+                [
+                    ("row", self._pa.int64()),
+                    ("id", self._pa.string()),
+                    ("label", self._pa.string()),
+                    ("iso_datetime", self._pa.string()),
+                    ("value", self._pa.float64()),
+                    *((name, self._pa.int8()) for name in _TEN_GOD_COLUMNS),
+                    *((name, self._pa.uint8()) for name in _PILLAR_COLUMNS),
+                ]
+            )
+            self._writer = parquet.ParquetWriter(str(self._temp_path), self._schema)
+        else:
+            self._handle = open(self._temp_path, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._handle)
+            self._csv.writerow(_COLUMNS)
+
+    def add(self, row: int, row_id: Optional[str], columns: dict) -> None:
+        count = len(columns["values"])
+        if self.output_format == "csv":
+            pillar_columns = [columns["pillar_indices"][layer] for layer in LAYERS]
+            for position in range(count):
+                self._csv.writerow(
+                    (
+                        row,
+                        row_id,
+                        columns["labels"][position],
+                        columns["iso_datetimes"][position],
+                        columns["values"][position],
+                        *columns["ten_god_scores"][position],
+                        *(pillars[position] for pillars in pillar_columns),
+                    )
+                )
+            return
+        np = require_numpy()
+        pa = self._pa
+        scores = np.asarray(columns["ten_god_scores"], dtype=np.int8).reshape(count, len(TEN_GODS))
+        arrays = [
+            pa.array(np.full(count, row, dtype=np.int64)),
+            pa.array([row_id] * count, type=pa.string()),
+            pa.array(columns["labels"], type=pa.string()),
+            pa.array(columns["iso_datetimes"], type=pa.string()),
+            pa.array(np.asarray(columns["values"], dtype=np.float64)),
+            *(pa.array(scores[:, column]) for column in range(len(TEN_GODS))),
+            *(pa.array(np.asarray(columns["pillar_indices"][layer], dtype=np.uint8)) for layer in LAYERS),
+        ]
+        self._pending.append(pa.record_batch(arrays, schema=self._schema))
+        self._pending_rows += count
+        if self._pending_rows >= _ROW_GROUP_ROWS:
+            self._flush()
+
+    def commit(self) -> None:
+        if self.output_format == "csv":
+            self._handle.close()
+        else:
+            self._flush()
+            self._writer.close()
+        self._temp_path.replace(self.path)
+
+    def abort(self) -> None:
+        if self.output_format == "csv":
+            self._handle.close()
+        else:
+            self._writer.close()
+        self._temp_path.unlink(missing_ok=True)
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._writer.write_table(self._pa.Table.from_batches(self._pending, schema=self._schema))
+            self._pending = []
+            self._pending_rows = 0
+
+
+def evaluate_chunk(job: BulkJob, output_dir: Path, chunk_index: int, rows: list[tuple[int, dict | _UnreadableRow]]) -> dict:
+    # 在子进程中计算一个块并直接写出分片，只向主进程回传计数，避免大块结果跨进程传输。
+    timeline = _timeline(job.spec, job.normalization)
+    writer = _PartWriter(_part_path(output_dir, chunk_index, _OUTPUT_SUFFIXES[job.output_format]), job.output_format)
+    errors = []
+    cells = 0
+    try:
+        for row, fields in rows:
+            if isinstance(fields, _UnreadableRow):
+                errors.append({"row": row, "line": fields.line, "id": None, "error": fields.error})
+                continue
+            row_id = fields.get(job.id_column)
+            row_id = None if row_id in ("", None) else str(row_id)
+            try:
+                payload = columnar_heatmap_payload(_parse_birth(fields, job.id_column), timeline, job.normalization)
+            except (ValidationError, ValueError, RuntimeError) as exc:
+                errors.append({"row": row, "id": row_id, "error": str(exc)})
+                continue
+            writer.add(row, row_id, payload)
+            cells += len(payload["values"])
+        # 错误文件先于数据分片落盘：分片存在即表示整块已完成。
+        errors_path = _part_path(output_dir, chunk_index, ".errors.jsonl")
+        if errors:
+            temp_path = errors_path.with_name(errors_path.name + ".tmp")
+            temp_path.write_text("".join(json.dumps(error, ensure_ascii=False) + "\n" for error in errors), encoding="utf-8")
+            temp_path.replace(errors_path)
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    return {"chunk": chunk_index, "rows": len(rows), "cells": cells, "errors": len(errors)}
+
+
+def _load_checkpoint(output_dir: Path, job: BulkJob) -> dict:
+    path = output_dir / CHECKPOINT_NAME
+    if not path.exists():
+        return {"job": job.fingerprint(), "completed": [], "rows": 0, "cells": 0, "errors": 0}
+    checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    if checkpoint.get("job") != job.fingerprint():
+        raise ValueError(f"{output_dir} 中的检查点与当前任务参数或配置版本不符，请更换输出目录或加 --restart 重新开始")
+    return checkpoint
+
+
+def _save_checkpoint(output_dir: Path, checkpoint: dict) -> None:
+    path = output_dir / CHECKPOINT_NAME
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_text(json.dumps(checkpoint, ensure_ascii=False, indent=2), encoding="utf-8")
+    temp_path.replace(path)
+
+
+def _clear_output(output_dir: Path) -> None:
+    # 只删除本工具写出的分片与检查点。
+    for path in output_dir.glob("part-*"):
+        path.unlink()
+    (output_dir / CHECKPOINT_NAME).unlink(missing_ok=True)
+
+
+def run_bulk(job: BulkJob, output_dir: Path, input_format: str, workers: int, restart: bool = False) -> dict:
+    # 检查点记录已完成的块；块按输入顺序与块大小确定，续跑时跳过已完成的块重新读取其余输入。
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if restart:
+        _clear_output(output_dir)
+    checkpoint = _load_checkpoint(output_dir, job)
+    completed = set(checkpoint["completed"])
+    # 参数错误（视图坐标、缺失校准表等）在开始前报告，而不是逐行记为错误。
+    _timeline(job.spec, job.normalization)
+    if job.normalization == "global":
+        calibration_table()
+
+    def record(result: dict) -> None:
+        completed.add(result["chunk"])
+        checkpoint["completed"] = sorted(completed)
+        for name in ("rows", "cells", "errors"):
+            checkpoint[name] += result[name]
+        _save_checkpoint(output_dir, checkpoint)
+        print(f"块 {result['chunk']}：{result['rows']} 条出生信息，{result['cells']} 个格子，{result['errors']} 条错误")
+
+    chunks = (
+        (index, rows)
+        for index, rows in _chunks(_read_rows(Path(job.input_path), input_format, job.chunk_size), job.chunk_size)
+        if index not in completed
+    )
+    if workers <= 1:
+        for index, rows in chunks:
+            record(evaluate_chunk(job, output_dir, index, rows))
+        return checkpoint
+
+    # 同时在途的块不超过 workers 的两倍，读取进度随计算推进，内存占用有界。
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for index, rows in chunks:
+            pending.add(pool.submit(evaluate_chunk, job, output_dir, index, rows))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future.result())
+        for future in wait(pending).done:
+            record(future.result())
+    return checkpoint
+
+
+def _datetime_arg(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的时间：{value}") from None
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="离线批量计算热力图：分块读取出生信息（CSV/JSONL/Parquet），在进程池中计算并按块写出列式分片，可中断续跑。"
+    )
+    parser.add_argument("input", type=Path, help="输入文件，列为 gender、calendar、birth_date、birth_time、is_leap_month（可选）")
+    parser.add_argument("output", type=Path, help="输出目录（分片 part-*.parquet / part-*.csv 与检查点）")
+    parser.add_argument("--input-format", choices=("csv", "jsonl", "parquet"), help="默认按扩展名判断")
+    parser.add_argument("--output-format", choices=tuple(_OUTPUT_SUFFIXES), default="parquet", help="分片格式")
+    parser.add_argument("--view", choices=("year", "month", "day", "hour", "range"), required=True)
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--month", type=int)
+    parser.add_argument("--day", type=int)
+    parser.add_argument("--start", type=_datetime_arg, help="range 视图起点（无时区按北京时间）")
+    parser.add_argument("--end", type=_datetime_arg, help="range 视图终点（不含）")
+    parser.add_argument("--resolution", choices=("year", "month", "day", "hour"))
+    parser.add_argument("--normalization", choices=("view", "global"), default="view")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每块出生信息条数，每块写一个分片")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行子进程数（1 为在当前进程中计算）")
+    parser.add_argument("--id-column", default="id", help="原样写入输出 id 列的输入列名")
+    parser.add_argument("--restart", action="store_true", help="删除输出目录中已有的分片与检查点后重新开始")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size 需为正整数")
+
+    job = BulkJob(
+        input_path=str(args.input.resolve()),
+        spec=ViewSpec(
+            view=args.view,
+            year=args.year,
+            month=args.month,
+            day=args.day,
+            start=args.start,
+            end=args.end,
+            resolution=args.resolution,
+        ),
+        normalization=args.normalization,
+        chunk_size=args.chunk_size,
+        output_format=args.output_format,
+        id_column=args.id_column,
+    )
+    started = time.perf_counter()
+    try:
+        checkpoint = run_bulk(job, args.output, _input_format(args.input, args.input_format), args.workers, args.restart)
+    except (ValueError, RuntimeError) as exc:
+        print(f"错误：{exc}")
+        return 2
+    print(
+        f"完成：共 {len(checkpoint['completed'])} 块，{checkpoint['rows']} 条出生信息，{checkpoint['cells']} 个格子，"
+        f"{checkpoint['errors']} 条错误，本次用时 {time.perf_counter() - started:.1f}s。"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
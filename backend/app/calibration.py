@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from datetime import time as clock_time
+from functools import lru_cache, partial
+from math import inf
+from pathlib import Path
+from typing import Sequence
+
+from .adapters.calendar import pillars_from_solar
+from .config import (
+    CALIBRATION_BIRTH_YEARS,
+    CALIBRATION_STRENGTH_BINS,
+    CALIBRATION_TABLE_PATH,
+    CALIBRATION_TABLE_POINTS,
+    CALIBRATION_WINDOW_YEARS,
+    HIDDEN_STEM_WEIGHT,
+    STEM_WEIGHT,
+    TIME_LAYER_WEIGHTS,
+)
+from .engine.bazi import GANZHI_INDEX, compute_bazi_profile
+from .engine.constants import STEM_POLARITY
+from .engine.vectorized import profile_matrices, raw_activations, require_numpy
+from .services.analysis_service import BirthInfo, ViewSpec, ViewTimeline, natal_view_raw_scores, resolved_view_timeline
+from .services.calibration_table import load_calibration_table, write_calibration_table
+
+# 合并各命盘分布时使用的细分直方图桶数；分位表格点由其累计分布插值得到。
+_FINE_BINS = 1 << 16
+# 扫描出生时刻时每天取一个时辰，按日序轮换，使各时柱都有覆盖。
+_SCAN_HOURS = tuple(range(0, 24, 2))
+# 写入表信息的激活值分位点。
+_SUMMARY_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def _strength_bin(strength: float, bins: int) -> int:
+    return min(bins - 1, int(strength * bins))
+
+
+def representative_births(first_year: int, last_year: int, strength_bins: int) -> list[tuple[BirthInfo, float]]:
+    # 逐日扫描出生时刻，按（日柱即日主 × 日支、日主强弱分档、年干阴阳、性别）分层，每层保留首个出生信息；
+    # 年干阴阳与性别共同决定大运顺逆。同时返回该命盘单柱结构评分的最大值，用于确定激活值上界。
+    strata: dict[tuple, tuple[BirthInfo, float]] = {}
+    day = date(first_year, 1, 1)
+    last = date(last_year, 12, 31)
+    while day <= last:
+        hour = _SCAN_HOURS[day.toordinal() % len(_SCAN_HOURS)]
+        pillars = pillars_from_solar(day.year, day.month, day.day, hour)
+        profile = compute_bazi_profile(pillars, STEM_WEIGHT, HIDDEN_STEM_WEIGHT)
+        stratum = (
+            GANZHI_INDEX[(pillars.day.stem, pillars.day.branch)],
+            _strength_bin(profile.day_master_strength, strength_bins),
+            STEM_POLARITY[pillars.year.stem],
+        )
+        for gender in ("male", "female"):
+            if (*stratum, gender) not in strata:
+                birth = BirthInfo(
+                    gender=gender,
+                    calendar="solar",
+                    birth_date=day,
+                    birth_time=clock_time(hour),
+                    is_leap_month=False,
+                )
+                strata[(*stratum, gender)] = (birth, float(profile_matrices(profile).summary.max()))
+        day += timedelta(days=1)
+    return [strata[key] for key in sorted(strata)]
+
+
+@lru_cache(maxsize=None)
+def _window_timelines(first_year: int, last_year: int) -> tuple[ViewTimeline, ...]:
+    # 逐小时的时间柱与出生信息无关，每个进程按年构建一次，在该进程处理的所有命盘间共享。
+    return tuple(
+        resolved_view_timeline(
+            ViewSpec(view="range", start=datetime(year, 1, 1), end=datetime(year + 1, 1, 1), resolution="hour")
+        )
+        for year in range(first_year, last_year + 1)
+    )
+
+
+def _chunk_histogram(window: tuple[int, int], activation_max: float, births: Sequence[BirthInfo]):
+    # 返回（细分直方图计数, 最小激活值, 最大激活值）；多个命盘在子进程内先合并，减少回传数据量。
+    np = require_numpy()
+    counts = np.zeros(_FINE_BINS, dtype=np.int64)
+    low, high = inf, -inf
+    scale = _FINE_BINS / activation_max
+    for birth in births:
+        for timeline in _window_timelines(*window):
+            activations = raw_activations(natal_view_raw_scores(birth, timeline))
+            bins = np.minimum((activations * scale).astype(np.intp), _FINE_BINS - 1)
+            counts += np.bincount(bins, minlength=_FINE_BINS)
+            low = min(low, float(activations.min()))
+            high = max(high, float(activations.max()))
+    return counts, low, high
+
+
+def _chunks(items: list, count: int) -> list[list]:
+    size = max(1, -(-len(items) // count))
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def build_calibration(
+    birth_years: tuple[int, int],
+    window: tuple[int, int],
+    strength_bins: int,
+    points: int,
+    workers: int,
+) -> tuple[float, float, list[float], dict]:
+    np = require_numpy()
+    representatives = representative_births(*birth_years, strength_bins)
+    births = [birth for birth, _ in representatives]
+    # score_summary 为绝对值之和，激活值（五层加权和）不超过各层权重之和乘单柱最大值。
+    activation_max = sum(TIME_LAYER_WEIGHTS.values()) * max(summary_max for _, summary_max in representatives)
+    job = partial(_chunk_histogram, window, activation_max)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(job, _chunks(births, workers * 4)))
+    else:
+        results = [job(births)]
+
+    counts = sum(result[0] for result in results)
+    low = min(result[1] for result in results)
+    high = max(result[2] for result in results)
+    total = int(counts.sum())
+    edges = np.linspace(0.0, activation_max, _FINE_BINS + 1)
+    cumulative = np.concatenate(([0.0], np.cumsum(counts) / total))
+    grid = np.linspace(low, high, points)
+    cdf = np.maximum.accumulate(np.round(np.interp(grid, edges, cumulative), 6))
+    cdf[0], cdf[-1] = 0.0, 1.0
+    info = {
+        "charts": len(births),
+        "samples": total,
+        "birth_years": list(birth_years),
+        "window_years": list(window),
+        "resolution": "hour",
+        "strength_bins": strength_bins,
+        "activation_quantiles": {
+            f"p{round(q * 100):02d}": float(np.interp(q, cumulative, edges)) for q in _SUMMARY_QUANTILES
+        },
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    return low, high, cdf.tolist(), info
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="离线统计代表性命盘的激活值分布，生成 normalization=global 使用的百分位表。")
+    parser.add_argument("--output", type=Path, default=CALIBRATION_TABLE_PATH, help="输出文件路径")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行子进程数（1 为在当前进程中计算）")
+    parser.add_argument("--birth-years", type=int, nargs=2, default=CALIBRATION_BIRTH_YEARS, help="扫描出生年份（含首尾）")
+    parser.add_argument("--window", type=int, nargs=2, default=CALIBRATION_WINDOW_YEARS, help="评估窗口公历年份（含首尾）")
+    parser.add_argument("--strength-bins", type=int, default=CALIBRATION_STRENGTH_BINS, help="日主强弱分档数")
+    parser.add_argument("--points", type=int, default=CALIBRATION_TABLE_POINTS, help="分位表格点数")
+    parser.add_argument("--check", action="store_true", help="只校验已有文件能否被当前配置加载")
+    args = parser.parse_args(argv)
+    if args.check:
+        table = load_calibration_table(args.output)
+        if table is None:
+            print(f"{args.output} 缺失、已过期或格式无效。")
+            return 1
+        print(f"{args.output} 有效：{len(table.cdf)} 个格点，激活值 {table.activation_min:.4f} ~ {table.activation_max:.4f}。")
+        return 0
+    if args.points < 2 or args.strength_bins < 1 or args.birth_years[0] > args.birth_years[1] or args.window[0] > args.window[1]:
+        parser.error("参数范围无效")
+
+    started = time.perf_counter()
+    low, high, cdf, info = build_calibration(
+        tuple(args.birth_years), tuple(args.window), args.strength_bins, args.points, max(1, args.workers)
+    )
+    write_calibration_table(args.output, low, high, cdf, info)
+    print(
+        f"已写入 {args.output}：{info['charts']} 个代表性命盘 × {args.window[0]}–{args.window[1]} 年逐小时，"
+        f"共 {info['samples']} 个样本，用时 {time.perf_counter() - started:.1f}s。"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,3 +1,6 @@
+import hashlib
+import json
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
 # Time assumptions (must be fixed in code, not exposed as user options):
@@ -21,3 +24,102 @@ SHORT_CYCLE_FACTOR_MIN = 0.85
 SHORT_CYCLE_FACTOR_MAX = 1.15
 
 YEAR_VIEW_WINDOW = 10
+
+# 节气索引表覆盖的公历年份（含首尾），范围外回退到 sxtwl 逐日扫描。
+JIEQI_TABLE_START_YEAR = 1900
+JIEQI_TABLE_END_YEAR = 2100
+
+# 四柱计算后端："table" 为查表/算术实现，"sxtwl" 为逐点调用 sxtwl，
+# "crosscheck" 同时计算两者并在不一致时报错（用于校验）。
+CALENDAR_BACKEND = "table"
+
+# 预计算日历文件（python -m app.adapters.calendar_file 生成）：导入时以 mmap 只读映射，
+# 多个 worker 进程共享同一份页缓存；文件缺失或校验失败时回退到首次使用时由 sxtwl 构建。
+CALENDAR_FILE_PATH = Path(__file__).resolve().parent.parent / "calendar_table.bin"
+
+# 热力图计算引擎："vectorized" 为 numpy 整视图向量化实现，"reference" 为逐点参考实现。
+HEATMAP_ENGINE = "vectorized"
+
+# 热力图响应缓存（进程内 LRU）：条目数、估算内存上限与过期时间（秒，None 为不过期）。
+HEATMAP_CACHE_MAX_ENTRIES = 512
+HEATMAP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+HEATMAP_CACHE_TTL_SECONDS = 6 * 3600
+
+# 批量热力图：单次请求的出生信息上限，以及在进程池中并行计算的最小条目数
+# （条目太少时进程间传输开销得不偿失）。
+HEATMAP_BATCH_MAX_BIRTHS = 5000
+HEATMAP_BATCH_MIN_PARALLEL_ITEMS = 64
+
+# 分析接口执行方式："thread" 在 anyio 线程池中运行；"process" 分派到预热的进程池，
+# 避免 CPU 密集计算在 GIL 上串行。超时（秒）映射为 503。
+ANALYSIS_EXECUTION_MODE = "thread"
+ANALYSIS_PROCESS_WORKERS = 4
+ANALYSIS_TIMEOUT_SECONDS = 30.0
+
+# 下钻树接口单次返回的格子数上限（整年到小时约 9,137 格）。
+HEATMAP_TREE_MAX_CELLS = 20000
+
+# 流式（NDJSON）热力图每次向量化计算的格子数。
+HEATMAP_STREAM_CHUNK_SIZE = 512
+
+# range 视图（任意起止时间与分辨率）单次请求的格子数上限。
+RANGE_VIEW_MAX_CELLS = 50000
+
+# 行为序列接口单次请求的时间点上限。
+BEHAVIOR_SERIES_MAX_POINTS = 10000
+
+# 基准测试（python -m app.benchmarks）：中位耗时超过基线该比例即视为性能回退。
+BENCHMARK_REGRESSION_THRESHOLD = 0.25
+
+# GET 热力图接口的 HTTP 缓存有效期（秒）；配置或引擎版本变化后经 ETag 重新验证即可取得新结果。
+HEATMAP_HTTP_MAX_AGE_SECONDS = 7 * 86400
+
+# 命盘缓存（进程内 LRU，按出生信息）：四柱、命盘、大运时间线与本命基准评分。
+NATAL_CACHE_MAX_ENTRIES = 4096
+NATAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 原始分量持久化存储（SQLite 文件路径，None 为关闭）：跨重启保留各格子归一化前的分量，
+# 按视图批量读回后重新归一化。写入在后台按 RAW_STORE_FLUSH_SECONDS 批量落盘，存活数据超过上限时淘汰最旧条目。
+RAW_STORE_PATH = None
+RAW_STORE_MAX_BYTES = 512 * 1024 * 1024
+RAW_STORE_FLUSH_SECONDS = 2.0
+# 读回只在命盘冷启动时可能快于重算，且仅限小视图（冷启动 336 格读回约 1.2 ms、重算约 1.4 ms；8,784 格读回约 21 ms、重算约 9 ms）。
+RAW_STORE_READ_MAX_POINTS = 336
+
+# 跨 worker 共享的热力图缓存层（mmap 文件路径，建议位于 /dev/shm；None 为仅用进程内缓存）：
+# 同一主机的多个 worker 映射同一文件，一个 worker 算出的视图可被其他 worker 直接读取。
+# 数据区写满后按写入顺序覆盖最旧条目；槽位数为可同时保存的条目上限。
+SHARED_CACHE_PATH = None
+SHARED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+SHARED_CACHE_SLOTS = 4096
+
+# 全局百分位校准表（python -m app.calibration 生成）：normalization="global" 时按该表把原始激活值
+# 映射为在代表性命盘总体中的百分位。表中记录的 CONFIG_VERSION 与当前不符时视为缺失。
+CALIBRATION_TABLE_PATH = Path(__file__).resolve().parent.parent / "calibration_table.json"
+# 校准任务：代表性命盘的出生年份扫描范围、评估窗口（公历年，含首尾）、日主强弱分档数与分位表格点数。
+CALIBRATION_BIRTH_YEARS = (1940, 2009)
+CALIBRATION_WINDOW_YEARS = (2020, 2029)
+CALIBRATION_STRENGTH_BINS = 5
+CALIBRATION_TABLE_POINTS = 1025
+
+# 评分逻辑版本：改动引擎算法时手动递增。与上方权重共同派生 CONFIG_VERSION，
+# 用于使缓存等按结果复用的数据失效。
+ENGINE_REVISION = 1
+
+
+def _config_version() -> str:
+    payload = json.dumps(
+        {
+            "engine_revision": ENGINE_REVISION,
+            "time_layer_weights": TIME_LAYER_WEIGHTS,
+            "stem_weight": STEM_WEIGHT,
+            "hidden_stem_weight": HIDDEN_STEM_WEIGHT,
+            "short_cycle_factor": [SHORT_CYCLE_FACTOR_MIN, SHORT_CYCLE_FACTOR_MAX],
+            "year_view_window": YEAR_VIEW_WINDOW,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+CONFIG_VERSION = _config_version()
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any
 
-from .constants import ELEMENT_CONTROLS, ELEMENT_GENERATES, HIDDEN_STEMS, STEM_ELEMENT
+from .constants import BRANCHES, ELEMENT_CONTROLS, ELEMENT_GENERATES, HIDDEN_STEMS, STEM_ELEMENT, STEMS
+from .interactions import branch_volatility
 
 
 @dataclass(frozen=True)
@@ -19,6 +21,10 @@ class Pillars:
     hour: Pillar
 
 
+GANZHI_CYCLE = [Pillar(stem=STEMS[i % 10], branch=BRANCHES[i % 12]) for i in range(60)]
+GANZHI_INDEX = {(pillar.stem, pillar.branch): idx for idx, pillar in enumerate(GANZHI_CYCLE)}
+
+
 @dataclass(frozen=True)
 class BaziProfile:
     pillars: Pillars
@@ -28,6 +34,14 @@ class BaziProfile:
     day_master_strength_label: str
     element_balance: dict[str, float]
     natal_branches: list[str]
+    # 按地支序号排列的流年/流月等时间地支对本命的波动系数，见 interactions.branch_volatility。
+    branch_volatility: tuple[float, ...]
+    # 按干支柱惰性填充的评分表（最多 60 项），由 scoring.pillar_scores 维护。
+    score_table: dict[Pillar, tuple[dict[str, float], dict[str, float]]] = field(
+        default_factory=dict, compare=False, repr=False
+    )
+    # 向量化引擎的评分矩阵缓存，由 vectorized.profile_matrices 维护。
+    matrix_cache: dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
 
 
 def _element_balance(pillars: Pillars, stem_weight: float, hidden_weight: float) -> dict[str, float]:
@@ -63,6 +77,7 @@ def compute_bazi_profile(pillars: Pillars, stem_weight: float, hidden_weight: fl
     day_master_element = STEM_ELEMENT[day_master]
     balance = _element_balance(pillars, stem_weight, hidden_weight)
     strength = _day_master_strength(day_master_element, balance)
+    natal_branches = [pillars.year.branch, pillars.month.branch, pillars.day.branch, pillars.hour.branch]
     return BaziProfile(
         pillars=pillars,
         day_master=day_master,
@@ -70,5 +85,6 @@ def compute_bazi_profile(pillars: Pillars, stem_weight: float, hidden_weight: fl
         day_master_strength=strength,
         day_master_strength_label=_strength_label(strength),
         element_balance=balance,
-        natal_branches=[pillars.year.branch, pillars.month.branch, pillars.day.branch, pillars.hour.branch],
+        natal_branches=natal_branches,
+        branch_volatility=branch_volatility(natal_branches),
     )
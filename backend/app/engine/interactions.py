@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterable
+
+from .constants import BRANCH_CLASHES, BRANCH_COMBINES, BRANCH_HARMS, BRANCH_PUNISHES, BRANCHES
+
+BRANCH_INDEX = {branch: idx for idx, branch in enumerate(BRANCHES)}
+
+Matrix = tuple[tuple[int, ...], ...]
+
+
+def _relation_matrix(*relations: set[tuple[str, str]]) -> Matrix:
+    # matrix[t][n]：时间地支 t 与本命地支 n 在各关系中成立的次数之和（不分先后，同一对分属多个关系时分别计数）。
+    return tuple(
+        tuple(
+            sum(1 for pairs in relations if (natal, time_branch) in pairs or (time_branch, natal) in pairs)
+            for natal in BRANCHES
+        )
+        for time_branch in BRANCHES
+    )
+
+
+# 冲、害、刑抬高波动，六合降低波动。导入时编译为 12×12 整数矩阵。
+DISRUPTIVE_MATRIX = _relation_matrix(BRANCH_CLASHES, BRANCH_HARMS, BRANCH_PUNISHES)
+COMBINE_MATRIX = _relation_matrix(BRANCH_COMBINES)
+
+
+def branch_counts(branches: Iterable[str]) -> tuple[int, ...]:
+    counts = [0] * len(BRANCHES)
+    for branch in branches:
+        counts[BRANCH_INDEX[branch]] += 1
+    return tuple(counts)
+
+
+@lru_cache(maxsize=1)
+def _relation_array():
+    # 冲害刑（前 12 行）与六合（后 12 行）堆叠为 24×12 整数矩阵，只构建一次。
+    from .vectorized import require_numpy
+
+    np = require_numpy()
+    return np.array(DISRUPTIVE_MATRIX + COMBINE_MATRIX, dtype=np.int64)
+
+
+@lru_cache(maxsize=2048)
+def _volatility_for_counts(counts: tuple[int, ...]) -> tuple[float, ...]:
+    # 四柱地支组合至多 1,365 种，按计数向量缓存；未命中时一次矩阵-向量乘得到 12 个时间地支各自的冲害刑与合的次数。
+    # 逐元素运算与原先逐地支的浮点表达式相同，结果逐位一致。
+    relations = _relation_array() @ counts
+    size = len(BRANCHES)
+    factors = 1.0 + 0.06 * relations[:size] - 0.04 * relations[size:]
+    return tuple(factors.clip(0.8, 1.3).tolist())
+
+
+def branch_volatility(natal_branches: Iterable[str]) -> tuple[float, ...]:
+    # 本命地支表示为计数向量，得到按地支序号排列的 12 个时间地支波动系数；命盘构建时计算一次，评分时按序号查表。
+    # 三合、三会等多支关系可同样由计数向量得到按时间地支的附加次数，在此处汇总，评分热路径仍只查表。
+    return _volatility_for_counts(branch_counts(natal_branches))
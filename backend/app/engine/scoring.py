@@ -4,16 +4,8 @@ from math import copysign
 
 from ..config import HIDDEN_STEM_WEIGHT, STEM_WEIGHT
 from .bazi import BaziProfile, Pillar
-from .constants import (
-    BRANCH_CLASHES,
-    BRANCH_COMBINES,
-    BRANCH_HARMS,
-    BRANCH_PUNISHES,
-    ELEMENT_CONTROLS,
-    ELEMENT_GENERATES,
-    HIDDEN_STEMS,
-    STEM_ELEMENT,
-)
+from .constants import ELEMENT_CONTROLS, ELEMENT_GENERATES, HIDDEN_STEMS, STEM_ELEMENT
+from .interactions import BRANCH_INDEX, branch_volatility
 from .ten_gods import STRUCTURE_LABELS, TEN_GODS, TEN_GOD_TO_STRUCTURE, ten_god_relation
 
 CATEGORIES = ["resource", "constraint", "support", "output", "competition"]
@@ -33,18 +25,9 @@ def relation_factor(day_master_element: str, other_element: str) -> float:
     return 1.0
 
 
-def _pair_in_set(branch_a: str, branch_b: str, pairs: set[tuple[str, str]]) -> bool:
-    return (branch_a, branch_b) in pairs or (branch_b, branch_a) in pairs
-
-
 def volatility_factor(natal_branches: list[str], time_branch: str) -> float:
-    clashes = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_CLASHES))
-    harms = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_HARMS))
-    punish = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_PUNISHES))
-    combines = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_COMBINES))
-
-    factor = 1.0 + 0.06 * (clashes + harms + punish) - 0.04 * combines
-    return max(0.8, min(1.3, factor))
+    # 评分路径直接读取 profile.branch_volatility；此函数供单独计算某一地支时使用，系数表按本命地支组合缓存，只做一次索引。
+    return branch_volatility(natal_branches)[BRANCH_INDEX[time_branch]]
 
 
 def score_pillar(profile: BaziProfile, pillar: Pillar) -> dict[str, float]:
@@ -66,7 +49,7 @@ def score_pillar(profile: BaziProfile, pillar: Pillar) -> dict[str, float]:
     scores["resource"] *= capacity
     scores["constraint"] *= capacity
 
-    volatility = volatility_factor(profile.natal_branches, pillar.branch)
+    volatility = profile.branch_volatility[BRANCH_INDEX[pillar.branch]]
     for cat in scores:
         scores[cat] *= volatility
 
@@ -91,13 +74,31 @@ def score_pillar_ten_gods(profile: BaziProfile, pillar: Pillar) -> dict[str, flo
     for god in ("zhengcai", "piancai", "zhengguan", "qisha"):
         scores[god] *= capacity
 
-    volatility = volatility_factor(profile.natal_branches, pillar.branch)
+    volatility = profile.branch_volatility[BRANCH_INDEX[pillar.branch]]
     for god in scores:
         scores[god] *= volatility
 
     return scores
 
 
+def _score_table_entry(profile: BaziProfile, pillar: Pillar) -> tuple[dict[str, float], dict[str, float]]:
+    # 评分只取决于命盘与干支柱本身，首次计算后写入 profile.score_table，之后直接查表。
+    entry = profile.score_table.get(pillar)
+    if entry is None:
+        entry = (score_pillar(profile, pillar), score_pillar_ten_gods(profile, pillar))
+        profile.score_table[pillar] = entry
+    return entry
+
+
+def pillar_scores(profile: BaziProfile, pillar: Pillar) -> dict[str, float]:
+    # 返回的字典为共享表项，调用方不得修改。
+    return _score_table_entry(profile, pillar)[0]
+
+
+def pillar_ten_god_scores(profile: BaziProfile, pillar: Pillar) -> dict[str, float]:
+    return _score_table_entry(profile, pillar)[1]
+
+
 def merge_scores(base: dict[str, float], addition: dict[str, float], weight: float) -> dict[str, float]:
     return {cat: base.get(cat, 0.0) + addition.get(cat, 0.0) * weight for cat in CATEGORIES}
 
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from ..config import SHORT_CYCLE_FACTOR_MAX, SHORT_CYCLE_FACTOR_MIN, TIME_LAYER_WEIGHTS
+from .bazi import GANZHI_CYCLE, BaziProfile
+from .scoring import pillar_scores, pillar_ten_god_scores, score_summary
+from .ten_gods import TEN_GODS
+
+# 柱序号数组的列顺序，与 _layer_scores 中的层级顺序一致（影响浮点累加顺序）。
+LAYERS = ("big_luck", "year", "month", "day", "hour")
+
+
+def require_numpy():
+    try:
+        import numpy
+
+        return numpy
+    except Exception as exc:  # pragma: no cover - runtime guard
+        raise RuntimeError("numpy 未安装或不可用，无法使用向量化引擎。") from exc
+
+
+@dataclass(frozen=True)
+class ProfileMatrices:
+    # summary[i]：第 i 个干支柱结构评分的 score_summary；ten_gods[i]：十神评分（按 TEN_GODS 顺序）。
+    # 按需填充，filled[i] 标记第 i 行是否已计算。
+    summary: Any
+    ten_gods: Any
+    filled: Any
+
+
+@dataclass(frozen=True)
+class ViewRawScores:
+    long_base: Any
+    short_component: Any
+    ten_gods: Any
+
+
+def profile_matrices(profile: BaziProfile, indices=None) -> ProfileMatrices:
+    # indices 为 None 时填满 60 行，否则只补齐视图用到的干支柱。
+    np = require_numpy()
+    matrices = profile.matrix_cache.get("scores")
+    if matrices is None:
+        matrices = ProfileMatrices(
+            summary=np.zeros(60, dtype=np.float64),
+            ten_gods=np.zeros((60, len(TEN_GODS)), dtype=np.float64),
+            filled=np.zeros(60, dtype=bool),
+        )
+        profile.matrix_cache["scores"] = matrices
+    needed = np.arange(60) if indices is None else np.unique(indices)
+    for idx in needed[~matrices.filled[needed]].tolist():
+        pillar = GANZHI_CYCLE[idx]
+        matrices.summary[idx] = score_summary(pillar_scores(profile, pillar))
+        scores = pillar_ten_god_scores(profile, pillar)
+        matrices.ten_gods[idx] = [scores[god] for god in TEN_GODS]
+        matrices.filled[idx] = True
+    return matrices
+
+
+def view_raw_scores(profile: BaziProfile, indices) -> ViewRawScores:
+    # indices：形状 (n, 5) 的六十甲子序号数组，列顺序见 LAYERS。
+    np = require_numpy()
+    indices = np.asarray(indices, dtype=np.intp)
+    matrices = profile_matrices(profile, indices)
+    summary = matrices.summary[indices]
+    weights = [TIME_LAYER_WEIGHTS[layer] for layer in LAYERS]
+    long_base = summary[:, 0] * weights[0] + summary[:, 1] * weights[1]
+    short_component = summary[:, 2] * weights[2] + summary[:, 3] * weights[3] + summary[:, 4] * weights[4]
+    ten_gods = np.zeros((indices.shape[0], len(TEN_GODS)), dtype=np.float64)
+    for column, weight in enumerate(weights):
+        ten_gods = ten_gods + matrices.ten_gods[indices[:, column]] * weight
+    return ViewRawScores(long_base=long_base, short_component=short_component, ten_gods=ten_gods)
+
+
+@dataclass(frozen=True)
+class AnalyticBounds:
+    # 命盘在任意时间点可达的上下界，仅依赖评分表，可在输出首个格子前确定。
+    short_min: float
+    short_max: float
+    activation_min: float
+    activation_max: float
+    max_abs_ten_god: float
+
+
+def analytic_bounds(profile: BaziProfile) -> AnalyticBounds:
+    np = require_numpy()
+    matrices = profile_matrices(profile)
+    summary_min = float(matrices.summary.min())
+    summary_max = float(matrices.summary.max())
+    long_weight = TIME_LAYER_WEIGHTS["big_luck"] + TIME_LAYER_WEIGHTS["year"]
+    short_weight = TIME_LAYER_WEIGHTS["month"] + TIME_LAYER_WEIGHTS["day"] + TIME_LAYER_WEIGHTS["hour"]
+    # score_summary 为绝对值之和，long_base 与短周期系数均非负，故激活值上下界可直接相乘得到。
+    return AnalyticBounds(
+        short_min=short_weight * summary_min,
+        short_max=short_weight * summary_max,
+        activation_min=long_weight * summary_min * SHORT_CYCLE_FACTOR_MIN,
+        activation_max=long_weight * summary_max * SHORT_CYCLE_FACTOR_MAX,
+        max_abs_ten_god=sum(TIME_LAYER_WEIGHTS.values()) * float(np.abs(matrices.ten_gods).max()),
+    )
+
+
+def normalize_with_bounds(raw: ViewRawScores, bounds: AnalyticBounds) -> tuple[Any, Any]:
+    # 按解析上下界归一化，每个格子独立计算，适合流式输出。
+    np = require_numpy()
+    short_span = max(1e-6, bounds.short_max - bounds.short_min)
+    short_norm = (raw.short_component - bounds.short_min) / short_span
+    short_factor = SHORT_CYCLE_FACTOR_MIN + (SHORT_CYCLE_FACTOR_MAX - SHORT_CYCLE_FACTOR_MIN) * short_norm
+    activations = raw.long_base * short_factor
+    span = max(1e-6, bounds.activation_max - bounds.activation_min)
+    values = np.clip((activations - bounds.activation_min) / span, 0.0, 1.0)
+    max_abs_ten_god = max(1e-6, bounds.max_abs_ten_god)
+    ten_god_scores = np.clip(np.round((raw.ten_gods / max_abs_ten_god) * 100), -100, 100).astype(np.int64)
+    return values, ten_god_scores
+
+
+def normalize_view(raw: ViewRawScores) -> tuple[Any, Any]:
+    # 与逐点实现相同的视图内归一化：返回 (value 数组, 十神整数评分矩阵)。
+    np = require_numpy()
+    short_min = raw.short_component.min()
+    short_span = max(1e-6, raw.short_component.max() - short_min)
+    short_norm = (raw.short_component - short_min) / short_span
+    short_factor = SHORT_CYCLE_FACTOR_MIN + (SHORT_CYCLE_FACTOR_MAX - SHORT_CYCLE_FACTOR_MIN) * short_norm
+    activations = raw.long_base * short_factor
+
+    v_min = activations.min()
+    span = max(1e-6, activations.max() - v_min)
+    values = (activations - v_min) / span
+
+    return values, _view_ten_god_scores(raw)
+
+
+def _view_ten_god_scores(raw: ViewRawScores) -> Any:
+    np = require_numpy()
+    max_abs_ten_god = max(1e-6, float(np.abs(raw.ten_gods).max(initial=0.0)))
+    return np.clip(np.round((raw.ten_gods / max_abs_ten_god) * 100), -100, 100).astype(np.int64)
+
+
+@dataclass(frozen=True)
+class QuantileTable:
+    # 原始激活值在 [activation_min, activation_max] 等距格点上的累计分布（0 ~ 1），格点数为 len(cdf)；
+    # digest 标识表内容，供缓存键区分不同批次的校准结果。
+    activation_min: float
+    activation_max: float
+    cdf: Any
+    digest: str
+
+
+def raw_activations(raw: ViewRawScores) -> Any:
+    # 不经视图内缩放的激活值：五层结构评分的加权和，可在不同视图、不同命盘之间比较。
+    return raw.long_base + raw.short_component
+
+
+def normalize_with_table(raw: ViewRawScores, table: QuantileTable) -> tuple[Any, Any]:
+    # 按全局校准表把激活值映射为总体百分位：等距格点直接定位所在区间后线性插值，每格 O(1)。
+    # 十神评分仍为视图内相对值。
+    np = require_numpy()
+    cdf = table.cdf
+    intervals = len(cdf) - 1
+    scale = intervals / max(1e-6, table.activation_max - table.activation_min)
+    position = np.clip((raw_activations(raw) - table.activation_min) * scale, 0.0, intervals)
+    lower = np.minimum(position.astype(np.intp), intervals - 1)
+    values = cdf[lower] + (cdf[lower + 1] - cdf[lower]) * (position - lower)
+    return values, _view_ten_god_scores(raw)
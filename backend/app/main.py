@@ -1,10 +1,66 @@
-﻿from fastapi import FastAPI, HTTPException
+﻿import json
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, Callable
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from .config import HEATMAP_BATCH_MIN_PARALLEL_ITEMS, HEATMAP_HTTP_MAX_AGE_SECONDS
+from .metrics import observe_request, render_prometheus, stage_timer
+from .models import (
+    BehaviorRequest,
+    BehaviorResponse,
+    BehaviorSeriesRequest,
+    BehaviorSeriesResponse,
+    HeatmapBatchRequest,
+    HeatmapBatchResponse,
+    HeatmapColumnarResponse,
+    HeatmapQuery,
+    HeatmapRequest,
+    HeatmapResponse,
+    HeatmapTreeRequest,
+    HeatmapTreeResponse,
+)
+from .serialization import (
+    JSON_MEDIA_TYPE,
+    AnalysisJSONResponse,
+    encode_heatmap,
+    encode_heatmap_batch,
+    negotiate_media_type,
+)
+from .services.analysis_service import (
+    behavior_series_payload,
+    build_behavior_response,
+    cached_heatmap_payload,
+    canonical_heatmap_query,
+    compute_heatmap_payload,
+    heatmap_batch_payload,
+    heatmap_cache_stats,
+    heatmap_etag,
+    heatmap_request_from_query,
+    heatmap_tree_payload,
+    natal_cache_stats,
+    plan_heatmap_batch,
+    store_heatmap_payload,
+    stream_heatmap_records,
+)
+from .services.executor import map_analysis, process_mode, run_analysis, shutdown_executor, start_executor
+from .services.raw_store import close_raw_cell_store
+
 
-from .models import BehaviorRequest, BehaviorResponse, HeatmapRequest, HeatmapResponse
-from .services.analysis_service import build_behavior_response, build_heatmap_response
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(start_executor)
+    yield
+    shutdown_executor()
+    # 落盘原始分量存储中尚未写入的批次。
+    close_raw_cell_store()
 
-app = FastAPI(title="Time Structure Heatmap API")
+
+app = FastAPI(title="Time Structure Heatmap API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,28 +75,187 @@ app.add_middleware(
 )
 
 
+# 热力图与批量接口按 Accept 协商 JSON / MessagePack / Arrow IPC。
+_VARY_ACCEPT = {"Vary": "Accept"}
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # 按路由模板而非原始路径聚合，避免标签基数失控。
+    route = request.scope.get("route")
+    observe_request(getattr(route, "path", "unmatched"), time.perf_counter() - started)
+    return response
+
+
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
-@app.post("/api/analysis/heatmap", response_model=HeatmapResponse)
-def heatmap(request: HeatmapRequest):
+@app.post(
+    "/api/analysis/heatmap",
+    response_model=HeatmapResponse | HeatmapColumnarResponse,
+    response_class=AnalysisJSONResponse,
+)
+async def heatmap(request: HeatmapRequest, accept: str | None = Header(default=None)):
+    try:
+        media_type = negotiate_media_type(accept)
+        return await _heatmap_http_response(_for_media_type(request, media_type), media_type, _VARY_ACCEPT)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+
+@app.get(
+    "/api/analysis/heatmap",
+    response_model=HeatmapResponse | HeatmapColumnarResponse,
+    response_class=AnalysisJSONResponse,
+)
+async def heatmap_get(
+    query: Annotated[HeatmapQuery, Query()],
+    accept: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    # 结果只由出生信息、视图坐标与配置版本决定，可交由浏览器与反向代理缓存。
     try:
-        return build_heatmap_response(request)
+        media_type = negotiate_media_type(accept)
+        request = _for_media_type(heatmap_request_from_query(query), media_type)
+        etag = heatmap_etag(request, media_type)
+        headers = {
+            **_VARY_ACCEPT,
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={HEATMAP_HTTP_MAX_AGE_SECONDS}",
+            "Content-Location": f"/api/analysis/heatmap?{canonical_heatmap_query(request)}",
+        }
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return await _heatmap_http_response(request, media_type, headers)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except RuntimeError as exc:
         raise HTTPException(status_code=503, detail=str(exc)) from exc
 
 
-@app.post("/api/analysis/behavior", response_model=BehaviorResponse)
-def behavior(request: BehaviorRequest):
+def _for_media_type(request: HeatmapRequest | HeatmapBatchRequest, media_type: str):
+    # 二进制编码基于列式数据；在计算缓存键与 ETag 之前改写，使其与实际输出的格式一致。
+    if media_type == JSON_MEDIA_TYPE:
+        return request
+    return request.model_copy(update={"format": "columnar"})
+
+
+async def _heatmap_http_response(request: HeatmapRequest, media_type: str, headers: dict[str, str]) -> Response:
+    # 缓存留在主进程，只有未命中时才分派计算。
+    payload = cached_heatmap_payload(request)
+    if payload is None:
+        payload = await run_analysis(compute_heatmap_payload, request)
+        store_heatmap_payload(request, payload)
+    return await _respond(payload, media_type, headers)
+
+
+def _render(payload, media_type: str, headers: dict[str, str] | None, encode: Callable[[Any, str], bytes]) -> Response:
+    # 直接输出服务层构造的载荷以跳过 response_model 的校验；构造时即完成序列化，便于单独计时。
+    with stage_timer("serialization"):
+        if media_type == JSON_MEDIA_TYPE:
+            return AnalysisJSONResponse(payload, headers=headers)
+        return Response(encode(payload, media_type), media_type=media_type, headers=headers)
+
+
+async def _respond(
+    payload,
+    media_type: str = JSON_MEDIA_TYPE,
+    headers: dict[str, str] | None = None,
+    encode: Callable[[Any, str], bytes] = encode_heatmap,
+) -> Response:
+    # 数万格的视图序列化需数十毫秒，放到线程池中执行，不阻塞事件循环上的其他请求。
+    return await run_in_threadpool(_render, payload, media_type, headers, encode)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match 使用弱比较：忽略 W/ 前缀；"*" 匹配任意表示。
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+@app.post("/api/analysis/heatmap/stream")
+async def heatmap_stream(request: HeatmapRequest):
+    # 生成器无法跨进程传递：参数校验与命盘计算在线程池中完成，各块随输出在线程池中计算。
     try:
-        return build_behavior_response(request)
+        records = await run_in_threadpool(stream_heatmap_records, request)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except RuntimeError as exc:
         raise HTTPException(status_code=503, detail=str(exc)) from exc
+    lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
+@app.post("/api/analysis/heatmap/batch", response_model=HeatmapBatchResponse, response_class=AnalysisJSONResponse)
+async def heatmap_batch(request: HeatmapBatchRequest, accept: str | None = Header(default=None)):
+    media_type = negotiate_media_type(accept)
+    request = _for_media_type(request, media_type)
+    try:
+        if process_mode() and len(request.births) >= HEATMAP_BATCH_MIN_PARALLEL_ITEMS:
+            # 视图只在主进程解析一次，出生信息分块分派到进程池。
+            score, indexed_births = await run_in_threadpool(plan_heatmap_batch, request)
+            payload = {"view": request.view, "items": await map_analysis(score, indexed_births)}
+        else:
+            payload = await run_analysis(heatmap_batch_payload, request)
+        return await _respond(payload, media_type, _VARY_ACCEPT, encode_heatmap_batch)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+
+@app.post("/api/analysis/heatmap/tree", response_model=HeatmapTreeResponse, response_class=AnalysisJSONResponse)
+async def heatmap_tree(request: HeatmapTreeRequest):
+    try:
+        return await _respond(await run_analysis(heatmap_tree_payload, request))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+
+@app.get("/api/analysis/heatmap/cache")
+def heatmap_cache():
+    return heatmap_cache_stats()
+
+
+@app.get("/api/analysis/natal/cache")
+def natal_cache():
+    return natal_cache_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/api/analysis/behavior", response_model=BehaviorResponse, response_class=AnalysisJSONResponse)
+async def behavior(request: BehaviorRequest):
+    try:
+        return await _respond(await run_analysis(build_behavior_response, request))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+
+@app.post(
+    "/api/analysis/behavior/series",
+    response_model=BehaviorSeriesResponse,
+    response_class=AnalysisJSONResponse,
+)
+async def behavior_series(request: BehaviorSeriesRequest):
+    try:
+        return await _respond(await run_analysis(behavior_series_payload, request))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
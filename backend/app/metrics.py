@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+# 分阶段耗时直方图的桶上界（秒）。
+_SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 单个请求内 sxtwl 调用次数直方图的桶上界。
+_CALLS_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 10000)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label: str, buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                # [各桶计数（非累计）..., 总和, 总数]
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in sorted(self._series.items())}
+        for label_value, series in snapshot.items():
+            cumulative = 0
+            for upper, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = upper if upper == "+Inf" else _format_number(upper)
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {_format_number(series[-2])}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: int = 1) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        lines.extend(f'{self.name}{{{self.label}="{label_value}"}} {value}' for label_value, value in snapshot)
+        return lines
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value))
+
+
+STAGE_SECONDS = Histogram(
+    "analysis_stage_seconds",
+    "Time spent in each analysis stage.",
+    "stage",
+    _SECONDS_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route (streaming bodies excluded).",
+    "route",
+    _SECONDS_BUCKETS,
+)
+REQUEST_SXTWL_CALLS = Histogram(
+    "analysis_request_sxtwl_calls",
+    "Number of sxtwl calls made while serving one analysis request.",
+    "operation",
+    _CALLS_BUCKETS,
+)
+SXTWL_CALLS = Counter("sxtwl_calls_total", "Calls into the sxtwl library by adapter function.", "function")
+REQUESTS = Counter("http_requests_total", "HTTP requests by route.", "route")
+
+_METRICS = (STAGE_SECONDS, REQUEST_SECONDS, REQUEST_SXTWL_CALLS, SXTWL_CALLS, REQUESTS)
+
+
+@dataclass
+class RequestTrace:
+    # 单个请求内各阶段累计耗时（秒）与 sxtwl 调用次数。
+    stages: dict[str, float] = field(default_factory=dict)
+    sxtwl_calls: dict[str, int] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    def breakdown(self) -> dict:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            "sxtwl_calls": dict(self.sxtwl_calls),
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("analysis_request_trace", default=None)
+
+
+@contextmanager
+def trace_request(operation: str) -> Iterator[RequestTrace]:
+    # 嵌套调用时沿用外层的 trace，只在最外层记录本次请求的 sxtwl 调用次数。
+    outer = _current_trace.get()
+    if outer is not None:
+        yield outer
+        return
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        REQUEST_SXTWL_CALLS.observe(operation, sum(trace.sxtwl_calls.values()))
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    # 可作上下文管理器或装饰器使用；同一阶段在一个请求内多次进入时耗时累加。
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(stage, elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.stages[stage] = trace.stages.get(stage, 0.0) + elapsed
+
+
+def count_sxtwl_call(function: str) -> None:
+    SXTWL_CALLS.inc(function)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.sxtwl_calls[function] = trace.sxtwl_calls.get(function, 0) + 1
+
+
+def observe_request(route: str, seconds: float) -> None:
+    REQUESTS.inc(route)
+    REQUEST_SECONDS.observe(route, seconds)
+
+
+def render_prometheus() -> str:
+    # 进程内指标；进程池模式下子进程中的阶段耗时不会汇总到这里。
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import date, time
+from datetime import date, datetime, time
 from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
@@ -16,10 +16,38 @@ class BirthInput(BaseModel):
 
 class HeatmapRequest(BaseModel):
     birth: BirthInput
-    view: Literal["year", "month", "day", "hour"]
+    view: Literal["year", "month", "day", "hour", "range"]
     year: Optional[int] = None
     month: Optional[int] = None
     day: Optional[int] = None
+    # 仅 range 视图使用：覆盖 [start, end)，无时区时按北京时间解释。
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    resolution: Optional[Literal["year", "month", "day", "hour"]] = None
+    # 为 True 时跳过缓存，并在 meta.debug 中返回本次计算的分阶段耗时与 sxtwl 调用次数。
+    debug: bool = False
+    # "columnar" 返回按列排列的紧凑格式（HeatmapColumnarResponse）。
+    format: Literal["cells", "columnar"] = "cells"
+    # "view" 为视图内 min–max 归一化；"global" 按离线校准表映射为代表性命盘总体中的百分位。
+    normalization: Literal["view", "global"] = "view"
+
+
+class HeatmapQuery(BaseModel):
+    # GET /api/analysis/heatmap 的查询参数：BirthInput 与视图坐标展开为同一层。
+    gender: Literal["male", "female"]
+    calendar: Literal["solar", "lunar"]
+    birth_date: date
+    birth_time: time
+    is_leap_month: bool = False
+    view: Literal["year", "month", "day", "hour", "range"]
+    year: Optional[int] = None
+    month: Optional[int] = None
+    day: Optional[int] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    resolution: Optional[Literal["year", "month", "day", "hour"]] = None
+    format: Literal["cells", "columnar"] = "cells"
+    normalization: Literal["view", "global"] = "view"
 
 
 class GanzhiPillar(BaseModel):
@@ -54,9 +82,76 @@ class HeatmapCell(BaseModel):
 
 
 class HeatmapResponse(BaseModel):
+    view: Literal["year", "month", "day", "hour", "range"]
+    next_view: Optional[Literal["month", "day", "hour"]]
+    cells: list[HeatmapCell]
+    birth_pillars: TimePillars
+    definition: str
+    uncertainty_note: str
+    meta: dict
+
+
+class HeatmapColumnarResponse(BaseModel):
+    view: Literal["year", "month", "day", "hour", "range"]
+    next_view: Optional[Literal["month", "day", "hour"]]
+    format: Literal["columnar"] = "columnar"
+    # 以下各列与格子一一对应。
+    labels: list[str]
+    values: list[float]
+    iso_datetimes: list[str]
+    # 格子 × 十神的评分矩阵（-100 ~ 100），列顺序见 meta.ten_god_keys。
+    ten_god_scores: list[list[int]]
+    # 各层级柱的六十甲子序号，指向 meta.ganzhi 查找表。
+    pillar_indices: dict[str, list[int]]
+    birth_pillars: TimePillars
+    definition: str
+    uncertainty_note: str
+    meta: dict
+
+
+class HeatmapBatchRequest(BaseModel):
+    births: list[BirthInput] = Field(min_length=1)
+    view: Literal["year", "month", "day", "hour", "range"]
+    year: Optional[int] = None
+    month: Optional[int] = None
+    day: Optional[int] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    resolution: Optional[Literal["year", "month", "day", "hour"]] = None
+    format: Literal["cells", "columnar"] = "cells"
+    normalization: Literal["view", "global"] = "view"
+
+
+class HeatmapBatchItem(BaseModel):
+    index: int
+    result: Optional[HeatmapResponse | HeatmapColumnarResponse] = None
+    error: Optional[str] = None
+
+
+class HeatmapBatchResponse(BaseModel):
+    view: Literal["year", "month", "day", "hour", "range"]
+    items: list[HeatmapBatchItem]
+
+
+class HeatmapTreeRequest(BaseModel):
+    birth: BirthInput
+    view: Literal["year", "month", "day", "hour"] = "month"
+    depth: Literal["year", "month", "day", "hour"] = "hour"
+    year: int
+    month: Optional[int] = None
+    day: Optional[int] = None
+
+
+class HeatmapTreeNode(BaseModel):
     view: Literal["year", "month", "day", "hour"]
     next_view: Optional[Literal["month", "day", "hour"]]
     cells: list[HeatmapCell]
+    # children[i] 为 cells[i] 下钻后的视图；达到 depth 时为 None。
+    children: Optional[list[HeatmapTreeNode]] = None
+
+
+class HeatmapTreeResponse(BaseModel):
+    root: HeatmapTreeNode
     birth_pillars: TimePillars
     definition: str
     uncertainty_note: str
@@ -79,3 +174,34 @@ class BehaviorResponse(BaseModel):
     focus_datetime: str
     prompts: list[BehaviorPrompt]
     uncertainty_note: str
+
+
+class BehaviorSeriesRequest(BaseModel):
+    birth: BirthInput
+    # 二选一：显式列出的时间点，或 [start, end) 按 resolution 取代表时刻（与 range 视图格子一致）。
+    focus_datetimes: Optional[list[str]] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    resolution: Optional[Literal["year", "month", "day", "hour"]] = None
+
+
+class BehaviorSeriesPoint(BaseModel):
+    focus_datetime: str
+    # 以结构类别键（见 labels）索引。
+    risk_levels: dict[str, Literal["高", "中", "低"]]
+    relative_strengths: dict[str, float]
+
+
+class BehaviorLevelRun(BaseModel):
+    risk_level: Literal["高", "中", "低"]
+    start_index: int
+    length: int
+    start_datetime: str
+
+
+class BehaviorSeriesResponse(BaseModel):
+    labels: dict[str, str]
+    points: list[BehaviorSeriesPoint]
+    # 各结构类别风险级别的游程编码，相邻时间点级别相同者合并为一段。
+    level_runs: dict[str, list[BehaviorLevelRun]]
+    uncertainty_note: str
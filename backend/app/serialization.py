@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+import pydantic_core
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from .engine.vectorized import require_numpy
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+
+# 基线（FastAPI 按 response_model 输出）由 pydantic-core 序列化。orjson 与其只在正指数浮点数上写法不同
+# （1e16 对比 1e+16），负指数（1.8526718058113102e-9）与小数写法（0.00001）完全一致；
+# 输出中出现正指数（或字符串里恰好有相似片段）时改用 pydantic-core，保证逐字节一致。
+_ORJSON_DIVERGENT = re.compile(rb"\d[eE]\d")
+
+
+def trusted_content(value: Any) -> Any:
+    # 按模型字段顺序递归展开响应模型；服务层的 dict 载荷已按字段顺序构造，原样输出。
+    if isinstance(value, BaseModel):
+        return {name: trusted_content(getattr(value, name)) for name in type(value).model_fields}
+    if isinstance(value, list) and value and isinstance(value[0], BaseModel):
+        return [trusted_content(item) for item in value]
+    return value
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        rendered = orjson.dumps(content)
+        if _ORJSON_DIVERGENT.search(rendered) is None:
+            return rendered
+    return pydantic_core.to_json(content)
+
+
+class AnalysisJSONResponse(JSONResponse):
+    # 直接输出服务层构造的响应，跳过 FastAPI 按 response_model 的二次校验与序列化。
+    def render(self, content: Any) -> bytes:
+        return dumps_json(trusted_content(content))
+
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+BINARY_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE)
+
+_MEDIA_TYPE_ALIASES = {
+    "application/json": JSON_MEDIA_TYPE,
+    "application/*": JSON_MEDIA_TYPE,
+    "*/*": JSON_MEDIA_TYPE,
+    "application/msgpack": MSGPACK_MEDIA_TYPE,
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.apache.arrow.stream": ARROW_MEDIA_TYPE,
+}
+
+# 格子内柱对象的字段顺序（与 CellPillars 一致），以及二进制编码中各列的类型。
+_CELL_PILLAR_LAYERS = ("year", "month", "day", "hour", "big_luck")
+_VALUE_DTYPE = "<f8"
+_SCORE_DTYPE = "i1"
+_PILLAR_DTYPE = "u1"
+# Arrow schema 元数据中保存非列字段（视图、命盘四柱、说明文字与 meta）的键。
+_ARROW_METADATA_KEY = b"heatmap"
+
+
+def negotiate_media_type(accept: str | None) -> str:
+    # 按 q 值选择支持的类型；未声明或无可用类型时返回 JSON。
+    best, best_q = JSON_MEDIA_TYPE, 0.0
+    for part in (accept or "").split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        candidate = _MEDIA_TYPE_ALIASES.get(media_type.lower())
+        if candidate is None:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = candidate, q
+    return best
+
+
+def _require_msgpack():
+    try:
+        import msgpack
+
+        return msgpack
+    except Exception as exc:  # pragma: no cover - runtime guard
+        raise RuntimeError("msgpack 未安装或不可用，无法输出 MessagePack 格式。") from exc
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+
+        return pyarrow
+    except Exception as exc:  # pragma: no cover - runtime guard
+        raise RuntimeError("pyarrow 未安装或不可用，无法输出 Arrow 格式。") from exc
+
+
+def _header_fields(content: dict) -> dict:
+    # 列式响应中除逐格列以外的字段。
+    return {
+        "view": content["view"],
+        "next_view": content["next_view"],
+        "birth_pillars": content["birth_pillars"],
+        "definition": content["definition"],
+        "uncertainty_note": content["uncertainty_note"],
+        "meta": content["meta"],
+    }
+
+
+def cells_from_columns(columns: dict, meta: dict) -> list[dict]:
+    # 把列式数据展开为与 HeatmapCell 相同结构的格子（字段顺序一致），用于解码与比对。
+    ganzhi = [{"stem": label[0], "branch": label[1], "label": label} for label in meta["ganzhi"]]
+    ten_god_keys = [(key, meta["ten_god_labels"].get(key, key)) for key in meta["ten_god_keys"]]
+    pillar_indices = columns["pillar_indices"]
+    return [
+        {
+            "label": label,
+            "value": value,
+            "iso_datetime": iso_datetime,
+            "ten_god_scores": [
+                {"key": key, "label": name, "score": score} for (key, name), score in zip(ten_god_keys, scores)
+            ],
+            "pillars": {layer: ganzhi[pillar_indices[layer][i]] for layer in _CELL_PILLAR_LAYERS},
+        }
+        for i, (label, value, iso_datetime, scores) in enumerate(
+            zip(columns["labels"], columns["values"], columns["iso_datetimes"], columns["ten_god_scores"])
+        )
+    ]
+
+
+def _heatmap_from_columns(header: dict, columns: dict) -> dict:
+    # 列式 meta 额外携带的查找表在还原为 HeatmapResponse 结构时去掉。
+    meta = {key: value for key, value in header["meta"].items() if key not in ("ten_god_keys", "ganzhi")}
+    return {
+        "view": header["view"],
+        "next_view": header["next_view"],
+        "cells": cells_from_columns(columns, header["meta"]),
+        "birth_pillars": header["birth_pillars"],
+        "definition": header["definition"],
+        "uncertainty_note": header["uncertainty_note"],
+        "meta": meta,
+    }
+
+
+def _msgpack_heatmap(content: dict) -> dict:
+    np = require_numpy()
+    return {
+        **_header_fields(content),
+        "format": "columnar",
+        "labels": content["labels"],
+        "iso_datetimes": content["iso_datetimes"],
+        # 数值列以小端定长类型的原始字节存放：values 为 float64，十神矩阵为 int8（按行展开，每行 10 列），柱序号为 uint8。
+        "values": np.asarray(content["values"], dtype=_VALUE_DTYPE).tobytes(),
+        "ten_god_scores": np.asarray(content["ten_god_scores"], dtype=_SCORE_DTYPE).tobytes(),
+        "pillar_indices": {
+            layer: np.asarray(indices, dtype=_PILLAR_DTYPE).tobytes()
+            for layer, indices in content["pillar_indices"].items()
+        },
+    }
+
+
+def _msgpack_columns(payload: dict) -> dict:
+    np = require_numpy()
+    width = len(payload["meta"]["ten_god_keys"])
+    return {
+        "labels": payload["labels"],
+        "iso_datetimes": payload["iso_datetimes"],
+        "values": np.frombuffer(payload["values"], dtype=_VALUE_DTYPE).tolist(),
+        "ten_god_scores": np.frombuffer(payload["ten_god_scores"], dtype=_SCORE_DTYPE).reshape(-1, width).tolist(),
+        "pillar_indices": {
+            layer: np.frombuffer(indices, dtype=_PILLAR_DTYPE).tolist()
+            for layer, indices in payload["pillar_indices"].items()
+        },
+    }
+
+
+def _arrow_schema(pa, metadata: dict, width: int, with_index: bool):
+    ganzhi_type = pa.dictionary(pa.int8(), pa.string())
+    fields = [pa.field("index", pa.int32())] if with_index else []
+    fields += [
+        pa.field("label", pa.string()),
+        pa.field("value", pa.float64()),
+        pa.field("iso_datetime", pa.string()),
+        pa.field("ten_god_scores", pa.list_(pa.int8(), width)),
+        *(pa.field(f"pillar_{layer}", ganzhi_type) for layer in _CELL_PILLAR_LAYERS),
+    ]
+    encoded = json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+    return pa.schema(fields, metadata={_ARROW_METADATA_KEY: encoded})
+
+
+def _arrow_batch(pa, schema, content: dict, index: int | None):
+    np = require_numpy()
+    width = len(content["meta"]["ten_god_keys"])
+    count = len(content["labels"])
+    # 柱序号列为字典编码：序号指向同一张六十甲子表。
+    ganzhi = pa.array(content["meta"]["ganzhi"], type=pa.string())
+    scores = np.asarray(content["ten_god_scores"], dtype=np.int8).reshape(count, width)
+    arrays = [pa.array(np.full(count, index, dtype=np.int32))] if index is not None else []
+    arrays += [
+        pa.array(content["labels"], type=pa.string()),
+        pa.array(np.asarray(content["values"], dtype=np.float64)),
+        pa.array(content["iso_datetimes"], type=pa.string()),
+        pa.FixedSizeListArray.from_arrays(pa.array(scores.reshape(-1)), width),
+        *(
+            pa.DictionaryArray.from_arrays(
+                pa.array(np.asarray(content["pillar_indices"][layer], dtype=np.int8)), ganzhi
+            )
+            for layer in _CELL_PILLAR_LAYERS
+        ),
+    ]
+    return pa.record_batch(arrays, schema=schema)
+
+
+def _arrow_stream(pa, schema, batches) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _arrow_columns(table) -> dict:
+    return {
+        "labels": table.column("label").to_pylist(),
+        "values": table.column("value").to_pylist(),
+        "iso_datetimes": table.column("iso_datetime").to_pylist(),
+        "ten_god_scores": table.column("ten_god_scores").to_pylist(),
+        "pillar_indices": {
+            layer: table.column(f"pillar_{layer}").combine_chunks().indices.to_pylist()
+            for layer in _CELL_PILLAR_LAYERS
+        },
+    }
+
+
+def encode_heatmap(response: Any, media_type: str) -> bytes:
+    # response 须为列式响应（HeatmapColumnarResponse 或其载荷）；解码结果与 HeatmapResponse 的 JSON 结构一致。
+    content = trusted_content(response)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return _require_msgpack().packb(_msgpack_heatmap(content), use_bin_type=True)
+    pa = _require_pyarrow()
+    width = len(content["meta"]["ten_god_keys"])
+    schema = _arrow_schema(pa, _header_fields(content), width, with_index=False)
+    return _arrow_stream(pa, schema, [_arrow_batch(pa, schema, content, None)])
+
+
+def encode_heatmap_batch(response: Any, media_type: str) -> bytes:
+    content = trusted_content(response)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        payload = {
+            "view": content["view"],
+            "items": [
+                {
+                    "index": item["index"],
+                    "result": _msgpack_heatmap(item["result"]) if item["result"] is not None else None,
+                    "error": item["error"],
+                }
+                for item in content["items"]
+            ],
+        }
+        return _require_msgpack().packb(payload, use_bin_type=True)
+    # Arrow：所有出生信息的格子拼成一张表，以 index 列区分；各条目的非列字段与错误信息存于 schema 元数据。
+    pa = _require_pyarrow()
+    results = [item["result"] for item in content["items"] if item["result"] is not None]
+    width = len(results[0]["meta"]["ten_god_keys"]) if results else 10
+    metadata = {
+        "view": content["view"],
+        "items": [
+            {
+                "index": item["index"],
+                "error": item["error"],
+                "result": _header_fields(item["result"]) if item["result"] is not None else None,
+            }
+            for item in content["items"]
+        ],
+    }
+    schema = _arrow_schema(pa, metadata, width, with_index=True)
+    batches = [
+        _arrow_batch(pa, schema, item["result"], item["index"]) for item in content["items"] if item["result"] is not None
+    ]
+    return _arrow_stream(pa, schema, batches)
+
+
+def decode_heatmap(body: bytes, media_type: str) -> dict:
+    # 还原为与 HeatmapResponse JSON 相同的结构，供下游客户端与回归比对使用。
+    if media_type == MSGPACK_MEDIA_TYPE:
+        payload = _require_msgpack().unpackb(body, raw=False)
+        return _heatmap_from_columns(payload, _msgpack_columns(payload))
+    pa = _require_pyarrow()
+    table = pa.ipc.open_stream(body).read_all()
+    header = json.loads(table.schema.metadata[_ARROW_METADATA_KEY])
+    return _heatmap_from_columns(header, _arrow_columns(table))
+
+
+def decode_heatmap_batch(body: bytes, media_type: str) -> dict:
+    if media_type == MSGPACK_MEDIA_TYPE:
+        payload = _require_msgpack().unpackb(body, raw=False)
+        items = [
+            {
+                "index": item["index"],
+                "result": (
+                    _heatmap_from_columns(item["result"], _msgpack_columns(item["result"]))
+                    if item["result"] is not None
+                    else None
+                ),
+                "error": item["error"],
+            }
+            for item in payload["items"]
+        ]
+        return {"view": payload["view"], "items": items}
+    pa = _require_pyarrow()
+    reader = pa.ipc.open_stream(body)
+    metadata = json.loads(reader.schema.metadata[_ARROW_METADATA_KEY])
+    tables = {}
+    for batch in reader:
+        table = pa.Table.from_batches([batch])
+        tables[table.column("index")[0].as_py()] = table
+    items = []
+    for item in metadata["items"]:
+        result = None
+        if item["result"] is not None:
+            result = _heatmap_from_columns(item["result"], _arrow_columns(tables[item["index"]]))
+        items.append({"index": item["index"], "result": result, "error": item["error"]})
+    return {"view": metadata["view"], "items": items}
@@ -1,37 +1,84 @@
 from __future__ import annotations
 
+import hashlib
+from bisect import bisect_right
 from dataclasses import dataclass
-from datetime import date, datetime, time
-from math import floor
-
-from ..adapters.sxtwl_adapter import (
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from itertools import islice
+from math import ceil, floor, inf, nextafter
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlencode
+
+from ..adapters.calendar import (
     next_jieqi_datetime,
+    pillar_indices_from_solar,
     pillars_from_lunar,
     pillars_from_solar,
     prev_jieqi_datetime,
 )
 from ..config import (
+    BEHAVIOR_SERIES_MAX_POINTS,
     CHINA_TZ,
+    CONFIG_VERSION,
+    HEATMAP_BATCH_MAX_BIRTHS,
+    HEATMAP_CACHE_MAX_BYTES,
+    HEATMAP_CACHE_MAX_ENTRIES,
+    HEATMAP_CACHE_TTL_SECONDS,
+    HEATMAP_ENGINE,
+    HEATMAP_STREAM_CHUNK_SIZE,
+    HEATMAP_TREE_MAX_CELLS,
+    NATAL_CACHE_MAX_BYTES,
+    NATAL_CACHE_MAX_ENTRIES,
+    RANGE_VIEW_MAX_CELLS,
+    RAW_STORE_READ_MAX_POINTS,
+    SHARED_CACHE_MAX_BYTES,
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_SLOTS,
     SHORT_CYCLE_FACTOR_MAX,
     SHORT_CYCLE_FACTOR_MIN,
     TIME_LAYER_WEIGHTS,
     YEAR_VIEW_WINDOW,
 )
-from ..engine.bazi import BaziProfile, Pillar, Pillars, compute_bazi_profile
-from ..engine.constants import BRANCHES, STEMS, STEM_POLARITY
+from ..engine.bazi import GANZHI_CYCLE, GANZHI_INDEX, BaziProfile, Pillar, Pillars, compute_bazi_profile
+from ..engine.constants import STEM_POLARITY
 from ..engine.scoring import (
     CATEGORIES,
     merge_scores,
     merge_ten_god_scores,
+    pillar_scores,
+    pillar_ten_god_scores,
     relative_ratio,
     risk_level_from_ratio,
-    score_pillar,
-    score_pillar_ten_gods,
     score_summary,
     structure_labels,
 )
 from ..engine.ten_gods import TEN_GODS, ten_god_labels
-from ..models import BehaviorResponse, HeatmapResponse
+from ..engine.vectorized import (
+    LAYERS,
+    AnalyticBounds,
+    ViewRawScores,
+    analytic_bounds,
+    normalize_view,
+    normalize_with_bounds,
+    normalize_with_table,
+    require_numpy,
+    view_raw_scores,
+)
+from ..metrics import stage_timer, trace_request
+from ..models import (
+    BehaviorResponse,
+    BehaviorSeriesResponse,
+    HeatmapBatchResponse,
+    HeatmapColumnarResponse,
+    HeatmapRequest,
+    HeatmapResponse,
+    HeatmapTreeResponse,
+)
+from .cache import LRUCache
+from .calibration_table import calibration_table
+from .raw_store import raw_cell_store
+from .shared_cache import tiered_cache
 
 
 @dataclass(frozen=True)
@@ -49,6 +96,27 @@ class TimePoint:
     dt: datetime
 
 
+@dataclass(frozen=True)
+class ViewSpec:
+    view: str
+    year: Optional[int] = None
+    month: Optional[int] = None
+    day: Optional[int] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    resolution: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ViewTimeline:
+    view: str
+    points: list[TimePoint]
+    # 每个点的 (年, 月, 日, 时) 六十甲子序号；与出生信息无关，可在多个命盘间共享。
+    time_indices: list[tuple[int, int, int, int]]
+    # 每个点的北京时间墙上时间（1970-01-01 起的整秒数），供各命盘的大运时间线批量查找。
+    wall_seconds: list[int]
+
+
 @dataclass(frozen=True)
 class LuckContext:
     forward: bool
@@ -57,9 +125,50 @@ class LuckContext:
     birth_dt: datetime
 
 
-_GANZHI_CYCLE = [Pillar(stem=STEMS[i % 10], branch=BRANCHES[i % 12]) for i in range(60)]
-_GANZHI_INDEX = {(pillar.stem, pillar.branch): idx for idx, pillar in enumerate(_GANZHI_CYCLE)}
+@dataclass(frozen=True)
+class LuckTimeline:
+    # 单个命盘的大运时间线：offsets 为各步大运起点距出生时刻的秒数（升序），
+    # indices[i] 为 offsets[i - 1] <= 秒数 < offsets[i] 期间的大运六十甲子序号。
+    # 首尾两段超出覆盖范围，回退到逐点公式。
+    context: LuckContext
+    birth_wall_seconds: int
+    offsets: tuple[float, ...]
+    indices: tuple[int, ...]
+
+    def index_at(self, target_dt: datetime) -> int:
+        position = bisect_right(self.offsets, (target_dt - self.context.birth_dt).total_seconds())
+        if 0 < position < len(self.offsets):
+            return self.indices[position]
+        return _big_luck_index(self.context, target_dt)
+
+    def indices_at(self, wall_seconds: list[int]):
+        # 同一时区对象的 aware datetime 相减按墙上时间计算，整秒差与逐点公式中的 total_seconds() 相同。
+        np = require_numpy()
+        seconds = (np.asarray(wall_seconds, dtype=np.int64) - self.birth_wall_seconds).astype(np.float64)
+        positions = np.searchsorted(np.asarray(self.offsets), seconds, side="right")
+        indices = np.asarray(self.indices, dtype=np.intp)[positions]
+        for position in np.flatnonzero((positions == 0) | (positions == len(self.offsets))).tolist():
+            indices[position] = _luck_cycle_index(self.context, _luck_cycle(self.context, float(seconds[position])))
+        return indices
+
+
 _SECONDS_PER_YEAR = 365.2425 * 86400
+_WALL_EPOCH = datetime(1970, 1, 1)
+# 单个 HeatmapCell（含十神与五柱子模型）驻留内存的粗略估计，用于缓存字节上限。
+_CELL_BYTES_ESTIMATE = 10 * 1024
+_COLUMNAR_CELL_BYTES_ESTIMATE = 1024
+
+
+def view_spec(request) -> ViewSpec:
+    return ViewSpec(
+        view=request.view,
+        year=request.year,
+        month=request.month,
+        day=request.day,
+        start=getattr(request, "start", None),
+        end=getattr(request, "end", None),
+        resolution=getattr(request, "resolution", None),
+    )
 
 
 def normalize_birth(birth) -> BirthInfo:
@@ -103,6 +212,7 @@ def _luck_direction(birth: BirthInfo, birth_pillars: Pillars) -> bool:
     return (birth.gender == "male" and is_yang) or (birth.gender == "female" and not is_yang)
 
 
+@stage_timer("luck_start")
 def _luck_start_age_years(birth_dt: datetime, forward: bool) -> float:
     # 子平法：以出生时刻到最近节气的时间差，三天折一年。
     if forward:
@@ -119,7 +229,7 @@ def _luck_context(birth: BirthInfo, birth_pillars: Pillars) -> LuckContext:
     birth_dt = _china_datetime(birth.birth_date, birth.birth_time)
     forward = _luck_direction(birth, birth_pillars)
     start_age_years = _luck_start_age_years(birth_dt, forward)
-    month_index = _GANZHI_INDEX[(birth_pillars.month.stem, birth_pillars.month.branch)]
+    month_index = GANZHI_INDEX[(birth_pillars.month.stem, birth_pillars.month.branch)]
     return LuckContext(
         forward=forward,
         start_age_years=start_age_years,
@@ -145,22 +255,76 @@ def _birth_pillars(birth: BirthInfo) -> Pillars:
     )
 
 
+@stage_timer("time_pillars")
 def _time_pillars(dt: datetime) -> Pillars:
     return pillars_from_solar(dt.year, dt.month, dt.day, dt.hour)
 
 
-def _big_luck_pillar(context: LuckContext, target_dt: datetime) -> Pillar:
-    age_years = (target_dt - context.birth_dt).total_seconds() / _SECONDS_PER_YEAR
-    cycles = floor((age_years - context.start_age_years) / 10.0)
+def _luck_cycle(context: LuckContext, seconds: float) -> int:
+    age_years = seconds / _SECONDS_PER_YEAR
+    return floor((age_years - context.start_age_years) / 10.0)
+
+
+def _luck_cycle_index(context: LuckContext, cycles: int) -> int:
     # 起运前 cycles 会为 -1，此时 step=0，等同使用本命月柱占位。
     step = (cycles + 1) * (1 if context.forward else -1)
-    idx = (context.month_index + step) % 60
-    return _GANZHI_CYCLE[idx]
+    return (context.month_index + step) % 60
+
+
+def _big_luck_index(context: LuckContext, target_dt: datetime) -> int:
+    return _luck_cycle_index(context, _luck_cycle(context, (target_dt - context.birth_dt).total_seconds()))
+
+
+# 大运时间线覆盖的周期（相对起运），约为出生前后各两百年。
+_LUCK_TIMELINE_CYCLES = range(-20, 21)
+
+
+def _luck_cycle_start(context: LuckContext, cycles: int) -> float:
+    # 取使 _luck_cycle 恰好达到 cycles 的最小秒数，结果与逐点公式逐位一致。
+    # 在估计值两侧扩大区间直至夹住边界，再对浮点数二分到相邻两数；不逐个 ULP 步进，
+    # 起点在 0 附近（起运年龄为 0）时也不会穿行次正规数。
+    estimate = (context.start_age_years + cycles * 10.0) * _SECONDS_PER_YEAR
+    delta = max(abs(estimate) * 1e-12, 1e-3)
+    low, high = estimate - delta, estimate + delta
+    while _luck_cycle(context, low) >= cycles:
+        low -= delta
+        delta *= 2
+    while _luck_cycle(context, high) < cycles:
+        high += delta
+        delta *= 2
+    while nextafter(low, inf) < high:
+        middle = low + (high - low) / 2
+        if not low < middle < high:
+            middle = nextafter(low, inf)
+        if _luck_cycle(context, middle) >= cycles:
+            high = middle
+        else:
+            low = middle
+    return high
+
+
+def _wall_seconds(dt: datetime) -> int:
+    return (dt.replace(tzinfo=None) - _WALL_EPOCH) // timedelta(seconds=1)
+
+
+def _luck_timeline(birth: BirthInfo, birth_pillars: Pillars) -> LuckTimeline:
+    context = _luck_context(birth, birth_pillars)
+    first = _LUCK_TIMELINE_CYCLES.start
+    return LuckTimeline(
+        context=context,
+        birth_wall_seconds=_wall_seconds(context.birth_dt),
+        offsets=tuple(_luck_cycle_start(context, cycles) for cycles in _LUCK_TIMELINE_CYCLES),
+        indices=tuple(_luck_cycle_index(context, cycles) for cycles in range(first - 1, _LUCK_TIMELINE_CYCLES.stop)),
+    )
+
+
+def _big_luck_pillar(luck: LuckTimeline, target_dt: datetime) -> Pillar:
+    return GANZHI_CYCLE[luck.index_at(target_dt)]
 
 
-def _build_profile(birth: BirthInfo) -> BaziProfile:
-    pillars = _birth_pillars(birth)
-    return compute_bazi_profile(pillars, stem_weight=1.0, hidden_weight=0.6)
+@stage_timer("natal_profile")
+def _build_profile(birth_pillars: Pillars) -> BaziProfile:
+    return compute_bazi_profile(birth_pillars, stem_weight=1.0, hidden_weight=0.6)
 
 
 def _year_points(center_year: int) -> list[TimePoint]:
@@ -206,7 +370,93 @@ def _hour_points(year: int, month: int, day: int) -> list[TimePoint]:
     ]
 
 
-def _points_for_view(view: str, year: int | None, month: int | None, day: int | None) -> list[TimePoint]:
+def _china_aware(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=CHINA_TZ)
+    try:
+        return dt.astimezone(CHINA_TZ)
+    except OverflowError:
+        raise ValueError("时间换算为北京时间后超出支持的日期范围（公元 1–9999 年）") from None
+
+
+def _bucket_start(dt: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return datetime(dt.year, dt.month, dt.day, dt.hour, tzinfo=CHINA_TZ)
+    if resolution == "day":
+        return datetime(dt.year, dt.month, dt.day, tzinfo=CHINA_TZ)
+    if resolution == "month":
+        return datetime(dt.year, dt.month, 1, tzinfo=CHINA_TZ)
+    return datetime(dt.year, 1, 1, tzinfo=CHINA_TZ)
+
+
+def _next_bucket(bucket: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return bucket + timedelta(hours=1)
+    if resolution == "day":
+        return bucket + timedelta(days=1)
+    if resolution == "month":
+        if bucket.month == 12:
+            return bucket.replace(year=bucket.year + 1, month=1)
+        return bucket.replace(month=bucket.month + 1)
+    return bucket.replace(year=bucket.year + 1)
+
+
+def _range_bucket_count(first: datetime, end: datetime, resolution: str) -> int:
+    if resolution == "hour":
+        return ceil((end - first) / timedelta(hours=1))
+    if resolution == "day":
+        return ceil((end - first) / timedelta(days=1))
+    end_bucket = _bucket_start(end, resolution)
+    partial_bucket = 1 if end > end_bucket else 0
+    if resolution == "month":
+        return (end.year - first.year) * 12 + (end.month - first.month) + partial_bucket
+    return (end.year - first.year) + partial_bucket
+
+
+_RANGE_LABEL_FORMATS = {"year": "%Y", "month": "%Y-%m", "day": "%Y-%m-%d", "hour": "%Y-%m-%d %H:00"}
+
+
+def _range_point(bucket: datetime, resolution: str) -> TimePoint:
+    # 代表时刻与固定视图一致：年取 7 月 1 日正午，月取 15 日正午，日取正午，时取整点。
+    if resolution == "year":
+        dt = bucket.replace(month=7, day=1, hour=12)
+    elif resolution == "month":
+        dt = bucket.replace(day=15, hour=12)
+    elif resolution == "day":
+        dt = bucket.replace(hour=12)
+    else:
+        dt = bucket
+    return TimePoint(label=bucket.strftime(_RANGE_LABEL_FORMATS[resolution]), dt=dt)
+
+
+def _range_buckets(spec: ViewSpec) -> tuple[datetime, int]:
+    if spec.start is None or spec.end is None or spec.resolution is None:
+        raise ValueError("range 视图需要提供 start、end 与 resolution")
+    if spec.resolution not in _RANGE_LABEL_FORMATS:
+        raise ValueError("resolution 需为 year、month、day 或 hour")
+    start = _china_aware(spec.start)
+    end = _china_aware(spec.end)
+    if end <= start:
+        raise ValueError("range 视图的 end 需晚于 start")
+    first = _bucket_start(start, spec.resolution)
+    count = _range_bucket_count(first, end, spec.resolution)
+    if count > RANGE_VIEW_MAX_CELLS:
+        raise ValueError(f"range 视图最多支持 {RANGE_VIEW_MAX_CELLS} 个格子，当前为 {count} 个")
+    return first, count
+
+
+def _iter_range_points(first: datetime, count: int, resolution: str) -> Iterator[TimePoint]:
+    # 覆盖 [start, end) 的所有时间桶，起始桶按分辨率向下取整。最后一个桶之后不再推进，
+    # 终点在 9999 年内的范围不会因计算下一个桶而越界。
+    bucket = first
+    for index in range(count):
+        if index:
+            bucket = _next_bucket(bucket, resolution)
+        yield _range_point(bucket, resolution)
+
+
+def _points_for_view(spec: ViewSpec) -> list[TimePoint]:
+    view, year, month, day = spec.view, spec.year, spec.month, spec.day
     if view == "year":
         if year is None:
             raise ValueError("year 视图需要提供 year")
@@ -223,38 +473,41 @@ def _points_for_view(view: str, year: int | None, month: int | None, day: int |
         if year is None or month is None or day is None:
             raise ValueError("hour 视图需要提供 year、month、day")
         return _hour_points(year, month, day)
+    if view == "range":
+        first, count = _range_buckets(spec)
+        return list(_iter_range_points(first, count, spec.resolution))
     raise ValueError("未知视图类型")
 
 
 def _layer_scores(
     profile: BaziProfile,
-    context: LuckContext,
+    luck: LuckTimeline,
     dt: datetime,
 ) -> dict[str, dict[str, float]]:
     pillars = _time_pillars(dt)
-    big_luck = _big_luck_pillar(context, dt)
+    big_luck = _big_luck_pillar(luck, dt)
     return {
-        "big_luck": score_pillar(profile, big_luck),
-        "year": score_pillar(profile, pillars.year),
-        "month": score_pillar(profile, pillars.month),
-        "day": score_pillar(profile, pillars.day),
-        "hour": score_pillar(profile, pillars.hour),
+        "big_luck": pillar_scores(profile, big_luck),
+        "year": pillar_scores(profile, pillars.year),
+        "month": pillar_scores(profile, pillars.month),
+        "day": pillar_scores(profile, pillars.day),
+        "hour": pillar_scores(profile, pillars.hour),
     }
 
 
 def _layer_ten_god_scores(
     profile: BaziProfile,
-    context: LuckContext,
+    luck: LuckTimeline,
     dt: datetime,
 ) -> dict[str, dict[str, float]]:
     pillars = _time_pillars(dt)
-    big_luck = _big_luck_pillar(context, dt)
+    big_luck = _big_luck_pillar(luck, dt)
     return {
-        "big_luck": score_pillar_ten_gods(profile, big_luck),
-        "year": score_pillar_ten_gods(profile, pillars.year),
-        "month": score_pillar_ten_gods(profile, pillars.month),
-        "day": score_pillar_ten_gods(profile, pillars.day),
-        "hour": score_pillar_ten_gods(profile, pillars.hour),
+        "big_luck": pillar_ten_god_scores(profile, big_luck),
+        "year": pillar_ten_god_scores(profile, pillars.year),
+        "month": pillar_ten_god_scores(profile, pillars.month),
+        "day": pillar_ten_god_scores(profile, pillars.day),
+        "hour": pillar_ten_god_scores(profile, pillars.hour),
     }
 
 
@@ -279,22 +532,17 @@ def _short_cycle_component(layer_scores: dict[str, dict[str, float]]) -> float:
     return month + day + hour
 
 
-def build_heatmap_response(request) -> HeatmapResponse:
-    birth = normalize_birth(request.birth)
-    profile = _build_profile(birth)
-    birth_pillars = _birth_pillars(birth)
-    luck_context = _luck_context(birth, birth_pillars)
-    points = _points_for_view(request.view, request.year, request.month, request.day)
-
+def _reference_cells(profile: BaziProfile, luck: LuckTimeline, points: list[TimePoint]) -> list[dict]:
+    # 逐点参考实现：保留作为向量化引擎的对照基准。
     short_components = []
     cell_raw = []
     ten_god_snapshots = []
 
     for point in points:
         time_pillars = _time_pillars(point.dt)
-        big_luck_pillar = _big_luck_pillar(luck_context, point.dt)
-        layer_scores = _layer_scores(profile, luck_context, point.dt)
-        ten_god_layer_scores = _layer_ten_god_scores(profile, luck_context, point.dt)
+        big_luck_pillar = _big_luck_pillar(luck, point.dt)
+        layer_scores = _layer_scores(profile, luck, point.dt)
+        ten_god_layer_scores = _layer_ten_god_scores(profile, luck, point.dt)
         ten_god_scores = _weighted_ten_god_scores(ten_god_layer_scores)
         long_base = (
             score_summary(layer_scores["big_luck"]) * TIME_LAYER_WEIGHTS["big_luck"]
@@ -308,15 +556,12 @@ def build_heatmap_response(request) -> HeatmapResponse:
                 point,
                 ten_god_scores,
                 {
-                    "big_luck": _pillar_payload(big_luck_pillar),
                     **_time_pillars_payload(time_pillars),
+                    "big_luck": _pillar_payload(big_luck_pillar),
                 },
             )
         )
 
-    if not cell_raw:
-        raise ValueError("无法生成 heatmap 数据")
-
     short_min = min(short_components)
     short_max = max(short_components)
     short_span = max(1e-6, short_max - short_min)
@@ -340,7 +585,7 @@ def build_heatmap_response(request) -> HeatmapResponse:
     max_abs_ten_god = max(1e-6, max_abs_ten_god)
     ten_god_name_map = ten_god_labels()
 
-    cells = [
+    return [
         {
             "label": point.label,
             "value": (value - v_min) / span,
@@ -358,55 +603,707 @@ def build_heatmap_response(request) -> HeatmapResponse:
         for (point, value), (_, scores, pillars_payload) in zip(activations, ten_god_snapshots)
     ]
 
-    next_view = {"year": "month", "month": "day", "day": "hour", "hour": None}[request.view]
 
-    return HeatmapResponse(
-        view=request.view,
-        next_view=next_view,
-        cells=cells,
-        birth_pillars=_time_pillars_payload(birth_pillars),
-        definition=(
-            "颜色强度表示：该时间层级中结构被激活的相对强度；"
-            "格子内展示对应层级的大运/流年/流月/流日/流时天干地支；"
-            "十神评分为视图内相对值（-100 ~ 100），负值代表承载不足。"
-        ),
-        uncertainty_note="该结果为时间结构相对强度展示，受时间边界与输入精度影响，存在不确定性。",
-        meta={
-            "day_master": profile.day_master,
-            "day_master_strength": profile.day_master_strength_label,
-            "structure_labels": structure_labels(),
-            "ten_god_labels": ten_god_name_map,
+_PILLAR_PAYLOADS = [_pillar_payload(pillar) for pillar in GANZHI_CYCLE]
+_GANZHI_LABELS = [payload["label"] for payload in _PILLAR_PAYLOADS]
+_GANZHI_LABEL_INDEX = {label: index for index, label in enumerate(_GANZHI_LABELS)}
+
+
+def _timeline_layer_indices(luck: LuckTimeline, timeline: ViewTimeline):
+    np = require_numpy()
+    points = timeline.points
+    # 列顺序：大运、年、月、日、时，与 vectorized.LAYERS 一致。
+    indices = np.empty((len(points), 5), dtype=np.intp)
+    indices[:, 0] = luck.indices_at(timeline.wall_seconds)
+    indices[:, 1:] = timeline.time_indices
+    return indices
+
+
+def _cell_payloads(points: list[TimePoint], values, ten_god_scores, indices) -> list[dict]:
+    ten_god_name_map = ten_god_labels()
+    ten_god_keys = [(god, ten_god_name_map.get(god, god)) for god in TEN_GODS]
+    return [
+        {
+            "label": point.label,
+            "value": value,
+            "iso_datetime": point.dt.isoformat(),
+            "ten_god_scores": [
+                {"key": god, "label": label, "score": score}
+                for (god, label), score in zip(ten_god_keys, scores)
+            ],
+            "pillars": {
+                "year": _PILLAR_PAYLOADS[year],
+                "month": _PILLAR_PAYLOADS[month],
+                "day": _PILLAR_PAYLOADS[day],
+                "hour": _PILLAR_PAYLOADS[hour],
+                "big_luck": _PILLAR_PAYLOADS[big_luck],
+            },
+        }
+        for point, value, scores, (big_luck, year, month, day, hour) in zip(
+            points, values.tolist(), ten_god_scores.tolist(), indices.tolist()
+        )
+    ]
+
+
+def _column_payload(points: list[TimePoint], values, ten_god_scores, indices) -> dict:
+    np = require_numpy()
+    return {
+        "labels": [point.label for point in points],
+        "values": values.tolist(),
+        "iso_datetimes": [point.dt.isoformat() for point in points],
+        "ten_god_scores": ten_god_scores.astype(np.int8).tolist(),
+        "pillar_indices": {layer: indices[:, column].tolist() for column, layer in enumerate(LAYERS)},
+    }
+
+
+def _columns_from_cells(cells: list[dict]) -> dict:
+    # 参考实现只产出逐格 dict，按列重排即可得到相同取值。
+    return {
+        "labels": [cell["label"] for cell in cells],
+        "values": [cell["value"] for cell in cells],
+        "iso_datetimes": [cell["iso_datetime"] for cell in cells],
+        "ten_god_scores": [[item["score"] for item in cell["ten_god_scores"]] for cell in cells],
+        "pillar_indices": {
+            layer: [_GANZHI_LABEL_INDEX[cell["pillars"][layer]["label"]] for cell in cells] for layer in LAYERS
         },
+    }
+
+
+def _chart_identity(profile: BaziProfile, luck: LuckTimeline) -> str:
+    # 原始分量取决于本命四柱、大运排法与时间点；大运交接时刻由出生时刻与起运岁数决定，
+    # 因此出生时刻也在键中，只有出生时刻与大运排法都相同的请求才共享存储条目。
+    pillars = profile.pillars
+    context = luck.context
+    return "|".join(
+        (
+            *(f"{pillar.stem}{pillar.branch}" for pillar in (pillars.year, pillars.month, pillars.day, pillars.hour)),
+            "forward" if context.forward else "backward",
+            repr(context.start_age_years),
+            context.birth_dt.isoformat(),
+        )
     )
 
 
-def build_behavior_response(request) -> BehaviorResponse:
+def _view_raw_scores(profile: BaziProfile, luck: LuckTimeline, timeline: ViewTimeline, indices):
+    store = raw_cell_store()
+    # 超过 RAW_STORE_READ_MAX_POINTS 格的视图从不读回，也就不写入。
+    if store is None or len(timeline.wall_seconds) > RAW_STORE_READ_MAX_POINTS:
+        return view_raw_scores(profile, indices)
+    chart = _chart_identity(profile, luck)
+    # 本进程已填充该命盘的评分矩阵时重算总是快于读回；只有新建的命盘记录（进程冷启动或命盘缓存未命中）才先查存储。
+    if "scores" not in profile.matrix_cache:
+        with stage_timer("raw_store"):
+            raw = store.get_view(chart, timeline.wall_seconds)
+        if raw is not None:
+            return raw
+    raw = view_raw_scores(profile, indices)
+    store.put_view(chart, timeline.wall_seconds, raw)
+    return raw
+
+
+def _vectorized_scores(profile: BaziProfile, luck: LuckTimeline, timeline: ViewTimeline, normalization: str = "view"):
+    with stage_timer("scoring"):
+        indices = _timeline_layer_indices(luck, timeline)
+        raw = _view_raw_scores(profile, luck, timeline, indices)
+    with stage_timer("normalization"):
+        if normalization == "global":
+            values, ten_god_scores = normalize_with_table(raw, calibration_table())
+        else:
+            values, ten_god_scores = normalize_view(raw)
+    return values, ten_god_scores, indices
+
+
+def _vectorized_cells(
+    profile: BaziProfile,
+    luck: LuckTimeline,
+    timeline: ViewTimeline,
+    normalization: str = "view",
+) -> list[dict]:
+    values, ten_god_scores, indices = _vectorized_scores(profile, luck, timeline, normalization)
+    with stage_timer("cell_payloads"):
+        return _cell_payloads(timeline.points, values, ten_god_scores, indices)
+
+
+def _view_coordinates(spec: ViewSpec) -> tuple:
+    # 只保留视图实际使用的坐标，使等价请求得到相同的键。
+    if spec.view == "range":
+        start = _china_aware(spec.start).isoformat() if spec.start else None
+        end = _china_aware(spec.end).isoformat() if spec.end else None
+        return (start, end, spec.resolution)
+    return {
+        "year": (spec.year,),
+        "month": (spec.year,),
+        "day": (spec.year, spec.month),
+        "hour": (spec.year, spec.month, spec.day),
+    }.get(spec.view, (spec.year, spec.month, spec.day))
+
+
+def _normalization_key(normalization: str) -> str:
+    # 全局归一化的结果还取决于校准表内容，以表摘要区分；表缺失时在此处即报错（503）。
+    if normalization == "global":
+        return f"global:{calibration_table().digest}"
+    return normalization
+
+
+def heatmap_cache_key(request) -> tuple:
     birth = normalize_birth(request.birth)
-    profile = _build_profile(birth)
-    birth_pillars = _birth_pillars(birth)
-    luck_context = _luck_context(birth, birth_pillars)
+    return (
+        CONFIG_VERSION,
+        request.format,
+        _normalization_key(request.normalization),
+        birth.gender,
+        birth.calendar,
+        birth.birth_date.isoformat(),
+        birth.birth_time.replace(microsecond=0, tzinfo=None).isoformat(),
+        birth.is_leap_month if birth.calendar == "lunar" else False,
+        request.view,
+        *_view_coordinates(view_spec(request)),
+    )
+
+
+def _heatmap_payload_bytes(payload: dict) -> int:
+    if payload.get("format") == "columnar":
+        return len(payload["values"]) * _COLUMNAR_CELL_BYTES_ESTIMATE
+    return len(payload["cells"]) * _CELL_BYTES_ESTIMATE
+
+
+# 各视图实际使用的坐标参数名，与 _view_coordinates 的返回值一一对应。
+_VIEW_COORDINATE_NAMES = {
+    "year": ("year",),
+    "month": ("year",),
+    "day": ("year", "month"),
+    "hour": ("year", "month", "day"),
+    "range": ("start", "end", "resolution"),
+}
+
+
+def heatmap_request_from_query(query) -> HeatmapRequest:
+    # GET 查询参数为扁平结构，这里组装为与 POST 相同的请求模型（出生信息仍经 BirthInput 校验）。
+    fields = query.model_dump()
+    birth = {name: fields.pop(name) for name in ("gender", "calendar", "birth_date", "birth_time", "is_leap_month")}
+    return HeatmapRequest(birth=birth, **fields)
+
+
+def canonical_heatmap_query(request) -> str:
+    # 规范化查询串：只保留视图用到的坐标、省略默认值、按参数名排序，使等价请求得到同一 URL。
+    birth = normalize_birth(request.birth)
+    params = {
+        "gender": birth.gender,
+        "calendar": birth.calendar,
+        "birth_date": birth.birth_date.isoformat(),
+        "birth_time": birth.birth_time.replace(microsecond=0, tzinfo=None).isoformat(),
+        "view": request.view,
+    }
+    if birth.calendar == "lunar" and birth.is_leap_month:
+        params["is_leap_month"] = "true"
+    if request.format != "cells":
+        params["format"] = request.format
+    if request.normalization != "view":
+        params["normalization"] = request.normalization
+    coordinates = zip(_VIEW_COORDINATE_NAMES[request.view], _view_coordinates(view_spec(request)))
+    params.update({name: str(value) for name, value in coordinates if value is not None})
+    return urlencode(sorted(params.items()))
+
+
+def heatmap_etag(request, media_type: str) -> str:
+    # 强 ETag：缓存键已含 CONFIG_VERSION（权重与 ENGINE_REVISION），再区分编码格式。
+    digest = hashlib.sha256(repr((heatmap_cache_key(request), media_type)).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+# 配置 SHARED_CACHE_PATH 时在进程内 LRU 之后叠加跨 worker 的共享层。
+_heatmap_cache = tiered_cache(
+    LRUCache(
+        max_entries=HEATMAP_CACHE_MAX_ENTRIES,
+        max_bytes=HEATMAP_CACHE_MAX_BYTES,
+        ttl_seconds=HEATMAP_CACHE_TTL_SECONDS,
+        sizeof=_heatmap_payload_bytes,
+    ),
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_MAX_BYTES,
+    SHARED_CACHE_SLOTS,
+)
+
+
+def heatmap_cache_stats() -> dict[str, float]:
+    return _heatmap_cache.stats()
+
+
+def cached_heatmap_payload(request) -> Optional[dict]:
+    # debug 请求需要本次计算的耗时明细，不读也不写缓存。缓存的载荷在请求间共享，调用方不得修改。
+    if request.debug:
+        return None
+    return _heatmap_cache.get(heatmap_cache_key(request))
+
+
+def store_heatmap_payload(request, payload: dict) -> None:
+    if not request.debug:
+        _heatmap_cache.put(heatmap_cache_key(request), payload)
+
+
+def heatmap_payload(request) -> dict:
+    payload = cached_heatmap_payload(request)
+    if payload is None:
+        payload = compute_heatmap_payload(request)
+        store_heatmap_payload(request, payload)
+    return payload
+
+
+def _heatmap_response_model(request) -> type[HeatmapResponse] | type[HeatmapColumnarResponse]:
+    return HeatmapColumnarResponse if request.format == "columnar" else HeatmapResponse
+
+
+def build_heatmap_response(request) -> HeatmapResponse | HeatmapColumnarResponse:
+    # 面向 Python 调用方返回经过校验的响应模型；HTTP 层直接输出载荷，不经这一步。
+    return _heatmap_response_model(request).model_validate(heatmap_payload(request))
+
+
+@stage_timer("time_pillars")
+def _timeline_for_points(view: str, points: list[TimePoint]) -> ViewTimeline:
+    time_indices = [pillar_indices_from_solar(p.dt.year, p.dt.month, p.dt.day, p.dt.hour) for p in points]
+    wall_seconds = [_wall_seconds(p.dt) for p in points]
+    return ViewTimeline(view=view, points=points, time_indices=time_indices, wall_seconds=wall_seconds)
+
+
+def _uses_reference(normalization: str) -> bool:
+    # 全局归一化只有向量化实现，不受 HEATMAP_ENGINE 影响。
+    return HEATMAP_ENGINE == "reference" and normalization == "view"
+
+
+def _view_timeline(spec: ViewSpec, normalization: str = "view") -> ViewTimeline:
+    points = _points_for_view(spec)
+    if not points:
+        raise ValueError("无法生成 heatmap 数据")
+    if _uses_reference(normalization):
+        # 参考实现逐点自行求柱，这里不预先解析。
+        return ViewTimeline(view=spec.view, points=points, time_indices=[], wall_seconds=[])
+    return _timeline_for_points(spec.view, points)
+
+
+def compute_heatmap_payload(request) -> dict:
+    # 不经缓存计算热力图，返回按响应模型字段顺序构造的 dict 载荷。
+    with trace_request("heatmap") as trace:
+        timeline = _view_timeline(view_spec(request), request.normalization)
+        birth = normalize_birth(request.birth)
+        if request.format == "columnar":
+            payload = _columnar_payload_for_birth(birth, timeline, request.normalization)
+        else:
+            payload = _heatmap_payload_for_birth(birth, timeline, request.normalization)
+    if request.debug:
+        payload["meta"]["debug"] = trace.breakdown()
+    return payload
+
+
+def compute_heatmap_response(request) -> HeatmapResponse | HeatmapColumnarResponse:
+    return _heatmap_response_model(request).model_validate(compute_heatmap_payload(request))
+
+
+_NEXT_VIEW = {"year": "month", "month": "day", "day": "hour", "hour": None, "range": None}
+
+_HEATMAP_DEFINITION = (
+    "颜色强度表示：该时间层级中结构被激活的相对强度；"
+    "格子内展示对应层级的大运/流年/流月/流日/流时天干地支；"
+    "十神评分为视图内相对值（-100 ~ 100），负值代表承载不足。"
+)
+
+_GLOBAL_HEATMAP_DEFINITION = (
+    "颜色强度表示：该格子结构激活值在代表性命盘总体（全局校准表）中的百分位，可在不同视图、不同命盘之间比较；"
+    "格子内展示对应层级的大运/流年/流月/流日/流时天干地支；"
+    "十神评分为视图内相对值（-100 ~ 100），负值代表承载不足。"
+)
+
+_HEATMAP_UNCERTAINTY_NOTE = "该结果为时间结构相对强度展示，受时间边界与输入精度影响，存在不确定性。"
+
+
+@dataclass(frozen=True)
+class NatalRecord:
+    # 只由出生信息决定的全部中间结果；跨请求共享，调用方不得修改其中的 dict。
+    pillars: Pillars
+    profile: BaziProfile
+    luck: LuckTimeline
+    baseline_scores: dict[str, float]
 
+
+# 单条命盘记录（含惰性填充的评分表与向量化矩阵）驻留内存的粗略估计。
+_NATAL_RECORD_BYTES_ESTIMATE = 16 * 1024
+
+_natal_cache = LRUCache(
+    max_entries=NATAL_CACHE_MAX_ENTRIES,
+    max_bytes=NATAL_CACHE_MAX_BYTES,
+    sizeof=lambda record: _NATAL_RECORD_BYTES_ESTIMATE,
+)
+
+
+def natal_cache_stats() -> dict[str, float]:
+    return _natal_cache.stats()
+
+
+def clear_natal_cache() -> None:
+    _natal_cache.clear()
+
+
+def _natal_baseline_scores(profile: BaziProfile, luck: LuckTimeline, birth: BirthInfo) -> dict[str, float]:
+    natal_layers = _layer_scores(profile, luck, _china_datetime(birth.birth_date, birth.birth_time))
+    return _weighted_scores(natal_layers)
+
+
+def _natal_record(birth: BirthInfo) -> NatalRecord:
+    # 同一出生信息的第二次起请求跳过四柱换算、命盘、起运节气查找与本命基准。
+    record = _natal_cache.get(birth)
+    if record is None:
+        pillars = _birth_pillars(birth)
+        profile = _build_profile(pillars)
+        luck = _luck_timeline(birth, pillars)
+        record = NatalRecord(
+            pillars=pillars,
+            profile=profile,
+            luck=luck,
+            baseline_scores=_natal_baseline_scores(profile, luck, birth),
+        )
+        _natal_cache.put(birth, record)
+    return record
+
+
+def _natal_context(birth: BirthInfo) -> tuple[BaziProfile, Pillars, LuckTimeline]:
+    record = _natal_record(birth)
+    return record.profile, record.pillars, record.luck
+
+
+def view_timeline(spec: ViewSpec, normalization: str = "view") -> ViewTimeline:
+    # 供离线批处理使用：与接口相同的视图时间线，解析一次后可用于多个命盘。
+    return _view_timeline(spec, normalization)
+
+
+def resolved_view_timeline(spec: ViewSpec) -> ViewTimeline:
+    # 供离线任务使用：不论 HEATMAP_ENGINE 均预先解析时间柱，同一时间线可在多个命盘间复用。
+    return _view_timeline(spec, normalization="global")
+
+
+def natal_view_raw_scores(birth: BirthInfo, timeline: ViewTimeline) -> ViewRawScores:
+    # 供离线任务使用：不经缓存与归一化，直接返回视图各格子的原始分量。
+    profile, _, luck = _natal_context(birth)
+    return view_raw_scores(profile, _timeline_layer_indices(luck, timeline))
+
+
+def _timeline_cells(
+    profile: BaziProfile,
+    luck: LuckTimeline,
+    timeline: ViewTimeline,
+    normalization: str = "view",
+) -> list[dict]:
+    if _uses_reference(normalization):
+        # 参考实现逐点评分与归一化交织，整体计入 scoring（逐点求柱另计 time_pillars）。
+        with stage_timer("scoring"):
+            return _reference_cells(profile, luck, timeline.points)
+    return _vectorized_cells(profile, luck, timeline, normalization)
+
+
+def _heatmap_meta(profile: BaziProfile) -> dict:
+    return {
+        "day_master": profile.day_master,
+        "day_master_strength": profile.day_master_strength_label,
+        "structure_labels": structure_labels(),
+        "ten_god_labels": ten_god_labels(),
+    }
+
+
+def _normalization_meta(normalization: str) -> dict:
+    # 默认的视图内归一化不附加字段，响应与引入全局模式之前一致。
+    if normalization != "global":
+        return {}
+    table = calibration_table()
+    return {
+        "normalization": "global",
+        "calibration": {
+            "digest": table.digest,
+            "activation_min": table.activation_min,
+            "activation_max": table.activation_max,
+        },
+    }
+
+
+def _heatmap_definition(normalization: str) -> str:
+    return _GLOBAL_HEATMAP_DEFINITION if normalization == "global" else _HEATMAP_DEFINITION
+
+
+def _heatmap_payload_for_birth(
+    birth: BirthInfo,
+    timeline: ViewTimeline,
+    normalization: str = "view",
+) -> dict:
+    profile, birth_pillars, luck = _natal_context(birth)
+    # 载荷由本模块按 HeatmapResponse 字段顺序构造、取值已在范围内，HTTP 层直接输出而不逐格校验。
+    return {
+        "view": timeline.view,
+        "next_view": _NEXT_VIEW[timeline.view],
+        "cells": _timeline_cells(profile, luck, timeline, normalization),
+        "birth_pillars": _time_pillars_payload(birth_pillars),
+        "definition": _heatmap_definition(normalization),
+        "uncertainty_note": _HEATMAP_UNCERTAINTY_NOTE,
+        "meta": {**_heatmap_meta(profile), **_normalization_meta(normalization)},
+    }
+
+
+# 列式响应中十神矩阵的列顺序与柱序号查找表，每个响应只发送一次。
+_COLUMNAR_META = {"ten_god_keys": list(TEN_GODS), "ganzhi": _GANZHI_LABELS}
+
+
+def _timeline_columns(
+    profile: BaziProfile,
+    luck: LuckTimeline,
+    timeline: ViewTimeline,
+    normalization: str = "view",
+) -> dict:
+    if _uses_reference(normalization):
+        return _columns_from_cells(_timeline_cells(profile, luck, timeline))
+    values, ten_god_scores, indices = _vectorized_scores(profile, luck, timeline, normalization)
+    with stage_timer("cell_payloads"):
+        return _column_payload(timeline.points, values, ten_god_scores, indices)
+
+
+def _columnar_payload_for_birth(
+    birth: BirthInfo,
+    timeline: ViewTimeline,
+    normalization: str = "view",
+) -> dict:
+    profile, birth_pillars, luck = _natal_context(birth)
+    return {
+        "view": timeline.view,
+        "next_view": _NEXT_VIEW[timeline.view],
+        "format": "columnar",
+        **_timeline_columns(profile, luck, timeline, normalization),
+        "birth_pillars": _time_pillars_payload(birth_pillars),
+        "definition": _heatmap_definition(normalization),
+        "uncertainty_note": _HEATMAP_UNCERTAINTY_NOTE,
+        "meta": {**_heatmap_meta(profile), **_COLUMNAR_META, **_normalization_meta(normalization)},
+    }
+
+
+def columnar_heatmap_payload(
+    birth: BirthInfo,
+    timeline: ViewTimeline,
+    normalization: str = "view",
+) -> dict:
+    # 供离线批处理使用：与批量接口单条的列式载荷（HeatmapColumnarResponse 的字段）相同，不经响应缓存。
+    return _columnar_payload_for_birth(birth, timeline, normalization)
+
+
+def _batch_item(
+    timeline: ViewTimeline,
+    columnar: bool,
+    normalization: str,
+    indexed_birth: tuple[int, BirthInfo],
+) -> dict:
+    index, birth = indexed_birth
+    build = _columnar_payload_for_birth if columnar else _heatmap_payload_for_birth
+    try:
+        return {"index": index, "result": build(birth, timeline, normalization), "error": None}
+    except (ValueError, RuntimeError) as exc:
+        return {"index": index, "result": None, "error": str(exc)}
+
+
+@trace_request("heatmap_batch")
+def plan_heatmap_batch(request) -> tuple[Callable[[tuple[int, BirthInfo]], dict], list[tuple[int, BirthInfo]]]:
+    # 视图的时间点与四柱只解析一次；返回逐条计算函数（可被 pickle，供进程池分派）与编号后的出生信息。
+    if len(request.births) > HEATMAP_BATCH_MAX_BIRTHS:
+        raise ValueError(f"批量请求最多支持 {HEATMAP_BATCH_MAX_BIRTHS} 条出生信息")
+    timeline = _view_timeline(view_spec(request), request.normalization)
+    indexed_births = [(index, normalize_birth(birth)) for index, birth in enumerate(request.births)]
+    return partial(_batch_item, timeline, request.format == "columnar", request.normalization), indexed_births
+
+
+@trace_request("heatmap_batch")
+def heatmap_batch_payload(request) -> dict:
+    # 在当前进程中逐条计算；HTTP 接口在进程模式下改经 executor.map_analysis 分块分派。
+    score, indexed_births = plan_heatmap_batch(request)
+    return {"view": request.view, "items": [score(indexed_birth) for indexed_birth in indexed_births]}
+
+
+def build_heatmap_batch_response(request) -> HeatmapBatchResponse:
+    return HeatmapBatchResponse.model_validate(heatmap_batch_payload(request))
+
+
+_VIEW_ORDER = ["year", "month", "day", "hour"]
+# 估算下钻树规模时每层视图的最大格子数。
+_VIEW_MAX_CELLS = {"year": YEAR_VIEW_WINDOW, "month": 12, "day": 31, "hour": 24}
+
+
+def _tree_cell_estimate(view: str, depth: str) -> int:
+    total = 0
+    level_cells = 1
+    for level in _VIEW_ORDER[_VIEW_ORDER.index(view) : _VIEW_ORDER.index(depth) + 1]:
+        level_cells *= _VIEW_MAX_CELLS[level]
+        total += level_cells
+    return total
+
+
+def _tree_node(
+    profile: BaziProfile,
+    luck: LuckTimeline,
+    view: str,
+    year: int | None,
+    month: int | None,
+    day: int | None,
+    depth: str,
+) -> dict:
+    timeline = _view_timeline(ViewSpec(view=view, year=year, month=month, day=day))
+    node = {
+        "view": view,
+        "next_view": _NEXT_VIEW[view],
+        "cells": _timeline_cells(profile, luck, timeline),
+        "children": None,
+    }
+    if view != depth:
+        # 子视图坐标取自格子时间，与前端 onCellClick 的下钻规则一致。
+        node["children"] = [
+            _tree_node(profile, luck, _NEXT_VIEW[view], point.dt.year, point.dt.month, point.dt.day, depth)
+            for point in timeline.points
+        ]
+    return node
+
+
+@trace_request("heatmap_tree")
+def heatmap_tree_payload(request) -> dict:
+    # 命盘、大运上下文与评分表在整棵树内共享；每个节点仍按视图内独立归一化，与逐级请求结果一致。
+    if _VIEW_ORDER.index(request.depth) < _VIEW_ORDER.index(request.view):
+        raise ValueError("depth 不能高于起始视图")
+    if _tree_cell_estimate(request.view, request.depth) > HEATMAP_TREE_MAX_CELLS:
+        raise ValueError(f"下钻树规模超过上限（{HEATMAP_TREE_MAX_CELLS} 格），请缩小起始视图或深度")
+    profile, birth_pillars, luck = _natal_context(normalize_birth(request.birth))
+    root = _tree_node(profile, luck, request.view, request.year, request.month, request.day, request.depth)
+    return {
+        "root": root,
+        "birth_pillars": _time_pillars_payload(birth_pillars),
+        "definition": _HEATMAP_DEFINITION,
+        "uncertainty_note": _HEATMAP_UNCERTAINTY_NOTE,
+        "meta": _heatmap_meta(profile),
+    }
+
+
+def build_heatmap_tree_response(request) -> HeatmapTreeResponse:
+    return HeatmapTreeResponse.model_validate(heatmap_tree_payload(request))
+
+
+_STREAM_DEFINITION = (
+    "颜色强度表示：结构被激活的强度，按该命盘可达的解析上下界归一化（不依赖视图内其他格子）；"
+    "每个格子附带 raw 原始分量，末尾 summary 记录给出视图内短周期分量与十神的最小/最大值，可在客户端按视图重新缩放；"
+    "十神评分按命盘可达上限缩放（-100 ~ 100），负值代表承载不足。"
+)
+
+
+def _iter_view_points(spec: ViewSpec) -> Iterator[TimePoint]:
+    # range 视图按需生成时间点，流式输出时无需一次性构造整个视图。
+    if spec.view == "range":
+        first, count = _range_buckets(spec)
+        return _iter_range_points(first, count, spec.resolution)
+    return iter(_points_for_view(spec))
+
+
+def stream_heatmap_records(request) -> Iterator[dict]:
+    # 参数校验与命盘计算在此处同步完成，错误可在开始输出前映射为 HTTP 状态码。
+    # 不支持的选项直接拒绝，避免客户端误以为拿到了列式或调试输出。
+    if request.normalization != "view":
+        raise ValueError("流式接口按命盘解析上下界归一化，不支持 normalization=global")
+    if request.format != "cells":
+        raise ValueError("流式接口逐格输出记录，不支持 format=columnar")
+    if request.debug:
+        raise ValueError("流式接口不支持 debug，请改用 /api/analysis/heatmap")
+    points = _iter_view_points(view_spec(request))
+    profile, birth_pillars, luck = _natal_context(normalize_birth(request.birth))
+    bounds = analytic_bounds(profile)
+    header = {
+        "type": "header",
+        "view": request.view,
+        "next_view": _NEXT_VIEW.get(request.view),
+        "birth_pillars": _time_pillars_payload(birth_pillars),
+        "definition": _STREAM_DEFINITION,
+        "uncertainty_note": _HEATMAP_UNCERTAINTY_NOTE,
+        "meta": {
+            **_heatmap_meta(profile),
+            "normalization": "analytic",
+            "bounds": {
+                "short_min": bounds.short_min,
+                "short_max": bounds.short_max,
+                "activation_min": bounds.activation_min,
+                "activation_max": bounds.activation_max,
+                "max_abs_ten_god": bounds.max_abs_ten_god,
+            },
+        },
+    }
+    return _stream_records(header, profile, luck, request.view, points, bounds)
+
+
+def _stream_records(
+    header: dict,
+    profile: BaziProfile,
+    luck: LuckTimeline,
+    view: str,
+    points: Iterator[TimePoint],
+    bounds: AnalyticBounds,
+) -> Iterator[dict]:
+    # 按块计算，内存占用与视图长度无关；summary 中的统计量用于客户端复原视图内归一化。
+    yield header
+    count = 0
+    short_min = short_max = None
+    max_abs_ten_god = 0.0
+    while True:
+        chunk = list(islice(points, HEATMAP_STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        timeline = _timeline_for_points(view, chunk)
+        indices = _timeline_layer_indices(luck, timeline)
+        raw = view_raw_scores(profile, indices)
+        values, ten_god_scores = normalize_with_bounds(raw, bounds)
+        cells = _cell_payloads(chunk, values, ten_god_scores, indices)
+        for cell, long_base, short_component, ten_gods in zip(
+            cells, raw.long_base.tolist(), raw.short_component.tolist(), raw.ten_gods.tolist()
+        ):
+            yield {
+                "type": "cell",
+                **cell,
+                "raw": {"long_base": long_base, "short_component": short_component, "ten_gods": ten_gods},
+            }
+        chunk_short_min = float(raw.short_component.min())
+        chunk_short_max = float(raw.short_component.max())
+        short_min = chunk_short_min if short_min is None else min(short_min, chunk_short_min)
+        short_max = chunk_short_max if short_max is None else max(short_max, chunk_short_max)
+        max_abs_ten_god = max(max_abs_ten_god, float(abs(raw.ten_gods).max()))
+        count += len(chunk)
+    yield {
+        "type": "summary",
+        "count": count,
+        "short_min": short_min,
+        "short_max": short_max,
+        "max_abs_ten_god": max_abs_ten_god,
+    }
+
+
+_BEHAVIOR_UNCERTAINTY_NOTE = (
+    "行为提示仅反映结构风险暴露强度，风险级别为当前时间结构下的相对分布，"
+    "受时间边界与输入精度影响，存在不确定性，不构成结论或建议。"
+)
+
+
+def _parse_focus_datetime(value: str) -> datetime:
     try:
-        focus_dt = datetime.fromisoformat(request.focus_datetime)
+        focus_dt = datetime.fromisoformat(value)
     except ValueError as exc:
         raise ValueError("focus_datetime 需为 ISO 格式日期时间") from exc
 
     if focus_dt.tzinfo is None:
         focus_dt = focus_dt.replace(tzinfo=CHINA_TZ)
+    return focus_dt
 
-    layer_scores = _layer_scores(profile, luck_context, focus_dt)
-    current_scores = _weighted_scores(layer_scores)
-
-    natal_layers = _layer_scores(profile, luck_context, _china_datetime(birth.birth_date, birth.birth_time))
-    baseline_scores = _weighted_scores(natal_layers)
 
-    labels = structure_labels()
+def _behavior_levels(
+    current_scores: dict[str, float],
+    baseline_scores: dict[str, float],
+) -> tuple[dict[str, str], dict[str, float]]:
     ratios = {}
     abs_scores = {cat: abs(current_scores[cat]) for cat in CATEGORIES}
     total_abs = sum(abs_scores.values()) or 1e-6
     relative_strengths = {cat: abs_scores[cat] / total_abs for cat in CATEGORIES}
     levels = {}
-    prompts = []
     for category in CATEGORIES:
         ratios[category] = relative_ratio(current_scores[category], baseline_scores[category])
         levels[category] = risk_level_from_ratio(ratios[category])
@@ -420,7 +1317,20 @@ def build_behavior_response(request) -> BehaviorResponse:
                 levels[category] = "中"
             else:
                 levels[category] = "低"
+    return levels, relative_strengths
+
 
+@trace_request("behavior")
+def build_behavior_response(request) -> BehaviorResponse:
+    natal = _natal_record(normalize_birth(request.birth))
+    focus_dt = _parse_focus_datetime(request.focus_datetime)
+
+    layer_scores = _layer_scores(natal.profile, natal.luck, focus_dt)
+    current_scores = _weighted_scores(layer_scores)
+    levels, relative_strengths = _behavior_levels(current_scores, natal.baseline_scores)
+
+    labels = structure_labels()
+    prompts = []
     for category in CATEGORIES:
         label = labels[category]
         level = levels[category]
@@ -436,8 +1346,79 @@ def build_behavior_response(request) -> BehaviorResponse:
     return BehaviorResponse(
         focus_datetime=focus_dt.isoformat(),
         prompts=prompts,
-        uncertainty_note=(
-            "行为提示仅反映结构风险暴露强度，风险级别为当前时间结构下的相对分布，"
-            "受时间边界与输入精度影响，存在不确定性，不构成结论或建议。"
-        ),
+        uncertainty_note=_BEHAVIOR_UNCERTAINTY_NOTE,
     )
+
+
+def _behavior_series_datetimes(request) -> list[datetime]:
+    # 二选一：显式列出的时间点，或 [start, end) 内按 resolution 取与 range 视图格子相同的代表时刻。
+    has_range = request.start is not None or request.end is not None or request.resolution is not None
+    if request.focus_datetimes is not None:
+        if has_range:
+            raise ValueError("focus_datetimes 与 start/end/resolution 只能二选一")
+        focus_dts = [_parse_focus_datetime(value) for value in request.focus_datetimes]
+    elif request.start is None or request.end is None or request.resolution is None:
+        raise ValueError("需要提供 focus_datetimes，或同时提供 start、end 与 resolution")
+    else:
+        spec = ViewSpec(view="range", start=request.start, end=request.end, resolution=request.resolution)
+        first, count = _range_buckets(spec)
+        if count > BEHAVIOR_SERIES_MAX_POINTS:
+            raise ValueError(f"行为序列最多支持 {BEHAVIOR_SERIES_MAX_POINTS} 个时间点，当前为 {count} 个")
+        focus_dts = [point.dt for point in _iter_range_points(first, count, request.resolution)]
+    if not focus_dts:
+        raise ValueError("行为序列至少需要一个时间点")
+    if len(focus_dts) > BEHAVIOR_SERIES_MAX_POINTS:
+        raise ValueError(f"行为序列最多支持 {BEHAVIOR_SERIES_MAX_POINTS} 个时间点，当前为 {len(focus_dts)} 个")
+    return focus_dts
+
+
+def _level_runs(focus_dts: list[datetime], levels: list[str]) -> list[dict]:
+    # 游程编码：相邻时间点风险级别相同者合并为一段。
+    runs = []
+    for index, level in enumerate(levels):
+        if runs and runs[-1]["risk_level"] == level:
+            runs[-1]["length"] += 1
+        else:
+            runs.append(
+                {
+                    "risk_level": level,
+                    "start_index": index,
+                    "length": 1,
+                    "start_datetime": focus_dts[index].isoformat(),
+                }
+            )
+    return runs
+
+
+@trace_request("behavior_series")
+def behavior_series_payload(request) -> dict:
+    # 命盘跨请求缓存，逐柱评分表随命盘保留，序列内重复出现的柱直接查表。
+    focus_dts = _behavior_series_datetimes(request)
+    natal = _natal_record(normalize_birth(request.birth))
+
+    points = []
+    series_levels: dict[str, list[str]] = {category: [] for category in CATEGORIES}
+    with stage_timer("scoring"):
+        for focus_dt in focus_dts:
+            layer_scores = _layer_scores(natal.profile, natal.luck, focus_dt)
+            levels, relative_strengths = _behavior_levels(_weighted_scores(layer_scores), natal.baseline_scores)
+            for category in CATEGORIES:
+                series_levels[category].append(levels[category])
+            points.append(
+                {
+                    "focus_datetime": focus_dt.isoformat(),
+                    "risk_levels": levels,
+                    "relative_strengths": relative_strengths,
+                }
+            )
+
+    return {
+        "labels": structure_labels(),
+        "points": points,
+        "level_runs": {category: _level_runs(focus_dts, series_levels[category]) for category in CATEGORIES},
+        "uncertainty_note": _BEHAVIOR_UNCERTAINTY_NOTE,
+    }
+
+
+def build_behavior_series_response(request) -> BehaviorSeriesResponse:
+    return BehaviorSeriesResponse.model_validate(behavior_series_payload(request))
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional, Sequence
+
+from ..config import CALIBRATION_TABLE_PATH, CONFIG_VERSION
+from ..engine.vectorized import QuantileTable, require_numpy
+
+# 文件格式变化时递增，旧文件随之失效。
+CALIBRATION_FORMAT_VERSION = 1
+
+
+def _table_digest(activation_min: float, activation_max: float, cdf: Sequence[float]) -> str:
+    payload = json.dumps([CONFIG_VERSION, activation_min, activation_max, list(cdf)]).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def write_calibration_table(
+    path: Path,
+    activation_min: float,
+    activation_max: float,
+    cdf: Sequence[float],
+    info: dict,
+) -> None:
+    payload = {
+        "format_version": CALIBRATION_FORMAT_VERSION,
+        "config_version": CONFIG_VERSION,
+        "activation_min": activation_min,
+        "activation_max": activation_max,
+        "cdf": list(cdf),
+        "info": info,
+    }
+    # 先写临时文件再原地替换，读取方不会看到写了一半的文件。
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    temp_path.replace(path)
+
+
+def load_calibration_table(path: Path) -> Optional[QuantileTable]:
+    # 文件缺失、格式版本或 CONFIG_VERSION 不符、累计分布不单调时返回 None。
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if payload.get("format_version") != CALIBRATION_FORMAT_VERSION or payload.get("config_version") != CONFIG_VERSION:
+        return None
+    try:
+        activation_min = float(payload["activation_min"])
+        activation_max = float(payload["activation_max"])
+        cdf = [float(value) for value in payload["cdf"]]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if len(cdf) < 2 or activation_max <= activation_min or any(b < a for a, b in zip(cdf, cdf[1:])):
+        return None
+    np = require_numpy()
+    return QuantileTable(
+        activation_min=activation_min,
+        activation_max=activation_max,
+        cdf=np.asarray(cdf, dtype=np.float64),
+        digest=_table_digest(activation_min, activation_max, cdf),
+    )
+
+
+_table: Optional[QuantileTable] = None
+
+
+def calibration_table() -> QuantileTable:
+    # 加载成功后常驻内存；缺失时每次重新尝试，离线任务生成文件后无需重启即可使用。
+    global _table
+    if _table is None:
+        _table = load_calibration_table(CALIBRATION_TABLE_PATH)
+        if _table is None:
+            raise RuntimeError("全局校准表缺失或与当前配置不符，请先运行 python -m app.calibration 生成。")
+    return _table
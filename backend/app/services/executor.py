@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from ..adapters.calendar import warm_calendar_tables
+from ..config import ANALYSIS_EXECUTION_MODE, ANALYSIS_PROCESS_WORKERS, ANALYSIS_TIMEOUT_SECONDS
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker() -> None:
+    # 子进程启动时预先构建节气表，首个请求无需承担建表开销。
+    try:
+        warm_calendar_tables()
+    except RuntimeError:
+        pass
+
+
+def _ping() -> bool:
+    return True
+
+
+def process_mode() -> bool:
+    return ANALYSIS_EXECUTION_MODE == "process" and ANALYSIS_PROCESS_WORKERS > 0
+
+
+def analysis_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=ANALYSIS_PROCESS_WORKERS, initializer=_warm_worker)
+        return _pool
+
+
+def start_executor() -> None:
+    # 进程模式下提前拉起全部子进程并完成预热；线程模式下在当前进程预热。
+    if not process_mode():
+        try:
+            warm_calendar_tables()
+        except RuntimeError:
+            pass
+        return
+    pool = analysis_pool()
+    for future in [pool.submit(_ping) for _ in range(ANALYSIS_PROCESS_WORKERS)]:
+        future.result()
+
+
+def shutdown_executor() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _map_chunk(fn: Callable[[Any], Any], items: list) -> list:
+    return [fn(item) for item in items]
+
+
+async def _await_pool(future: "asyncio.Future[Any]") -> Any:
+    try:
+        return await asyncio.wait_for(future, timeout=ANALYSIS_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError as exc:
+        # 尚未开始的任务会被取消；已在子进程中运行的任务无法中断，结果将被丢弃。
+        raise RuntimeError("分析计算超时，请稍后重试。") from exc
+    except BrokenProcessPool as exc:
+        shutdown_executor()
+        raise RuntimeError("分析进程池异常退出，请稍后重试。") from exc
+
+
+async def run_analysis(fn: Callable[..., Any], *args: Any) -> Any:
+    # fn 与参数需可被 pickle（模块级函数与 pydantic 请求模型均满足）。
+    if not process_mode():
+        return await run_in_threadpool(fn, *args)
+    loop = asyncio.get_running_loop()
+    return await _await_pool(loop.run_in_executor(analysis_pool(), fn, *args))
+
+
+async def map_analysis(fn: Callable[[Any], Any], items: list) -> list:
+    # 进程模式下把 items 分块提交到进程池，整体与 run_analysis 一样受 ANALYSIS_TIMEOUT_SECONDS 限制；
+    # 超时后尚未开始的块随之取消。线程模式下在线程池中逐个计算。
+    if not process_mode():
+        return await run_in_threadpool(_map_chunk, fn, items)
+    loop = asyncio.get_running_loop()
+    pool = analysis_pool()
+    size = max(1, len(items) // (ANALYSIS_PROCESS_WORKERS * 4))
+    chunks = [loop.run_in_executor(pool, _map_chunk, fn, items[start : start + size]) for start in range(0, len(items), size)]
+    results = await _await_pool(asyncio.gather(*chunks))
+    return [result for chunk in results for result in chunk]
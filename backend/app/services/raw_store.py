@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Sequence
+
+from ..config import CONFIG_VERSION, RAW_STORE_FLUSH_SECONDS, RAW_STORE_MAX_BYTES, RAW_STORE_PATH
+from ..engine.ten_gods import TEN_GODS
+from ..engine.vectorized import ViewRawScores, require_numpy
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_cells (
+    config_version TEXT NOT NULL,
+    chart TEXT NOT NULL,
+    wall_second INTEGER NOT NULL,
+    long_base REAL NOT NULL,
+    short_component REAL NOT NULL,
+    ten_gods BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (config_version, chart, wall_second)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS raw_cells_stored_at ON raw_cells (stored_at);
+"""
+
+# 视图点数不超过该值时按 IN 精确查询，否则按时间范围扫描主键后在内存中挑选。
+_IN_QUERY_MAX_POINTS = 500
+# 超过字节上限时每次淘汰的比例（按写入时间从旧到新）。
+_PRUNE_FRACTION = 0.25
+# 记住已入队或已落盘的视图个数上限，重复视图不再入队。
+_KNOWN_VIEWS_MAX = 16384
+
+
+class RawCellStore:
+    # 嵌入式 SQLite 存储：按命盘身份、北京时间墙上秒数与 CONFIG_VERSION 保存每个格子归一化前的
+    # 长周期基准、短周期分量与十神向量，可跨重启按视图批量读回后重新归一化。
+    # 写入先以视图为单位进入内存队列，由后台线程按 flush_seconds 展开为行并批量落盘；已存储的格子保持不变，只插入缺失的行。
+    # 超过 max_bytes 时先删除旧配置版本，仍超出则按写入时间淘汰最旧的条目。统计计数与连接一样只在 _lock 内读写。
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int,
+        flush_seconds: float,
+        config_version: str = CONFIG_VERSION,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_seconds = flush_seconds
+        self.config_version = config_version
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, Sequence[int], ViewRawScores, float]] = []
+        self._pending_lock = threading.Lock()
+        self._known_views: OrderedDict[tuple[str, int], None] = OrderedDict()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._stats = {"hits": 0, "misses": 0, "written": 0, "pruned": 0}
+        self._writer = threading.Thread(target=self._write_behind, name="raw-cell-store", daemon=True)
+        self._writer.start()
+
+    def get_view(self, chart: str, wall_seconds: Sequence[int]) -> Optional[ViewRawScores]:
+        # 视图内所有时间点都已存储时返回按 wall_seconds 顺序排列的原始分量，否则返回 None。
+        if not wall_seconds:
+            return None
+        np = require_numpy()
+        if len(wall_seconds) <= _IN_QUERY_MAX_POINTS:
+            placeholders = ",".join("?" * len(wall_seconds))
+            sql = (
+                "SELECT wall_second, long_base, short_component, ten_gods FROM raw_cells "
+                f"WHERE config_version = ? AND chart = ? AND wall_second IN ({placeholders})"
+            )
+            params = (self.config_version, chart, *wall_seconds)
+        else:
+            sql = (
+                "SELECT wall_second, long_base, short_component, ten_gods FROM raw_cells "
+                "WHERE config_version = ? AND chart = ? AND wall_second BETWEEN ? AND ?"
+            )
+            params = (self.config_version, chart, min(wall_seconds), max(wall_seconds))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            found = {row[0]: row for row in rows}
+            complete = all(second in found for second in wall_seconds)
+            self._stats["hits" if complete else "misses"] += 1
+        if not complete:
+            return None
+        ordered = [found[second] for second in wall_seconds]
+        return ViewRawScores(
+            long_base=np.array([row[1] for row in ordered], dtype=np.float64),
+            short_component=np.array([row[2] for row in ordered], dtype=np.float64),
+            ten_gods=np.frombuffer(b"".join(row[3] for row in ordered), dtype=np.float64).reshape(
+                len(ordered), len(TEN_GODS)
+            ),
+        )
+
+    def put_view(self, chart: str, wall_seconds: Sequence[int], raw: ViewRawScores) -> None:
+        # 请求线程只入队；逐行展开与编码留给后台线程。raw 的数组此后不得修改。
+        # 近期已写过的视图（按命盘与时间点序列的散列识别）直接跳过；散列碰撞只会少写一次，不影响正确性。
+        key = (chart, hash(tuple(wall_seconds)))
+        with self._pending_lock:
+            if key in self._known_views:
+                self._known_views.move_to_end(key)
+                return
+            self._known_views[key] = None
+            if len(self._known_views) > _KNOWN_VIEWS_MAX:
+                self._known_views.popitem(last=False)
+            self._pending.append((chart, wall_seconds, raw, time.time()))
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            views, self._pending = self._pending, []
+        if not views:
+            return
+        rows = [row for view in views for row in self._rows(*view)]
+        with self._lock:
+            # 原始分量只由键决定，已有的行无需覆盖；OR IGNORE 不改动已有页面，只写入缺失的格子。
+            with self._conn:
+                written = self._conn.executemany("INSERT OR IGNORE INTO raw_cells VALUES (?, ?, ?, ?, ?, ?, ?)", rows).rowcount
+            self._stats["written"] += written
+            self._prune()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join(timeout=self.flush_seconds + 5.0)
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+        with self._pending_lock:
+            pending = sum(len(wall_seconds) for _, wall_seconds, _, _ in self._pending)
+        return {**stats, "pending": pending}
+
+    def _rows(self, chart: str, wall_seconds: Sequence[int], raw: ViewRawScores, stored_at: float) -> list[tuple]:
+        np = require_numpy()
+        ten_gods = np.ascontiguousarray(raw.ten_gods, dtype=np.float64)
+        return [
+            (self.config_version, chart, second, long_base, short_component, ten_gods[row].tobytes(), stored_at)
+            for row, (second, long_base, short_component) in enumerate(
+                zip(wall_seconds, raw.long_base.tolist(), raw.short_component.tolist())
+            )
+        ]
+
+    def _write_behind(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_seconds)
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # 落盘失败（如磁盘已满或文件被锁）时丢弃本批，不影响在线计算。
+                pass
+
+    def _live_bytes(self) -> int:
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def _prune(self) -> None:
+        # 删除后的空闲页由后续写入复用，文件大小随之稳定在上限附近。
+        if self._live_bytes() <= self.max_bytes:
+            return
+        with self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM raw_cells WHERE config_version != ?", (self.config_version,)
+            ).rowcount
+        while self._live_bytes() > self.max_bytes:
+            total = self._conn.execute("SELECT COUNT(*) FROM raw_cells").fetchone()[0]
+            if total == 0:
+                break
+            cutoff = self._conn.execute(
+                "SELECT stored_at FROM raw_cells ORDER BY stored_at LIMIT 1 OFFSET ?",
+                (int(total * _PRUNE_FRACTION),),
+            ).fetchone()[0]
+            with self._conn:
+                removed = self._conn.execute("DELETE FROM raw_cells WHERE stored_at <= ?", (cutoff,)).rowcount
+            deleted += removed
+            if removed == 0:
+                break
+        self._stats["pruned"] += deleted
+        if deleted:
+            # 淘汰后已记住的视图可能不再完整，下次计算时重新入队。
+            with self._pending_lock:
+                self._known_views.clear()
+
+
+_store: Optional[RawCellStore] = None
+_store_pid: Optional[int] = None
+_store_lock = threading.Lock()
+
+
+def raw_cell_store() -> Optional[RawCellStore]:
+    # 未配置 RAW_STORE_PATH 时返回 None。连接与写线程按进程创建，进程池子进程各自持有连接、共享同一文件。
+    global _store, _store_pid
+    if RAW_STORE_PATH is None:
+        return None
+    with _store_lock:
+        if _store is None or _store_pid != os.getpid():
+            _store = RawCellStore(Path(RAW_STORE_PATH), RAW_STORE_MAX_BYTES, RAW_STORE_FLUSH_SECONDS)
+            _store_pid = os.getpid()
+            atexit.register(_store.close)
+        return _store
+
+
+def close_raw_cell_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None and _store_pid == os.getpid():
+            _store.close()
+        _store = None
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Hashable, Iterator, Optional
+
+from .cache import CacheStats, LRUCache
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - 非 POSIX 平台
+    fcntl = None
+
+# 文件布局（小端）：64 字节文件头，随后为 n_slots 个定长槽位与环形数据区。
+#   文件头：魔数、布局版本、槽位数、数据区容量，偏移 32 处为写游标（累计写入的逻辑字节数）。
+#   槽位：序号、键摘要、记录逻辑偏移、长度、CRC32、过期时间（time.time()，0 为不过期）。
+# 槽位按组相联组织，键摘要决定所在组，组内 _WAYS 个槽位。
+_MAGIC = b"TSHSHM\x00\x00"
+_LAYOUT_VERSION = 1
+_HEADER = struct.Struct("<8sIIQ")
+_HEADER_SIZE = 64
+_CURSOR = struct.Struct("<Q")
+_CURSOR_OFFSET = 32
+_SLOT = struct.Struct("<Q16sQIId")
+_SEQ = struct.Struct("<Q")
+_WAYS = 4
+# 无锁读取遇到写入中的槽位时的重试次数，仍不一致则按未命中处理。
+_READ_RETRIES = 3
+
+
+def _digest(key: Hashable) -> bytes:
+    # 键为字符串、数字、布尔与 None 组成的元组，repr 在各进程间稳定。
+    return hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).digest()
+
+
+class SharedMemoryCache:
+    # 跨进程共享缓存：同一主机上的多个 worker 映射同一文件。
+    # 读路径不加锁：按序号（seqlock）确认槽位未在写入中，复制记录后核对写游标未越过该记录、CRC32 一致，
+    # 任一不符即视为未命中。写入以文件锁（及进程内线程锁）串行化；数据区写满后从头覆盖，
+    # 即按写入顺序淘汰最旧记录，组内槽位用尽时替换组内最旧的一条。
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int,
+        slots: int,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        if fcntl is None:
+            raise RuntimeError("共享缓存需要 POSIX 文件锁（fcntl）。")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.n_slots = max(_WAYS, slots - slots % _WAYS)
+        self.capacity = max_bytes
+        self._data_offset = _HEADER_SIZE + self.n_slots * _SLOT.size
+        self._stats = CacheStats()
+        # 统计计数另用一把锁：_lock 在写入期间持有（含等待文件锁），读路径计数不应被写者阻塞。
+        self._stats_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._fd = self._open()
+        self._pid = os.getpid()
+        try:
+            self._map = mmap.mmap(self._fd, self._data_offset + self.capacity)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        digest = _digest(key)
+        for _ in range(_READ_RETRIES):
+            found, payload = self._read(digest)
+            if found:
+                break
+        else:
+            payload = None
+        self._count("misses" if payload is None else "hits")
+        if payload is None:
+            return None
+        return pickle.loads(payload)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.capacity:
+            return
+        digest = _digest(key)
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._write_lock():
+            cursor = self._cursor()
+            position = cursor % self.capacity
+            if position + len(payload) > self.capacity:
+                # 记录不跨越数据区末尾，剩余空间跳过。
+                cursor += self.capacity - position
+                position = 0
+            # 先推进写游标再覆盖数据：正在复制旧记录的读者随后核对游标即可发现被覆盖。
+            self._map[_CURSOR_OFFSET : _CURSOR_OFFSET + _CURSOR.size] = _CURSOR.pack(cursor + len(payload))
+            start = self._data_offset + position
+            self._map[start : start + len(payload)] = payload
+            index = self._victim(digest, cursor + len(payload))
+            self._write_slot(index, digest, cursor, payload, expires_at)
+
+    def clear(self) -> None:
+        with self._write_lock():
+            for index in range(self.n_slots):
+                seq = self._slot_seq(index)
+                self._map[self._slot_offset(index) : self._slot_offset(index) + _SLOT.size] = _SLOT.pack(
+                    seq + 2, bytes(16), 0, 0, 0, 0.0
+                )
+
+    def stats(self) -> dict[str, float]:
+        # 命中、未命中与淘汰为本进程计数；条目数与字节数为共享文件中仍有效的记录。
+        with self._stats_lock:
+            counters = asdict(self._stats)
+        lookups = counters["hits"] + counters["misses"]
+        hit_rate = counters["hits"] / lookups if lookups else 0.0
+        cursor = self._cursor()
+        now = time.time()
+        entries = 0
+        live_bytes = 0
+        for index in range(self.n_slots):
+            _, digest, offset, length, _, expires_at = _SLOT.unpack_from(self._map, self._slot_offset(index))
+            if length and self._is_live(offset, length, expires_at, cursor, now):
+                entries += 1
+                live_bytes += length
+        return {**counters, "hit_rate": hit_rate, "entries": entries, "bytes": live_bytes}
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def _open(self) -> int:
+        size = self._data_offset + self.capacity
+        header = _HEADER.pack(_MAGIC, _LAYOUT_VERSION, self.n_slots, self.capacity)
+        while True:
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    ready = self._prepare(fd, size, header)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            except BaseException:
+                os.close(fd)
+                raise
+            if ready:
+                return fd
+            os.close(fd)
+
+    def _prepare(self, fd: int, size: int, header: bytes) -> bool:
+        # 新建的空文件就地初始化；文件头与当前参数不符（布局升级或容量变化）时另建文件原子替换后重新打开，
+        # 仍映射旧文件的进程不受截断影响，重启后改用新文件。
+        current_size = os.fstat(fd).st_size
+        if current_size == size and os.pread(fd, _HEADER.size, 0) == header:
+            return True
+        if current_size == 0:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, header, 0)
+            return True
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        temp_fd = os.open(str(temp_path), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(temp_fd, size)
+            os.pwrite(temp_fd, header, 0)
+        finally:
+            os.close(temp_fd)
+        os.replace(temp_path, self.path)
+        return False
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        # flock 按打开的文件描述归属：同一进程内的线程另以线程锁互斥；
+        # fork 出的子进程与父进程共享描述，需关闭继承的描述符后重新打开文件（映射本身可继续共用）。
+        with self._lock:
+            if self._pid != os.getpid():
+                os.close(self._fd)
+                self._fd = os.open(str(self.path), os.O_RDWR)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+    def _cursor(self) -> int:
+        return _CURSOR.unpack_from(self._map, _CURSOR_OFFSET)[0]
+
+    def _slot_offset(self, index: int) -> int:
+        return _HEADER_SIZE + index * _SLOT.size
+
+    def _slot_seq(self, index: int) -> int:
+        return _SEQ.unpack_from(self._map, self._slot_offset(index))[0]
+
+    def _set_slots(self, digest: bytes) -> range:
+        first = int.from_bytes(digest[:8], "little") % (self.n_slots // _WAYS) * _WAYS
+        return range(first, first + _WAYS)
+
+    def _is_live(self, offset: int, length: int, expires_at: float, cursor: int, now: float) -> bool:
+        return offset + self.capacity >= cursor and (not expires_at or expires_at > now)
+
+    def _read(self, digest: bytes) -> tuple[bool, Optional[bytes]]:
+        # 返回（读取是否一致, 记录）；不一致时由调用方重试。
+        for index in self._set_slots(digest):
+            slot_offset = self._slot_offset(index)
+            seq, slot_digest, offset, length, checksum, expires_at = _SLOT.unpack_from(self._map, slot_offset)
+            if slot_digest != digest:
+                continue
+            if seq % 2:
+                return False, None
+            if not length:
+                return True, None
+            if expires_at and expires_at <= time.time():
+                self._count("expirations")
+                return True, None
+            start = self._data_offset + offset % self.capacity
+            payload = self._map[start : start + length]
+            if self._slot_seq(index) != seq:
+                return False, None
+            if offset + self.capacity < self._cursor() or zlib.crc32(payload) != checksum:
+                return True, None
+            return True, payload
+        return True, None
+
+    def _victim(self, digest: bytes, cursor: int) -> int:
+        # 依次选择：同键槽位、空槽或已失效槽位、组内记录最旧的槽位。
+        now = time.time()
+        oldest_index = -1
+        oldest_offset = None
+        for index in self._set_slots(digest):
+            _, slot_digest, offset, length, _, expires_at = _SLOT.unpack_from(self._map, self._slot_offset(index))
+            if slot_digest == digest or not length or not self._is_live(offset, length, expires_at, cursor, now):
+                return index
+            if oldest_offset is None or offset < oldest_offset:
+                oldest_index, oldest_offset = index, offset
+        self._count("evictions")
+        return oldest_index
+
+    def _write_slot(self, index: int, digest: bytes, offset: int, payload: bytes, expires_at: float) -> None:
+        slot_offset = self._slot_offset(index)
+        seq = self._slot_seq(index)
+        # 序号为奇数期间读者视槽位为写入中。
+        self._map[slot_offset : slot_offset + _SEQ.size] = _SEQ.pack(seq + 1)
+        self._map[slot_offset + _SEQ.size : slot_offset + _SLOT.size] = _SLOT.pack(
+            0, digest, offset, len(payload), zlib.crc32(payload), expires_at
+        )[_SEQ.size :]
+        self._map[slot_offset : slot_offset + _SEQ.size] = _SEQ.pack(seq + 2)
+
+
+class TieredCache:
+    # 进程内 LRU 在前、共享缓存在后：本地未命中时查共享层，命中后回填本地；写入同时写两层。
+
+    def __init__(self, local: LRUCache, shared: SharedMemoryCache) -> None:
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.local.put(key, value)
+        self.shared.put(key, value)
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self) -> dict[str, float]:
+        shared = {f"shared_{name}": value for name, value in self.shared.stats().items()}
+        return {**self.local.stats(), **shared}
+
+
+def tiered_cache(local: LRUCache, path: Optional[str], max_bytes: int, slots: int) -> LRUCache | TieredCache:
+    # 未配置路径或平台不支持时退回纯进程内缓存。
+    if path is None:
+        return local
+    try:
+        shared = SharedMemoryCache(Path(path), max_bytes, slots, ttl_seconds=local.ttl_seconds)
+    except (OSError, RuntimeError):
+        return local
+    return TieredCache(local, shared)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import warnings
+
+from app.models import (
+    BehaviorSeriesRequest,
+    HeatmapBatchRequest,
+    HeatmapColumnarResponse,
+    HeatmapRequest,
+    HeatmapResponse,
+    HeatmapTreeRequest,
+)
+from app.services.analysis_service import (
+    build_behavior_series_response,
+    build_heatmap_batch_response,
+    build_heatmap_response,
+    build_heatmap_tree_response,
+    heatmap_payload,
+)
+
+BIRTH = {"gender": "male", "calendar": "solar", "birth_date": "1990-03-05", "birth_time": "10:00:00"}
+
+
+def _dump_without_warnings(model) -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        model.model_dump_json()
+
+
+def test_heatmap_response_is_validated_model():
+    request = HeatmapRequest(birth=BIRTH, view="day", year=2024, month=2)
+    response = build_heatmap_response(request)
+    assert isinstance(response, HeatmapResponse)
+    assert 0.0 <= response.cells[0].value <= 1.0
+    big_luck = response.cells[0].pillars.big_luck
+    assert big_luck.label == big_luck.stem + big_luck.branch
+    assert response.birth_pillars.day.label
+    _dump_without_warnings(response)
+    # 模型导出与 HTTP 层直接输出的载荷一致。
+    assert response.model_dump() == heatmap_payload(request)
+
+
+def test_columnar_response_is_validated_model():
+    request = HeatmapRequest(birth=BIRTH, view="month", year=2024, format="columnar")
+    response = build_heatmap_response(request)
+    assert isinstance(response, HeatmapColumnarResponse)
+    assert response.birth_pillars.year.label
+    _dump_without_warnings(response)
+    assert response.model_dump() == heatmap_payload(request)
+
+
+def test_batch_tree_and_series_are_validated_models():
+    batch = build_heatmap_batch_response(HeatmapBatchRequest(births=[BIRTH, BIRTH], view="month", year=2024))
+    assert batch.items[1].result.cells[0].ten_god_scores[0].key
+    _dump_without_warnings(batch)
+    tree = build_heatmap_tree_response(HeatmapTreeRequest(birth=BIRTH, view="month", depth="day", year=2024))
+    assert len(tree.root.children) == len(tree.root.cells)
+    _dump_without_warnings(tree)
+    series = build_behavior_series_response(BehaviorSeriesRequest(birth=BIRTH, focus_datetimes=["2025-01-01T00:00:00"]))
+    assert set(series.points[0].risk_levels.values()) <= {"高", "中", "低"}
+    _dump_without_warnings(series)
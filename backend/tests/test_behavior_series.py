@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import CHINA_TZ
+from app.services.analysis_service import _level_runs
+
+BIRTH = {"gender": "male", "calendar": "solar", "birth_date": "1990-03-05", "birth_time": "10:00:00"}
+
+
+def _expand(runs: list[dict]) -> list[str]:
+    levels = []
+    for run in runs:
+        assert run["start_index"] == len(levels)
+        assert run["length"] >= 1
+        levels.extend([run["risk_level"]] * run["length"])
+    return levels
+
+
+def _assert_runs_round_trip(body: dict) -> None:
+    points = body["points"]
+    for category, runs in body["level_runs"].items():
+        assert _expand(runs) == [point["risk_levels"][category] for point in points]
+        # 相邻两段级别必不相同，否则应合并。
+        assert all(earlier["risk_level"] != later["risk_level"] for earlier, later in zip(runs, runs[1:]))
+        assert [run["start_datetime"] for run in runs] == [points[run["start_index"]]["focus_datetime"] for run in runs]
+
+
+@pytest.mark.parametrize(
+    "window",
+    [
+        {"start": "2020-01-01", "end": "2030-01-01", "resolution": "month"},
+        {"start": "2024-01-01", "end": "2025-01-01", "resolution": "day"},
+        {"start": "2024-02-03", "end": "2024-02-06", "resolution": "hour"},
+    ],
+)
+def test_runs_expand_to_point_levels(client, window):
+    response = client.post("/api/analysis/behavior/series", json={"birth": BIRTH, **window})
+    assert response.status_code == 200
+    body = response.json()
+    _assert_runs_round_trip(body)
+    assert any(len(runs) > 1 for runs in body["level_runs"].values())
+
+
+def test_constant_series_is_a_single_run(client):
+    focus = ["2024-05-01T10:00:00"] * 5
+    response = client.post("/api/analysis/behavior/series", json={"birth": BIRTH, "focus_datetimes": focus})
+    assert response.status_code == 200
+    body = response.json()
+    _assert_runs_round_trip(body)
+    for runs in body["level_runs"].values():
+        assert [(run["start_index"], run["length"]) for run in runs] == [(0, 5)]
+
+
+def test_single_point_series(client):
+    response = client.post("/api/analysis/behavior/series", json={"birth": BIRTH, "focus_datetimes": ["2024-05-01T10:00:00"]})
+    assert response.status_code == 200
+    body = response.json()
+    _assert_runs_round_trip(body)
+    assert all(len(runs) == 1 for runs in body["level_runs"].values())
+
+
+def test_level_runs_encoding():
+    start = datetime(2024, 1, 1, tzinfo=CHINA_TZ)
+    levels = ["低", "低", "中", "高", "高", "高", "低"]
+    focus_dts = [start + timedelta(hours=index) for index in range(len(levels))]
+    runs = _level_runs(focus_dts, levels)
+    assert [(run["risk_level"], run["start_index"], run["length"]) for run in runs] == [
+        ("低", 0, 2),
+        ("中", 2, 1),
+        ("高", 3, 3),
+        ("低", 6, 1),
+    ]
+    assert _expand(runs) == levels
+    assert runs[2]["start_datetime"] == focus_dts[3].isoformat()
+    assert _level_runs(focus_dts[:3], ["中"] * 3) == [
+        {"risk_level": "中", "start_index": 0, "length": 3, "start_datetime": focus_dts[0].isoformat()}
+    ]
+    assert _level_runs([], []) == []
+
+
+def test_empty_series_is_rejected(client):
+    response = client.post("/api/analysis/behavior/series", json={"birth": BIRTH, "focus_datetimes": []})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "行为序列至少需要一个时间点"
+    # 空区间同样没有时间点。
+    response = client.post(
+        "/api/analysis/behavior/series",
+        json={"birth": BIRTH, "start": "2024-01-01", "end": "2024-01-01", "resolution": "day"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import pytest
+
+from app import benchmarks
+
+ARGS = ["--calendar", "stub", "--rounds", "1", "--cases", "compute_bazi_profile", "score_pillar"]
+
+
+def test_missing_baseline_fails_the_gate(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    assert benchmarks.main([*ARGS, "--baseline", str(baseline)]) == 2
+    assert "--save" in capsys.readouterr().out
+    assert not baseline.exists()
+
+
+def test_baseline_without_a_case_fails_the_gate(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    assert benchmarks.main([*ARGS[:-1], "--baseline", str(baseline), "--save"]) == 0
+    capsys.readouterr()
+    assert benchmarks.main([*ARGS, "--baseline", str(baseline)]) == 2
+    assert "score_pillar" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("threshold, status", [("100", 0), ("-1", 1)])
+def test_recorded_baseline_is_compared(tmp_path, threshold, status):
+    baseline = tmp_path / "baseline.json"
+    assert benchmarks.main([*ARGS, "--baseline", str(baseline), "--save"]) == 0
+    assert benchmarks.main([*ARGS, "--baseline", str(baseline), "--threshold", threshold]) == status
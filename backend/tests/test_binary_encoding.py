@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import pytest
+
+from app.models import HeatmapBatchRequest, HeatmapBatchResponse, HeatmapRequest, HeatmapResponse
+from app.serialization import (
+    ARROW_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    decode_heatmap,
+    decode_heatmap_batch,
+    encode_heatmap,
+    encode_heatmap_batch,
+    negotiate_media_type,
+)
+from app.services import analysis_service
+
+BIRTHS = [
+    {"gender": "female", "calendar": "lunar", "birth_date": "1985-08-09", "birth_time": "23:10:00"},
+    {"gender": "male", "calendar": "solar", "birth_date": "1999-02-04", "birth_time": "08:10:00"},
+]
+VIEWS = [
+    {"view": "year", "year": 2026},
+    {"view": "hour", "year": 2024, "month": 2, "day": 4},
+    {"view": "range", "start": "2024-01-01T00:00:00", "end": "2024-03-01T00:00:00", "resolution": "hour"},
+]
+
+
+@pytest.fixture(params=[MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE])
+def media_type(request):
+    pytest.importorskip("msgpack" if request.param == MSGPACK_MEDIA_TYPE else "pyarrow")
+    return request.param
+
+
+def test_negotiate_media_type():
+    assert negotiate_media_type(None) == "application/json"
+    assert negotiate_media_type("text/html") == "application/json"
+    assert negotiate_media_type("application/json;q=0.5, application/msgpack") == MSGPACK_MEDIA_TYPE
+    assert negotiate_media_type("application/x-msgpack") == MSGPACK_MEDIA_TYPE
+    assert negotiate_media_type(f"{ARROW_MEDIA_TYPE};q=0.9, application/json;q=0.8") == ARROW_MEDIA_TYPE
+
+
+@pytest.mark.parametrize("birth", BIRTHS)
+@pytest.mark.parametrize("view", VIEWS)
+def test_heatmap_round_trip(media_type, birth, view):
+    expected = analysis_service.build_heatmap_response(HeatmapRequest(birth=birth, **view))
+    columnar = analysis_service.heatmap_payload(HeatmapRequest(birth=birth, **view, format="columnar"))
+    decoded = decode_heatmap(encode_heatmap(columnar, media_type), media_type)
+    assert HeatmapResponse.model_validate(decoded) == expected
+    assert decoded == expected.model_dump()
+
+
+def test_batch_round_trip(media_type, monkeypatch):
+    natal_context = analysis_service._natal_context
+
+    def failing_natal_context(birth):
+        if birth.birth_date.year == 2101:
+            raise ValueError("出生日期超出日历范围")
+        return natal_context(birth)
+
+    monkeypatch.setattr(analysis_service, "_natal_context", failing_natal_context)
+    births = [BIRTHS[0], {**BIRTHS[1], "birth_date": "2101-01-01"}, BIRTHS[1]]
+    view = {"view": "day", "year": 2024, "month": 2}
+    expected = analysis_service.build_heatmap_batch_response(HeatmapBatchRequest(births=births, **view))
+    columnar = analysis_service.heatmap_batch_payload(HeatmapBatchRequest(births=births, **view, format="columnar"))
+    decoded = decode_heatmap_batch(encode_heatmap_batch(columnar, media_type), media_type)
+    assert HeatmapBatchResponse.model_validate(decoded) == expected
+    assert [item["error"] for item in decoded["items"]] == [None, "出生日期超出日历范围", None]
+
+
+def test_http_negotiation(client, media_type):
+    body = {"birth": BIRTHS[0], **VIEWS[1]}
+    expected = client.post("/api/analysis/heatmap", json=body).json()
+    response = client.post("/api/analysis/heatmap", json=body, headers={"Accept": media_type})
+    assert response.headers["content-type"] == media_type
+    assert "Accept" in response.headers["vary"]
+    assert decode_heatmap(response.content, media_type) == expected
+
+    params = {**BIRTHS[0], **VIEWS[1]}
+    response = client.get("/api/analysis/heatmap", params=params, headers={"Accept": media_type})
+    assert response.headers["content-type"] == media_type
+    assert decode_heatmap(response.content, media_type) == expected
+    assert response.headers["etag"] != client.get("/api/analysis/heatmap", params=params).headers["etag"]
+
+    batch = {"births": BIRTHS, "view": "month", "year": 2024}
+    expected = client.post("/api/analysis/heatmap/batch", json=batch).json()
+    response = client.post("/api/analysis/heatmap/batch", json=batch, headers={"Accept": media_type})
+    assert response.headers["content-type"] == media_type
+    assert decode_heatmap_batch(response.content, media_type) == expected
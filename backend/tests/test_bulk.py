@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import csv
+import json
+
+import pytest
+
+from app import bulk
+from app.engine.ten_gods import TEN_GODS
+from app.engine.vectorized import LAYERS
+from app.models import HeatmapRequest
+from app.services.analysis_service import compute_heatmap_payload
+
+BIRTHS = [
+    {"id": "a", "gender": "male", "calendar": "solar", "birth_date": "1988-12-21", "birth_time": "14:00:00"},
+    {"id": "b", "gender": "female", "calendar": "solar", "birth_date": "1977-10-03", "birth_time": "05:45:00"},
+    {"id": "c", "gender": "male", "calendar": "lunar", "birth_date": "1990-04-15", "birth_time": "23:30:00"},
+    {"id": "d", "gender": "female", "calendar": "solar", "birth_date": "not-a-date", "birth_time": "08:00:00"},
+    {"id": "", "gender": "female", "calendar": "solar", "birth_date": "2001-01-01", "birth_time": "00:10:00"},
+]
+VIEW = {"view": "day", "year": 2026, "month": 1, "day": 5}
+VIEW_ARGS = ["--view", "day", "--year", "2026", "--month", "1", "--day", "5"]
+# 每块 2 条：块 0 为行 0–1，块 1 为行 2–3（行 3 无效），块 2 为行 4。
+CHUNK_ARGS = ["--chunk-size", "2"]
+
+
+@pytest.fixture
+def births_csv(tmp_path):
+    path = tmp_path / "births.csv"
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(BIRTHS[0]))
+        writer.writeheader()
+        writer.writerows(BIRTHS)
+    return path
+
+
+def _run(input_path, output_dir, *extra: str) -> int:
+    return bulk.main([str(input_path), str(output_dir), *VIEW_ARGS, *CHUNK_ARGS, "--workers", "1", *extra])
+
+
+def _outputs(output_dir) -> dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(output_dir.glob("part-*"))}
+
+
+def _expected(index: int) -> dict:
+    birth = {name: value for name, value in BIRTHS[index].items() if name != "id"}
+    return compute_heatmap_payload(HeatmapRequest(birth=birth, format="columnar", **VIEW))
+
+
+def _assert_rows_match(rows: list[dict]) -> None:
+    by_row: dict[int, list[dict]] = {}
+    for row in rows:
+        by_row.setdefault(int(row["row"]), []).append(row)
+    assert sorted(by_row) == [0, 1, 2, 4]
+    for index, cells in by_row.items():
+        expected = _expected(index)
+        assert len(cells) == len(expected["values"])
+        for position, cell in enumerate(cells):
+            assert (cell["id"] or None) == (BIRTHS[index]["id"] or None)
+            assert cell["label"] == expected["labels"][position]
+            assert cell["iso_datetime"] == expected["iso_datetimes"][position]
+            assert float(cell["value"]) == expected["values"][position]
+            assert [int(cell[f"ten_god_{god}"]) for god in TEN_GODS] == list(expected["ten_god_scores"][position])
+            assert [int(cell[f"pillar_{layer}"]) for layer in LAYERS] == [
+                expected["pillar_indices"][layer][position] for layer in LAYERS
+            ]
+
+
+def test_csv_output_matches_service(births_csv, tmp_path):
+    output_dir = tmp_path / "out"
+    assert _run(births_csv, output_dir, "--output-format", "csv") == 0
+    assert sorted(_outputs(output_dir)) == [
+        "part-000000.csv",
+        "part-000001.csv",
+        "part-000001.errors.jsonl",
+        "part-000002.csv",
+    ]
+    checkpoint = json.loads((output_dir / bulk.CHECKPOINT_NAME).read_text(encoding="utf-8"))
+    assert checkpoint["completed"] == [0, 1, 2]
+    assert (checkpoint["rows"], checkpoint["errors"]) == (5, 1)
+
+    errors = [json.loads(line) for line in (output_dir / "part-000001.errors.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(error["row"], error["id"]) for error in errors] == [(3, "d")]
+
+    rows = []
+    for path in sorted(output_dir.glob("part-*.csv")):
+        with open(path, newline="", encoding="utf-8") as handle:
+            rows.extend(csv.DictReader(handle))
+    assert checkpoint["cells"] == len(rows)
+    _assert_rows_match(rows)
+
+
+def test_interrupted_run_resumes_remaining_chunks(births_csv, tmp_path, monkeypatch):
+    reference = tmp_path / "reference"
+    assert _run(births_csv, reference, "--output-format", "csv") == 0
+
+    output_dir = tmp_path / "out"
+    compute = bulk.columnar_heatmap_payload
+    calls = []
+
+    def interrupt_on_third(*args, **kwargs):
+        calls.append(None)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return compute(*args, **kwargs)
+
+    # 块 1 计算中途中断：块 0 已落盘并记入检查点，块 1 的临时分片被清理。
+    monkeypatch.setattr(bulk, "columnar_heatmap_payload", interrupt_on_third)
+    with pytest.raises(KeyboardInterrupt):
+        _run(births_csv, output_dir, "--output-format", "csv")
+    assert sorted(_outputs(output_dir)) == ["part-000000.csv"]
+    assert not list(output_dir.glob("*.tmp"))
+    assert json.loads((output_dir / bulk.CHECKPOINT_NAME).read_text(encoding="utf-8"))["completed"] == [0]
+
+    monkeypatch.setattr(bulk, "columnar_heatmap_payload", compute)
+    evaluated = []
+    evaluate_chunk = bulk.evaluate_chunk
+
+    def tracking_evaluate(job, output_dir, chunk_index, rows):
+        evaluated.append(chunk_index)
+        return evaluate_chunk(job, output_dir, chunk_index, rows)
+
+    monkeypatch.setattr(bulk, "evaluate_chunk", tracking_evaluate)
+    assert _run(births_csv, output_dir, "--output-format", "csv") == 0
+    assert evaluated == [1, 2]
+    assert _outputs(output_dir) == _outputs(reference)
+    resumed = json.loads((output_dir / bulk.CHECKPOINT_NAME).read_text(encoding="utf-8"))
+    finished = json.loads((reference / bulk.CHECKPOINT_NAME).read_text(encoding="utf-8"))
+    assert resumed == finished
+
+    # 全部完成后再次运行不重算任何块。
+    evaluated.clear()
+    assert _run(births_csv, output_dir, "--output-format", "csv") == 0
+    assert evaluated == []
+
+
+def test_changed_parameters_require_restart(births_csv, tmp_path, capsys):
+    output_dir = tmp_path / "out"
+    assert _run(births_csv, output_dir, "--output-format", "csv") == 0
+    before = _outputs(output_dir)
+
+    assert _run(births_csv, output_dir, "--output-format", "csv", "--id-column", "key") == 2
+    assert "--restart" in capsys.readouterr().out
+    assert _outputs(output_dir) == before
+
+    # --restart 清空旧分片（含错误文件）后按新参数重算：id 列改名后原 id 作为未知字段被忽略。
+    assert _run(births_csv, output_dir, "--output-format", "csv", "--id-column", "key", "--restart") == 0
+    checkpoint = json.loads((output_dir / bulk.CHECKPOINT_NAME).read_text(encoding="utf-8"))
+    assert checkpoint["job"]["id_column"] == "key"
+    assert checkpoint["rows"] == 5
+    assert sorted(_outputs(output_dir)) == sorted(before)
+
+
+def test_invalid_view_is_reported_before_reading(births_csv, tmp_path, capsys):
+    output_dir = tmp_path / "out"
+    args = [str(births_csv), str(output_dir), "--view", "day", "--year", "2026", "--month", "13", "--day", "1"]
+    assert bulk.main(args) == 2
+    assert capsys.readouterr().out.startswith("错误：")
+    assert _outputs(output_dir) == {}
+
+
+def test_jsonl_to_parquet_with_process_pool(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    input_path = tmp_path / "births.jsonl"
+    input_path.write_text("".join(json.dumps(birth) + "\n" for birth in BIRTHS), encoding="utf-8")
+    output_dir = tmp_path / "out"
+    assert bulk.main([str(input_path), str(output_dir), *VIEW_ARGS, *CHUNK_ARGS, "--workers", "2"]) == 0
+
+    parts = sorted(output_dir.glob("part-*.parquet"))
+    assert [path.name for path in parts] == ["part-000000.parquet", "part-000001.parquet", "part-000002.parquet"]
+    rows = [row for path in parts for row in parquet.read_table(path).to_pylist()]
+    _assert_rows_match(rows)
+
+    # 同一输入转为 Parquet 后输出一致。
+    pa = pytest.importorskip("pyarrow")
+    parquet_input = tmp_path / "births.parquet"
+    parquet.write_table(pa.Table.from_pylist(BIRTHS), parquet_input)
+    parquet_output = tmp_path / "out-parquet"
+    assert bulk.main([str(parquet_input), str(parquet_output), *VIEW_ARGS, *CHUNK_ARGS, "--workers", "1"]) == 0
+    converted = [row for path in sorted(parquet_output.glob("part-*.parquet")) for row in parquet.read_table(path).to_pylist()]
+    assert converted == rows
+
+
+def test_malformed_jsonl_lines_are_reported_and_skipped(tmp_path):
+    input_path = tmp_path / "births.jsonl"
+    lines = [json.dumps(BIRTHS[0]), '{"id": "broken", "gender": ', "", json.dumps(BIRTHS[1]), "[1, 2]", json.dumps(BIRTHS[3])]
+    input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    output_dir = tmp_path / "out"
+    assert _run(input_path, output_dir, "--output-format", "csv") == 0
+
+    checkpoint = json.loads((output_dir / bulk.CHECKPOINT_NAME).read_text(encoding="utf-8"))
+    assert checkpoint["completed"] == [0, 1, 2]
+    assert (checkpoint["rows"], checkpoint["errors"]) == (5, 3)
+    errors = [
+        json.loads(line)
+        for path in sorted(output_dir.glob("part-*.errors.jsonl"))
+        for line in path.read_text(encoding="utf-8").splitlines()
+    ]
+    assert [(error["row"], error.get("line"), error["id"]) for error in errors] == [(1, 2, None), (3, 5, None), (4, None, "d")]
+    assert errors[0]["error"].startswith("第 2 行不是有效的 JSON")
+    assert errors[1]["error"] == "第 5 行应为 JSON 对象"
+
+    rows = []
+    for path in sorted(output_dir.glob("part-*.csv")):
+        with open(path, newline="", encoding="utf-8") as handle:
+            rows.extend(csv.DictReader(handle))
+    assert sorted({int(row["row"]) for row in rows}) == [0, 2]
+    assert [row["label"] for row in rows if row["row"] == "2"] == _expected(1)["labels"]
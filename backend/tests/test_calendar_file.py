@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import mmap
+
+import pytest
+
+from app.adapters import calendar_file
+from app.adapters.calendar_file import CalendarData, load_calendar_file, write_calendar_file
+
+DATA = CalendarData(
+    jieqi_seconds=[-86400, 0, 1_296_000, 2_592_000],
+    jieqi_indices=[22, 23, 0, 1],
+    jie_ordinals=[730_000, 730_030],
+    jie_year_indices=[16, 16],
+    jie_month_indices=[1, 2],
+)
+
+
+@pytest.fixture
+def mappings(monkeypatch):
+    # 记录 load_calendar_file 创建的映射并保持引用，未显式关闭的映射不会被回收掩盖。
+    created = []
+
+    class TrackedMmap(mmap.mmap):
+        def __new__(cls, *args, **kwargs):
+            mapped = super().__new__(cls, *args, **kwargs)
+            created.append(mapped)
+            return mapped
+
+    monkeypatch.setattr(calendar_file.mmap, "mmap", TrackedMmap)
+    return created
+
+
+@pytest.fixture
+def calendar_path(tmp_path):
+    path = tmp_path / "calendar_table.bin"
+    write_calendar_file(path, DATA, 2000, 2001)
+    return path
+
+
+def test_round_trip(calendar_path):
+    data = load_calendar_file(calendar_path, 2000, 2001)
+    assert list(data.jieqi_seconds) == DATA.jieqi_seconds
+    assert list(data.jieqi_indices) == DATA.jieqi_indices
+    assert list(data.jie_ordinals) == DATA.jie_ordinals
+    assert list(data.jie_year_indices) == DATA.jie_year_indices
+    assert list(data.jie_month_indices) == DATA.jie_month_indices
+
+
+def _corrupt(path, offset: int, value: bytes) -> None:
+    content = bytearray(path.read_bytes())
+    content[offset : offset + len(value)] = value
+    path.write_bytes(bytes(content))
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        lambda path: _corrupt(path, 0, b"XXXXXXXX"),
+        lambda path: _corrupt(path, 8, (calendar_file.CALENDAR_FILE_VERSION + 1).to_bytes(4, "little")),
+        lambda path: path.write_bytes(path.read_bytes() + b"\x00"),
+        lambda path: _corrupt(path, len(path.read_bytes()) - 1, b"\x07"),
+        lambda path: path.write_bytes(path.read_bytes()[:32]),
+        lambda path: path.write_bytes(b""),
+    ],
+    ids=["magic", "version", "size", "checksum", "short", "empty"],
+)
+def test_rejected_files_release_the_mapping(calendar_path, mappings, damage):
+    damage(calendar_path)
+    assert load_calendar_file(calendar_path, 2000, 2001) is None
+    assert all(mapped.closed for mapped in mappings)
+
+
+def test_year_range_mismatch_releases_the_mapping(calendar_path, mappings):
+    assert load_calendar_file(calendar_path, 1900, 2100) is None
+    assert len(mappings) == 1 and mappings[0].closed
+    assert load_calendar_file(calendar_path.with_name("missing.bin"), 2000, 2001) is None
+    # 接受的文件保持映射打开，数据直接引用映射内存。
+    data = load_calendar_file(calendar_path, 2000, 2001)
+    assert not mappings[-1].closed
+    assert list(data.jieqi_seconds) == DATA.jieqi_seconds
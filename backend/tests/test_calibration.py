@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pytest
+
+from app import calibration
+from app.config import CONFIG_VERSION
+from app.engine.vectorized import ViewRawScores, normalize_view, normalize_with_table, raw_activations
+from app.services import calibration_table as calibration_module
+from app.services.calibration_table import (
+    CALIBRATION_FORMAT_VERSION,
+    load_calibration_table,
+    write_calibration_table,
+)
+
+BIRTH = {"gender": "male", "calendar": "solar", "birth_date": "1988-12-21", "birth_time": "14:00:00"}
+CDF = [0.0, 0.1, 0.35, 0.5, 0.8, 1.0]
+
+
+def _raw(activations) -> ViewRawScores:
+    activations = np.asarray(activations, dtype=np.float64)
+    rng = np.random.default_rng(0)
+    return ViewRawScores(
+        long_base=activations * 0.75,
+        short_component=activations * 0.25,
+        ten_gods=rng.normal(size=(len(activations), 10)),
+    )
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    path = tmp_path / "calibration_table.json"
+    write_calibration_table(path, 1.0, 6.0, CDF, {"charts": 3})
+    return path
+
+
+def test_write_and_load_round_trip(table_path):
+    table = load_calibration_table(table_path)
+    assert (table.activation_min, table.activation_max) == (1.0, 6.0)
+    assert table.cdf.tolist() == CDF
+    assert load_calibration_table(table_path).digest == table.digest
+    # 写入经临时文件替换，不留下中间文件。
+    assert [path.name for path in table_path.parent.iterdir()] == [table_path.name]
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"format_version": CALIBRATION_FORMAT_VERSION + 1},
+        {"config_version": CONFIG_VERSION + "-stale"},
+        {"cdf": [0.0, 0.6, 0.4, 1.0]},
+        {"cdf": [0.0]},
+        {"activation_max": 1.0},
+        {"cdf": "invalid"},
+    ],
+)
+def test_invalid_tables_are_rejected(table_path, change):
+    payload = json.loads(table_path.read_text(encoding="utf-8"))
+    table_path.write_text(json.dumps({**payload, **change}), encoding="utf-8")
+    assert load_calibration_table(table_path) is None
+
+
+def test_missing_or_corrupt_file(tmp_path):
+    assert load_calibration_table(tmp_path / "missing.json") is None
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{", encoding="utf-8")
+    assert load_calibration_table(corrupt) is None
+
+
+def test_normalize_with_table_interpolates_cdf(table_path):
+    table = load_calibration_table(table_path)
+    activations = np.array([0.0, 1.0, 1.5, 2.0, 3.25, 5.99, 6.0, 9.0])
+    raw = _raw(activations)
+    values, ten_god_scores = normalize_with_table(raw, table)
+    grid = np.linspace(1.0, 6.0, len(CDF))
+    assert np.allclose(values, np.interp(raw_activations(raw), grid, CDF), rtol=0, atol=1e-12)
+    # 超出表范围的激活值截断到 0 / 1。
+    assert values[0] == 0.0 and values[-1] == 1.0
+    # 十神评分仍按视图内相对值计算。
+    assert np.array_equal(ten_god_scores, normalize_view(raw)[1])
+
+
+@pytest.fixture
+def installed_table(tmp_path, monkeypatch):
+    path = tmp_path / "calibration_table.json"
+    monkeypatch.setattr(calibration_module, "CALIBRATION_TABLE_PATH", path)
+    monkeypatch.setattr(calibration_module, "_table", None)
+    return path
+
+
+def test_calibration_table_requires_file(installed_table):
+    with pytest.raises(RuntimeError):
+        calibration_module.calibration_table()
+    write_calibration_table(installed_table, 1.0, 6.0, CDF, {})
+    table = calibration_module.calibration_table()
+    # 加载成功后常驻内存，文件删除不影响。
+    installed_table.unlink()
+    assert calibration_module.calibration_table() is table
+
+
+def test_built_table_serves_global_heatmaps(installed_table, client):
+    body = {"birth": BIRTH, "view": "month", "year": 2024, "normalization": "global"}
+    response = client.post("/api/analysis/heatmap", json=body)
+    assert response.status_code == 503
+
+    low, high, cdf, info = calibration.build_calibration((2000, 2000), (2024, 2024), 1, 65, 1)
+    assert low < high and len(cdf) == 65 and cdf[0] == 0.0 and cdf[-1] == 1.0
+    assert all(b >= a for a, b in zip(cdf, cdf[1:]))
+    write_calibration_table(installed_table, low, high, cdf, info)
+    assert calibration.main(["--check", "--output", str(installed_table)]) == 0
+
+    response = client.post("/api/analysis/heatmap", json=body)
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["meta"]["normalization"] == "global"
+    assert payload["meta"]["calibration"]["digest"] == load_calibration_table(installed_table).digest
+    assert all(0.0 <= cell["value"] <= 1.0 for cell in payload["cells"])
+    # 同一时刻在不同视图中的全局取值相同。
+    march = {"view": "range", "start": "2024-03-01", "end": "2024-04-01", "resolution": "month"}
+    cell = client.post("/api/analysis/heatmap", json={**body, **march}).json()["cells"][0]
+    assert cell["iso_datetime"] == payload["cells"][2]["iso_datetime"]
+    assert cell["value"] == payload["cells"][2]["value"]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from app import main
+from app.services import executor
+
+BIRTHS = [
+    {"gender": "female", "calendar": "lunar", "birth_date": "1985-08-09", "birth_time": "23:10:00"},
+    {"gender": "male", "calendar": "solar", "birth_date": "1999-02-04", "birth_time": "08:10:00"},
+    {"gender": "male", "calendar": "solar", "birth_date": "1970-06-30", "birth_time": "12:00:00"},
+]
+BATCH = {"births": BIRTHS, "view": "day", "year": 2024, "month": 5}
+
+
+@pytest.fixture
+def process_mode(monkeypatch):
+    # 每个测试使用新建的进程池，结束时关闭。
+    executor.shutdown_executor()
+    monkeypatch.setattr(executor, "ANALYSIS_EXECUTION_MODE", "process")
+    monkeypatch.setattr(executor, "ANALYSIS_PROCESS_WORKERS", 1)
+    yield
+    executor.shutdown_executor()
+
+
+def test_map_analysis_preserves_order(process_mode):
+    assert asyncio.run(executor.map_analysis(abs, [-3, 1, -2, 5, -4])) == [3, 1, 2, 5, 4]
+
+
+def test_map_analysis_times_out(process_mode, monkeypatch):
+    monkeypatch.setattr(executor, "ANALYSIS_TIMEOUT_SECONDS", 0.2)
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError, match="超时"):
+        asyncio.run(executor.map_analysis(time.sleep, [2.0, 2.0]))
+    assert time.perf_counter() - started < 1.5
+
+
+@pytest.mark.parametrize("min_parallel", [1, 100])
+def test_batch_in_process_mode_matches_thread_mode(client, process_mode, monkeypatch, min_parallel):
+    # min_parallel=1 时逐条分块分派，100 时整批交给一个子进程。
+    monkeypatch.setattr(executor, "ANALYSIS_EXECUTION_MODE", "thread")
+    expected = client.post("/api/analysis/heatmap/batch", json=BATCH).content
+    monkeypatch.setattr(executor, "ANALYSIS_EXECUTION_MODE", "process")
+    monkeypatch.setattr(main, "HEATMAP_BATCH_MIN_PARALLEL_ITEMS", min_parallel)
+    response = client.post("/api/analysis/heatmap/batch", json=BATCH)
+    assert response.status_code == 200
+    assert response.content == expected
+
+
+@pytest.mark.parametrize("min_parallel", [1, 100])
+def test_batch_timeout_returns_503(client, process_mode, monkeypatch, min_parallel):
+    monkeypatch.setattr(main, "HEATMAP_BATCH_MIN_PARALLEL_ITEMS", min_parallel)
+    monkeypatch.setattr(executor, "ANALYSIS_TIMEOUT_SECONDS", 1e-6)
+    response = client.post("/api/analysis/heatmap/batch", json=BATCH)
+    assert response.status_code == 503
+    assert response.json() == {"detail": "分析计算超时，请稍后重试。"}
+
+
+def test_batch_validation_errors_in_process_mode(client, process_mode, monkeypatch):
+    monkeypatch.setattr(main, "HEATMAP_BATCH_MIN_PARALLEL_ITEMS", 1)
+    response = client.post("/api/analysis/heatmap/batch", json={**BATCH, "view": "day", "month": 13})
+    assert response.status_code == 400
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+
+import pytest
+
+from app import serialization
+
+BIRTH = {"gender": "male", "calendar": "solar", "birth_date": "1993-07-18", "birth_time": "16:20:00"}
+
+
+def _running_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@pytest.fixture
+def render_threads(monkeypatch):
+    # 记录每次渲染时所在线程是否运行着事件循环。
+    on_loop = []
+    dumps_json = serialization.dumps_json
+    msgpack_heatmap = serialization._msgpack_heatmap
+
+    def tracking_dumps_json(content):
+        on_loop.append(_running_loop())
+        return dumps_json(content)
+
+    def tracking_msgpack_heatmap(content):
+        on_loop.append(_running_loop())
+        return msgpack_heatmap(content)
+
+    monkeypatch.setattr(serialization, "dumps_json", tracking_dumps_json)
+    monkeypatch.setattr(serialization, "_msgpack_heatmap", tracking_msgpack_heatmap)
+    return on_loop
+
+
+def test_serialization_runs_off_the_event_loop(client, render_threads):
+    view = {"view": "day", "year": 2025, "month": 3}
+    requests = [
+        ("post", "/api/analysis/heatmap", {"json": {"birth": BIRTH, **view}}),
+        ("get", "/api/analysis/heatmap", {"params": {**BIRTH, **view}}),
+        ("post", "/api/analysis/heatmap/tree", {"json": {"birth": BIRTH, "view": "year", "year": 2025, "depth": "month"}}),
+        ("post", "/api/analysis/behavior", {"json": {"birth": BIRTH, "focus_datetime": "2025-03-01T10:00:00"}}),
+        (
+            "post",
+            "/api/analysis/behavior/series",
+            {"json": {"birth": BIRTH, "focus_datetimes": ["2025-03-01T10:00:00", "2025-03-01T11:00:00"]}},
+        ),
+    ]
+    if importlib.util.find_spec("msgpack") is not None:
+        requests.append(
+            ("post", "/api/analysis/heatmap", {"json": {"birth": BIRTH, **view}, "headers": {"Accept": "application/msgpack"}})
+        )
+    for method, url, kwargs in requests:
+        assert getattr(client, method)(url, **kwargs).status_code == 200
+    assert len(render_threads) == len(requests)
+    assert not any(render_threads)
+
+
+
+MONTH_QUERY = {**BIRTH, "view": "day", "year": 2025, "month": 3}
+
+
+def _varies_on_accept(response) -> bool:
+    # CORS 中间件会追加 Origin。
+    return "Accept" in [name.strip() for name in response.headers["vary"].split(",")]
+
+
+def test_get_heatmap_cache_headers(client):
+    response = client.get("/api/analysis/heatmap", params=MONTH_QUERY)
+    assert response.status_code == 200
+    assert response.json() == client.post("/api/analysis/heatmap", json={"birth": BIRTH, "view": "day", "year": 2025, "month": 3}).json()
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert _varies_on_accept(response)
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    location = response.headers["content-location"]
+    assert location.startswith("/api/analysis/heatmap?")
+
+    # 等价查询（参数顺序、多余坐标、秒位）得到同一规范 URL 与 ETag，规范 URL 本身也是。
+    equivalent = {"day": 9, **dict(reversed(list(MONTH_QUERY.items()))), "birth_time": "16:20"}
+    for url, params in [("/api/analysis/heatmap", equivalent), (location, None)]:
+        again = client.get(url, params=params)
+        assert again.status_code == 200
+        assert (again.headers["etag"], again.headers["content-location"]) == (etag, location)
+        assert again.content == response.content
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"stale", {etag}', "*"])
+def test_get_heatmap_not_modified(client, if_none_match):
+    etag = client.get("/api/analysis/heatmap", params=MONTH_QUERY).headers["etag"]
+    response = client.get("/api/analysis/heatmap", params=MONTH_QUERY, headers={"If-None-Match": if_none_match.format(etag=etag)})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert _varies_on_accept(response)
+    assert "content-location" in response.headers
+
+
+def test_get_heatmap_stale_etag_returns_body(client):
+    fresh = client.get("/api/analysis/heatmap", params=MONTH_QUERY)
+    other = client.get("/api/analysis/heatmap", params={**MONTH_QUERY, "month": 4}).headers["etag"]
+    assert other != fresh.headers["etag"]
+    response = client.get("/api/analysis/heatmap", params=MONTH_QUERY, headers={"If-None-Match": other})
+    assert response.status_code == 200
+    assert response.headers["etag"] == fresh.headers["etag"]
+    assert response.content == fresh.content
+
+
+def test_get_heatmap_etag_depends_on_accept(client):
+    pytest.importorskip("msgpack")
+    json_etag = client.get("/api/analysis/heatmap", params=MONTH_QUERY).headers["etag"]
+    binary = client.get("/api/analysis/heatmap", params=MONTH_QUERY, headers={"Accept": "application/msgpack"})
+    assert binary.status_code == 200
+    assert binary.headers["content-type"] == "application/msgpack"
+    assert _varies_on_accept(binary)
+    assert binary.headers["etag"] != json_etag
+    # JSON 表示的 ETag 不能让二进制表示返回 304。
+    response = client.get(
+        "/api/analysis/heatmap", params=MONTH_QUERY, headers={"Accept": "application/msgpack", "If-None-Match": json_etag}
+    )
+    assert response.status_code == 200
+    assert response.content == binary.content
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from itertools import product
+
+from app.engine.bazi import Pillar, Pillars, compute_bazi_profile
+from app.engine.constants import BRANCH_CLASHES, BRANCH_COMBINES, BRANCH_HARMS, BRANCH_PUNISHES, BRANCHES
+from app.engine.interactions import BRANCH_INDEX, branch_volatility
+from app.engine.scoring import volatility_factor
+
+
+def _pair_in_set(branch_a: str, branch_b: str, pairs: set[tuple[str, str]]) -> bool:
+    return (branch_a, branch_b) in pairs or (branch_b, branch_a) in pairs
+
+
+def _rule_volatility(natal_branches: list[str], time_branch: str) -> float:
+    # 编译为矩阵之前逐地支扫描关系集合的写法。
+    clashes = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_CLASHES))
+    harms = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_HARMS))
+    punish = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_PUNISHES))
+    combines = sum(1 for b in natal_branches if _pair_in_set(b, time_branch, BRANCH_COMBINES))
+    factor = 1.0 + 0.06 * (clashes + harms + punish) - 0.04 * combines
+    return max(0.8, min(1.3, factor))
+
+
+def test_matrix_matches_per_branch_rules():
+    # 遍历全部 12^4 种本命地支排列与 12 个时间地支，逐位比较。
+    for natal in product(BRANCHES, repeat=4):
+        natal_branches = list(natal)
+        table = branch_volatility(natal_branches)
+        assert table == tuple(_rule_volatility(natal_branches, time_branch) for time_branch in BRANCHES)
+        assert all(type(factor) is float for factor in table)
+
+
+def test_volatility_factor_and_profile_table():
+    natal_branches = ["子", "午", "卯", "午"]
+    for time_branch in BRANCHES:
+        assert volatility_factor(natal_branches, time_branch) == _rule_volatility(natal_branches, time_branch)
+    pillars = Pillars(Pillar("甲", "子"), Pillar("丙", "午"), Pillar("乙", "卯"), Pillar("庚", "午"))
+    profile = compute_bazi_profile(pillars, 1.0, 0.5)
+    assert profile.branch_volatility == branch_volatility(natal_branches)
+    assert profile.branch_volatility[BRANCH_INDEX["子"]] == _rule_volatility(natal_branches, "子")
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("sxtwl")
+
+from app.adapters import sxtwl_adapter  # noqa: E402
+from app.config import CHINA_TZ, JIEQI_TABLE_END_YEAR, JIEQI_TABLE_START_YEAR  # noqa: E402
+
+EDGE_YEARS = (JIEQI_TABLE_START_YEAR, JIEQI_TABLE_START_YEAR + 1, 2000, JIEQI_TABLE_END_YEAR, JIEQI_TABLE_END_YEAR + 1)
+
+
+def _random_moments(count: int) -> list[datetime]:
+    rng = random.Random(20240601)
+    start = datetime(JIEQI_TABLE_START_YEAR, 1, 1, tzinfo=CHINA_TZ)
+    span = int((datetime(JIEQI_TABLE_END_YEAR + 2, 1, 1, tzinfo=CHINA_TZ) - start).total_seconds())
+    moments = []
+    for _ in range(count):
+        microseconds = rng.choice((0, rng.randrange(1, 10**6)))
+        moments.append(start + timedelta(seconds=rng.randrange(span), microseconds=microseconds))
+    return moments
+
+
+def _boundary_moments() -> list[datetime]:
+    # 节气时刻本身及其前后一秒、一微秒：表查与逐日扫描对相等与不足一秒的比较必须一致。
+    seconds = sxtwl_adapter.jieqi_table().seconds
+    rng = random.Random(7)
+    picks = [1, 2, len(seconds) // 2, len(seconds) - 3, len(seconds) - 2, *rng.sample(range(1, len(seconds) - 1), 40)]
+    moments = []
+    for index in picks:
+        exact = sxtwl_adapter._wall_datetime(seconds[index])
+        for offset in (timedelta(0), timedelta(seconds=-1), timedelta(seconds=1), timedelta(microseconds=-1), timedelta(microseconds=1)):
+            moments.append(exact + offset)
+    return moments
+
+
+def _year_edge_moments() -> list[datetime]:
+    moments = []
+    for year in EDGE_YEARS:
+        moments.append(datetime(year, 1, 1, tzinfo=CHINA_TZ))
+        moments.append(datetime(year, 12, 31, 23, 59, 59, 999999, tzinfo=CHINA_TZ))
+        moments.append(datetime(year, 2, 4, 12))
+    # 非北京时区的输入按北京墙上时间比较。
+    moments.append(datetime(1999, 12, 31, 17, 30, tzinfo=timezone.utc))
+    moments.append(datetime(2024, 2, 4, 8, 27, 7, tzinfo=timezone(timedelta(hours=-5))))
+    return moments
+
+
+@pytest.mark.parametrize(
+    "moments",
+    [_random_moments(300), _boundary_moments(), _year_edge_moments()],
+    ids=["random", "boundaries", "year_edges"],
+)
+def test_table_lookup_matches_scan(moments):
+    for moment in moments:
+        scan_moment = moment if moment.tzinfo is not None else moment.replace(tzinfo=CHINA_TZ)
+        assert sxtwl_adapter.next_jieqi_datetime(moment) == sxtwl_adapter._scan_next_jieqi_datetime(scan_moment), moment
+        assert sxtwl_adapter.prev_jieqi_datetime(moment) == sxtwl_adapter._scan_prev_jieqi_datetime(scan_moment), moment
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+from math import floor, inf, nextafter
+
+import pytest
+
+from app.config import CHINA_TZ
+from app.models import BirthInput
+from app.services import analysis_service
+from app.services.analysis_service import normalize_birth
+
+BIRTHS = [
+    {"gender": "male", "calendar": "solar", "birth_date": "1990-03-05", "birth_time": "10:00:00"},
+    {"gender": "female", "calendar": "lunar", "birth_date": "1985-08-09", "birth_time": "23:10:00"},
+    # 1986–1991 年中国实行夏令时。
+    {"gender": "female", "calendar": "solar", "birth_date": "1988-07-14", "birth_time": "03:30:00"},
+    {"gender": "male", "calendar": "solar", "birth_date": "1901-02-04", "birth_time": "12:00:00"},
+]
+
+
+def _linear_luck_index(context, target_dt: datetime) -> int:
+    # 查表前的逐点公式：按实足年龄逐步推算大运。
+    age_years = (target_dt - context.birth_dt).total_seconds() / (365.2425 * 86400)
+    cycles = floor((age_years - context.start_age_years) / 10.0)
+    step = (cycles + 1) * (1 if context.forward else -1)
+    return (context.month_index + step) % 60
+
+
+def _timeline(birth: dict):
+    info = normalize_birth(BirthInput.model_validate(birth))
+    return analysis_service._luck_timeline(info, analysis_service._birth_pillars(info))
+
+
+def _integral_start_timeline(monkeypatch, start_age_years: float, forward: bool):
+    # 365.2425 × 86400 为整数，整年起运时多数起点恰为整秒，可检验落在起点上的查找。
+    context = analysis_service.LuckContext(
+        forward=forward,
+        start_age_years=start_age_years,
+        month_index=17,
+        birth_dt=datetime(1988, 7, 14, 3, 30, tzinfo=CHINA_TZ),
+    )
+    monkeypatch.setattr(analysis_service, "_luck_context", lambda birth, birth_pillars: context)
+    return analysis_service._luck_timeline(None, None)
+
+
+def _probe_seconds(timeline) -> list[int]:
+    # 各步大运起点前后的整秒（含恰好落在起点的整秒），以及覆盖范围内外的随机秒数。
+    rng = random.Random(18)
+    probes = []
+    for offset in timeline.offsets:
+        base = floor(offset)
+        probes.extend(range(base - 2, base + 3))
+    span = 260 * 365 * 86400
+    probes.extend(rng.randrange(-span, span) for _ in range(2000))
+    return probes
+
+
+def _assert_lookup_matches_linear_formula(timeline) -> None:
+    context = timeline.context
+    assert list(timeline.offsets) == sorted(timeline.offsets)
+    birth_wall = context.birth_dt.replace(tzinfo=None)
+    probes = [
+        seconds
+        for seconds in _probe_seconds(timeline)
+        if datetime.min + timedelta(days=1) < birth_wall + timedelta(seconds=seconds) < datetime.max - timedelta(days=1)
+    ]
+    moments = [(birth_wall + timedelta(seconds=seconds)).replace(tzinfo=CHINA_TZ) for seconds in probes]
+    expected = [_linear_luck_index(context, moment) for moment in moments]
+
+    assert [timeline.index_at(moment) for moment in moments] == expected
+    wall_seconds = [timeline.birth_wall_seconds + seconds for seconds in probes]
+    assert timeline.indices_at(wall_seconds).tolist() == expected
+
+
+@pytest.mark.parametrize("birth", BIRTHS)
+def test_timeline_lookup_matches_linear_formula(birth):
+    _assert_lookup_matches_linear_formula(_timeline(birth))
+
+
+@pytest.mark.parametrize("start_age_years, forward", [(0.0, True), (3.0, False), (8.0, True)])
+def test_lookup_on_integral_period_starts(monkeypatch, start_age_years, forward):
+    timeline = _integral_start_timeline(monkeypatch, start_age_years, forward)
+    # 除法舍入使少数起点略大于整秒；起运年龄为 0 时第 0 步起点由 -0.0 的取整决定，落在 0 附近。
+    assert sum(offset == int(offset) for offset in timeline.offsets) >= 30
+    for cycles, offset in zip(analysis_service._LUCK_TIMELINE_CYCLES, timeline.offsets):
+        assert analysis_service._luck_cycle(timeline.context, offset) == cycles
+        assert analysis_service._luck_cycle(timeline.context, nextafter(offset, -inf)) == cycles - 1
+    _assert_lookup_matches_linear_formula(timeline)
+
+
+@pytest.mark.parametrize("birth", BIRTHS)
+def test_period_boundaries_are_exact(birth):
+    # 起点即新一步大运的第一刻，前一微秒仍属上一步。
+    timeline = _timeline(birth)
+    context = timeline.context
+    for offset in timeline.offsets:
+        start = context.birth_dt + timedelta(seconds=offset)
+        for moment in (start - timedelta(microseconds=1), start, start + timedelta(microseconds=1)):
+            assert timeline.index_at(moment) == _linear_luck_index(context, moment), moment
+    steps = [timeline.index_at(context.birth_dt + timedelta(seconds=offset + 1)) for offset in timeline.offsets]
+    direction = 1 if context.forward else -1
+    assert all((later - earlier) % 60 == direction % 60 for earlier, later in zip(steps, steps[1:]))
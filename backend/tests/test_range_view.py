@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+BIRTH = {"gender": "male", "calendar": "solar", "birth_date": "1990-01-01", "birth_time": "12:00:00"}
+LAST_YEAR_RANGES = [
+    ({"start": "9999-11-01", "end": "9999-12-31T23:00:00", "resolution": "month"}, ["9999-11", "9999-12"]),
+    ({"start": "9998-01-01", "end": "9999-12-31", "resolution": "year"}, ["9998", "9999"]),
+    (
+        {"start": "9999-12-31T20:00:00", "end": "9999-12-31T23:59:00", "resolution": "hour"},
+        ["9999-12-31 20:00", "9999-12-31 21:00", "9999-12-31 22:00", "9999-12-31 23:00"],
+    ),
+]
+
+
+@pytest.mark.parametrize("window, labels", LAST_YEAR_RANGES)
+def test_range_ending_in_year_9999(client, window, labels):
+    body = {"birth": BIRTH, "view": "range", **window}
+    response = client.post("/api/analysis/heatmap", json=body)
+    assert response.status_code == 200
+    assert [cell["label"] for cell in response.json()["cells"]] == labels
+
+    records = [json.loads(line) for line in client.post("/api/analysis/heatmap/stream", json=body).text.splitlines()]
+    assert records[-1] == {**records[-1], "type": "summary", "count": len(labels)}
+
+    series = client.post("/api/analysis/behavior/series", json={"birth": BIRTH, **window})
+    assert series.status_code == 200
+    assert len(series.json()["points"]) == len(labels)
+
+
+@pytest.mark.parametrize(
+    "window",
+    [
+        {"start": "9999-12-31T20:00:00+00:00", "end": "9999-12-31T23:59:00+00:00", "resolution": "hour"},
+        {"start": "0001-01-01T00:00:00+09:00", "end": "0001-01-02T00:00:00", "resolution": "hour"},
+    ],
+)
+@pytest.mark.parametrize("url", ["/api/analysis/heatmap", "/api/analysis/heatmap/stream", "/api/analysis/behavior/series"])
+def test_out_of_range_instants_are_rejected(client, url, window):
+    body = {"birth": BIRTH, **window} if url.endswith("series") else {"birth": BIRTH, "view": "range", **window}
+    response = client.post(url, json=body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "时间换算为北京时间后超出支持的日期范围（公元 1–9999 年）"
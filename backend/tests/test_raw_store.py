@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.engine.vectorized import ViewRawScores
+from app.models import HeatmapRequest
+from app.services import analysis_service
+from app.services.raw_store import _IN_QUERY_MAX_POINTS, RawCellStore
+
+BIRTH = {"gender": "female", "calendar": "solar", "birth_date": "1977-10-03", "birth_time": "05:45:00"}
+
+
+def _raw(count: int, seed: int) -> ViewRawScores:
+    rng = np.random.default_rng(seed)
+    return ViewRawScores(
+        long_base=rng.random(count),
+        short_component=rng.random(count),
+        ten_gods=rng.normal(size=(count, 10)),
+    )
+
+
+def _assert_same(left: ViewRawScores, right: ViewRawScores) -> None:
+    assert np.array_equal(left.long_base, right.long_base)
+    assert np.array_equal(left.short_component, right.short_component)
+    assert np.array_equal(left.ten_gods, right.ten_gods)
+
+
+@pytest.fixture
+def store(tmp_path):
+    # 后台线程间隔足够长，落盘只由测试显式触发。
+    raw_store = RawCellStore(tmp_path / "raw.db", max_bytes=1 << 30, flush_seconds=3600)
+    yield raw_store
+    raw_store.close()
+
+
+@pytest.mark.parametrize("count", [24, _IN_QUERY_MAX_POINTS + 100])
+def test_round_trip_preserves_view_order(store, count):
+    wall_seconds = [3600 * index for index in range(count)]
+    raw = _raw(count, count)
+    store.put_view("chart", wall_seconds, raw)
+    assert store.stats()["pending"] == count
+    store.flush()
+    assert store.stats()["pending"] == 0
+    _assert_same(store.get_view("chart", wall_seconds), raw)
+
+    # 读取顺序由调用方的 wall_seconds 决定。
+    reordered = wall_seconds[::-1]
+    stored = store.get_view("chart", reordered)
+    assert np.array_equal(stored.long_base, raw.long_base[::-1])
+    assert store.stats()["hits"] == 2
+
+
+def test_incomplete_view_is_a_miss(store):
+    store.put_view("chart", [0, 3600], _raw(2, 1))
+    store.flush()
+    assert store.get_view("chart", [0, 3600, 7200]) is None
+    assert store.get_view("other", [0, 3600]) is None
+    assert store.get_view("chart", []) is None
+    assert store.stats()["misses"] == 2
+    assert store.stats()["written"] == 2
+
+
+def test_only_missing_cells_are_written(store):
+    raw = _raw(4, 4)
+    store.put_view("chart", [0, 1, 2, 3], raw)
+    # 同一视图再次写入不入队。
+    store.put_view("chart", [0, 1, 2, 3], raw)
+    assert store.stats()["pending"] == 4
+    store.flush()
+    assert store.stats()["written"] == 4
+
+    # 与已存储视图重叠的视图只插入缺失的格子，已有的行保持原值。
+    overlapping = _raw(4, 5)
+    store.put_view("chart", [2, 3, 4, 5], overlapping)
+    store.flush()
+    assert store.stats()["written"] == 6
+    stored = store.get_view("chart", [0, 1, 2, 3, 4, 5])
+    assert np.array_equal(stored.long_base[:4], raw.long_base)
+    assert np.array_equal(stored.long_base[4:], overlapping.long_base[2:])
+
+
+def test_config_versions_are_isolated(tmp_path):
+    old = RawCellStore(tmp_path / "raw.db", max_bytes=1 << 30, flush_seconds=3600, config_version="old")
+    old.put_view("chart", [0], _raw(1, 1))
+    old.close()
+    new = RawCellStore(tmp_path / "raw.db", max_bytes=1 << 30, flush_seconds=3600, config_version="new")
+    assert new.get_view("chart", [0]) is None
+    new.close()
+
+
+def test_close_flushes_pending_rows(tmp_path):
+    raw = _raw(3, 2)
+    first = RawCellStore(tmp_path / "raw.db", max_bytes=1 << 30, flush_seconds=3600)
+    first.put_view("chart", [0, 1, 2], raw)
+    first.close()
+    reopened = RawCellStore(tmp_path / "raw.db", max_bytes=1 << 30, flush_seconds=3600)
+    _assert_same(reopened.get_view("chart", [0, 1, 2]), raw)
+    reopened.close()
+
+
+def test_prune_keeps_live_bytes_under_limit(tmp_path):
+    path = tmp_path / "raw.db"
+    stale = RawCellStore(path, max_bytes=1 << 30, flush_seconds=3600, config_version="stale")
+    stale.put_view("chart", list(range(500)), _raw(500, 3))
+    stale.close()
+
+    limit = 256 * 1024
+    store = RawCellStore(path, max_bytes=limit, flush_seconds=3600)
+    for chart in range(20):
+        store.put_view(f"chart-{chart}", list(range(200)), _raw(200, chart))
+        store.flush()
+    stats = store.stats()
+    assert stats["pruned"] > 0
+    assert store._live_bytes() <= limit
+    # 旧配置版本的行最先删除，最新写入的视图仍完整保留。
+    assert store._conn.execute("SELECT COUNT(*) FROM raw_cells WHERE config_version = 'stale'").fetchone()[0] == 0
+    assert store.get_view("chart-19", list(range(200))) is not None
+    # 淘汰后不再记得被删的视图，重新计算时会再次写入。
+    store.put_view("chart-0", list(range(200)), _raw(200, 0))
+    assert store.stats()["pending"] == 200
+    store.close()
+
+
+def test_service_reads_store_only_for_cold_small_views(store, monkeypatch):
+    small = HeatmapRequest(birth=BIRTH, view="hour", year=2025, month=3, day=9)
+    large = HeatmapRequest(birth=BIRTH, view="range", start="2025-01-01", end="2025-03-01", resolution="hour")
+    expected = analysis_service.compute_heatmap_payload(small)
+    monkeypatch.setattr(analysis_service, "raw_cell_store", lambda: store)
+
+    # 首次计算时命盘记录是新建的：查一次存储（未命中），然后计算并入队。
+    analysis_service.clear_natal_cache()
+    first = analysis_service.compute_heatmap_payload(small)
+    assert store.stats()["misses"] == 1
+    store.flush()
+
+    # 命盘矩阵已填充后直接重算，不再读存储。
+    analysis_service.compute_heatmap_payload(small)
+    assert store.stats()["hits"] + store.stats()["misses"] == 1
+
+    # 命盘缓存清空（相当于进程重启）后小视图从存储读回，结果与重算一致。
+    analysis_service.clear_natal_cache()
+    second = analysis_service.compute_heatmap_payload(small)
+    assert store.stats()["hits"] == 1
+    for payload in (first, second):
+        assert payload["cells"] == expected["cells"]
+
+    # 未存储的小视图读回未命中后计算并写入，供下次冷启动读回。
+    other = HeatmapRequest(birth=BIRTH, view="hour", year=2025, month=3, day=10)
+    analysis_service.compute_heatmap_payload(other)
+    assert store.stats()["misses"] == 2
+    assert store.stats()["pending"] == 24
+
+    # 超过 RAW_STORE_READ_MAX_POINTS 的视图即使命盘记录新建也直接重算，且不写入。
+    store.flush()
+    analysis_service.clear_natal_cache()
+    analysis_service.compute_heatmap_payload(large)
+    assert store.stats()["hits"] + store.stats()["misses"] == 3
+    assert store.stats()["pending"] == 0
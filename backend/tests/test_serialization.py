@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+
+import pydantic_core
+import pytest
+from fastapi import Body, FastAPI
+from fastapi.testclient import TestClient
+
+from app import serialization
+from app.config import HEATMAP_BATCH_MAX_BIRTHS
+from app.models import (
+    BehaviorResponse,
+    BehaviorSeriesResponse,
+    HeatmapBatchResponse,
+    HeatmapColumnarResponse,
+    HeatmapResponse,
+    HeatmapTreeResponse,
+)
+from app.serialization import dumps_json
+from app.services import analysis_service
+
+BIRTH = {"gender": "female", "calendar": "lunar", "birth_date": "1985-08-09", "birth_time": "23:10:00"}
+OTHER_BIRTH = {"gender": "male", "calendar": "solar", "birth_date": "1999-02-04", "birth_time": "08:10:00"}
+INVALID_BIRTH = {**OTHER_BIRTH, "birth_date": "2101-01-01"}
+# 该命盘的 2031-12 日视图中“23日”的取值为 1.8526718058113102e-9（负指数写法）。
+SMALL_VALUE_BIRTH = {"gender": "male", "calendar": "solar", "birth_date": "1905-09-09", "birth_time": "22:37:04"}
+
+# orjson 与 pydantic-core 写法不同的浮点数（正指数），以及形似正指数的字符串。
+DIVERGENT_CONTENT = [
+    {"value": 1e16, "label": "流年"},
+    [1e16, 1.5e300, 1.2345678901234568e17],
+    {"label": "1e5 甲子"},
+]
+# 两者写法相同的内容：负指数、极小值与小数写法、非 ASCII 字符串。
+PLAIN_CONTENT = [
+    {"value": 1.8526718058113102e-09, "label": "23日"},
+    {"value": 1e-05, "scores": [0.0001, 0.00012, -7.5e-07, 3.2e-05]},
+    [-2.5e-300, 5e-324, 0.0, 1.0, -0.0, 0.5, 12345.678, 1e15, 2**53],
+    {"detail": "批量请求最多支持 200 条出生信息", "note": "0.00001 1e-5"},
+    {"value": 0.123456789, "label": "甲子", "ten_god_scores": [{"key": "bi_jian", "label": "比肩", "score": -100}]},
+    {"detail": "focus_datetime 需为 ISO 格式日期时间", "nested": {"empty": [], "none": None, "flag": True}},
+]
+
+
+def _stdlib_json(content) -> bytes:
+    # 与 starlette JSONResponse 的默认渲染相同（错误响应经此输出）。
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+@pytest.mark.parametrize("content", DIVERGENT_CONTENT + PLAIN_CONTENT)
+def test_dumps_json_matches_pydantic(content):
+    assert dumps_json(content) == pydantic_core.to_json(content)
+
+
+@pytest.mark.parametrize("content", DIVERGENT_CONTENT)
+def test_divergent_floats_use_fallback(content):
+    if serialization.orjson is None:
+        pytest.skip("orjson 未安装")
+    assert serialization._ORJSON_DIVERGENT.search(serialization.orjson.dumps(content)) is not None
+
+
+@pytest.mark.parametrize("content", PLAIN_CONTENT)
+def test_plain_content_stays_on_orjson(content):
+    if serialization.orjson is None:
+        pytest.skip("orjson 未安装")
+    rendered = serialization.orjson.dumps(content)
+    assert serialization._ORJSON_DIVERGENT.search(rendered) is None
+    assert rendered == pydantic_core.to_json(content)
+
+
+@pytest.mark.parametrize("content", DIVERGENT_CONTENT + PLAIN_CONTENT)
+def test_fallback_without_orjson(monkeypatch, content):
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert dumps_json(content) == pydantic_core.to_json(content)
+
+
+@lru_cache(maxsize=None)
+def _response_model_client(model) -> TestClient:
+    # 与改动前的路由相同：声明 response_model、返回模型实例，由 FastAPI 校验并序列化。
+    app = FastAPI()
+
+    @app.post("/", response_model=model)
+    def route(body: dict = Body(...)):
+        return model.model_validate(body)
+
+    return TestClient(app)
+
+
+def _pydantic_json(model, body: bytes) -> bytes:
+    response = _response_model_client(model).post("/", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 200
+    return response.content
+
+
+HEATMAP_CASES = [
+    {"view": "year", "year": 2026},
+    {"view": "month", "year": 2025},
+    {"view": "day", "year": 2024, "month": 2},
+    {"view": "hour", "year": 2024, "month": 2, "day": 4},
+    {"view": "range", "start": "2024-01-01T00:00:00", "end": "2024-03-01T00:00:00", "resolution": "hour"},
+    {"view": "range", "start": "2000-01-01", "end": "2030-01-01", "resolution": "month"},
+]
+
+
+@pytest.mark.parametrize("birth", [BIRTH, OTHER_BIRTH])
+@pytest.mark.parametrize("view", HEATMAP_CASES)
+@pytest.mark.parametrize("format", ["cells", "columnar"])
+def test_heatmap_bytes_match_pydantic(client, birth, view, format):
+    response = client.post("/api/analysis/heatmap", json={"birth": birth, **view, "format": format})
+    assert response.status_code == 200
+    model = HeatmapColumnarResponse if format == "columnar" else HeatmapResponse
+    assert response.content == _pydantic_json(model, response.content)
+
+
+def test_small_exponent_bytes_match_pydantic(client):
+    body = {"birth": SMALL_VALUE_BIRTH, "view": "day", "year": 2031, "month": 12}
+    response = client.post("/api/analysis/heatmap", json=body)
+    assert response.status_code == 200
+    cell = next(cell for cell in response.json()["cells"] if cell["label"] == "23日")
+    assert cell["value"] == 1.8526718058113102e-09
+    assert b'"value":1.8526718058113102e-9' in response.content
+    assert response.content == _pydantic_json(HeatmapResponse, response.content)
+
+
+def test_batch_bytes_match_pydantic(client, monkeypatch):
+    natal_context = analysis_service._natal_context
+
+    def failing_natal_context(birth):
+        # 条目级错误（中文信息）与正常条目混排。
+        if birth.birth_date.year == 2101:
+            raise ValueError("出生日期超出日历范围")
+        return natal_context(birth)
+
+    monkeypatch.setattr(analysis_service, "_natal_context", failing_natal_context)
+    body = {"births": [BIRTH, OTHER_BIRTH, INVALID_BIRTH], "view": "day", "year": 2024, "month": 5}
+    response = client.post("/api/analysis/heatmap/batch", json=body)
+    assert response.status_code == 200
+    assert response.json()["items"][2]["error"] == "出生日期超出日历范围"
+    assert response.content == _pydantic_json(HeatmapBatchResponse, response.content)
+
+
+def test_tree_bytes_match_pydantic(client):
+    body = {"birth": BIRTH, "view": "month", "depth": "day", "year": 2024}
+    response = client.post("/api/analysis/heatmap/tree", json=body)
+    assert response.status_code == 200
+    assert response.content == _pydantic_json(HeatmapTreeResponse, response.content)
+
+
+def test_behavior_bytes_match_pydantic(client):
+    response = client.post("/api/analysis/behavior", json={"birth": BIRTH, "focus_datetime": "2025-06-15T10:00:00"})
+    assert response.status_code == 200
+    assert response.content == _pydantic_json(BehaviorResponse, response.content)
+    body = {"birth": BIRTH, "start": "2025-01-01T00:00:00", "end": "2025-01-03T00:00:00", "resolution": "hour"}
+    response = client.post("/api/analysis/behavior/series", json=body)
+    assert response.status_code == 200
+    assert response.content == _pydantic_json(BehaviorSeriesResponse, response.content)
+
+
+def test_error_bodies_are_stdlib_json(client):
+    response = client.post("/api/analysis/behavior", json={"birth": BIRTH, "focus_datetime": "明天"})
+    assert response.status_code == 400
+    assert response.content == _stdlib_json({"detail": "focus_datetime 需为 ISO 格式日期时间"})
+    births = [BIRTH] * (HEATMAP_BATCH_MAX_BIRTHS + 1)
+    response = client.post("/api/analysis/heatmap/batch", json={"births": births, "view": "year", "year": 2026})
+    assert response.status_code == 400
+    assert response.content == _stdlib_json({"detail": f"批量请求最多支持 {HEATMAP_BATCH_MAX_BIRTHS} 条出生信息"})
+
+
+@pytest.mark.parametrize("view", HEATMAP_CASES[3:])
+def test_heatmap_bytes_without_orjson(client, monkeypatch, view):
+    expected = client.post("/api/analysis/heatmap", json={"birth": OTHER_BIRTH, **view}).content
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert client.post("/api/analysis/heatmap", json={"birth": OTHER_BIRTH, **view}).content == expected
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from app.services.cache import LRUCache
+from app.services.shared_cache import SharedMemoryCache, TieredCache, tiered_cache
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="共享缓存测试需要 fork")
+
+# 数据区远小于写入总量，读者复制记录时写者频繁绕回覆盖，用于检验撕裂读取。
+_REGION_BYTES = 64 * 1024
+_SLOTS = 64
+_KEYS = 200
+_OPS = 1500
+
+
+def _value(key: int, version: int, length: int) -> tuple:
+    # 值的每个字节都由键与版本决定，读到混合了两次写入的内容即可发现。
+    return key, version, bytes([(key * 31 + version) % 256]) * length
+
+
+def _consistent(key: int, value) -> bool:
+    value_key, version, payload = value
+    return value_key == key and payload == bytes([(key * 31 + version) % 256]) * len(payload)
+
+
+def _writer(cache: SharedMemoryCache, seed: int, results) -> None:
+    rng = random.Random(seed)
+    fds_before = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+    for version in range(_OPS):
+        key = rng.randrange(_KEYS)
+        cache.put(("key", key), _value(key, version, rng.randrange(64, 4096)))
+    # fork 后首次写入重新打开文件，继承的描述符应已关闭。
+    fds_after = len(os.listdir("/proc/self/fd")) if fds_before is not None else None
+    results.put(("writer", fds_before, fds_after))
+
+
+def _reader(cache: SharedMemoryCache, seed: int, results) -> None:
+    rng = random.Random(seed)
+    hits = torn = 0
+    for _ in range(_OPS * 2):
+        key = rng.randrange(_KEYS)
+        try:
+            value = cache.get(("key", key))
+        except Exception:
+            # 未被识别的撕裂记录通常无法反序列化。
+            torn += 1
+            continue
+        if value is not None:
+            hits += 1
+            torn += not _consistent(key, value)
+    results.put(("reader", hits, torn))
+
+
+def test_concurrent_writers_and_readers(tmp_path):
+    context = multiprocessing.get_context("fork")
+    cache = SharedMemoryCache(tmp_path / "shared.cache", _REGION_BYTES, _SLOTS)
+    results = context.Queue()
+    processes = [context.Process(target=_writer, args=(cache, seed, results)) for seed in range(3)]
+    processes += [context.Process(target=_reader, args=(cache, 100 + seed, results)) for seed in range(3)]
+    for process in processes:
+        process.start()
+    reports = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    writers = [report for report in reports if report[0] == "writer"]
+    readers = [report for report in reports if report[0] == "reader"]
+    for _, fds_before, fds_after in writers:
+        assert fds_before == fds_after
+    assert sum(hits for _, hits, _ in readers) > 0
+    assert sum(torn for _, _, torn in readers) == 0
+
+    # 父进程读到的也只会是某次完整写入。
+    for key in range(_KEYS):
+        value = cache.get(("key", key))
+        assert value is None or _consistent(key, value)
+    assert cache.stats()["bytes"] <= _REGION_BYTES
+    cache.close()
+
+
+def test_wraparound_evicts_oldest_records(tmp_path):
+    cache = SharedMemoryCache(tmp_path / "ring.cache", 4096, 64)
+    for key in range(10):
+        cache.put(key, bytes([key]) * 900)
+    # 每条记录约 900 余字节，4 KB 的数据区只容得下最近写入的 4 条；跨越末尾的记录从头写入。
+    survivors = [key for key in range(10) if cache.get(key) is not None]
+    assert survivors == [6, 7, 8, 9]
+    for key in survivors:
+        assert cache.get(key) == bytes([key]) * 900
+    stats = cache.stats()
+    assert stats["entries"] == 4
+    assert stats["bytes"] <= 4096
+    # 覆盖已失效的槽位不计为淘汰。
+    assert stats["evictions"] == 0
+    cache.close()
+
+
+def test_full_set_replaces_oldest_slot(tmp_path):
+    # 只有一组（4 路）槽位：第 5 个键替换组内最旧的记录。
+    cache = SharedMemoryCache(tmp_path / "set.cache", 1 << 16, 4)
+    for key in range(5):
+        cache.put(key, key)
+    assert cache.get(0) is None
+    assert [cache.get(key) for key in range(1, 5)] == [1, 2, 3, 4]
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+
+def test_ttl_clear_and_layout_change(tmp_path):
+    path = tmp_path / "ttl.cache"
+    cache = SharedMemoryCache(path, 1 << 16, 16, ttl_seconds=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+    cache.put("b", 2)
+    cache.clear()
+    assert cache.get("b") is None
+
+    # 容量变化时另建文件替换，仍映射旧文件的实例不受影响。
+    cache.put("c", 3)
+    resized = SharedMemoryCache(path, 1 << 17, 16)
+    assert resized.get("c") is None
+    assert cache.get("c") == 3
+    resized.close()
+    cache.close()
+
+
+def test_tiered_cache_backfills_local(tmp_path):
+    path = tmp_path / "tiered.cache"
+    first = tiered_cache(LRUCache(max_entries=8, max_bytes=8), str(path), 1 << 16, 16)
+    second = tiered_cache(LRUCache(max_entries=8, max_bytes=8), str(path), 1 << 16, 16)
+    assert isinstance(first, TieredCache)
+    first.put("view", {"cells": []})
+    assert second.get("view") == {"cells": []}
+    assert second.local.get("view") == {"cells": []}
+    assert tiered_cache(first.local, None, 1 << 16, 16) is first.local
+
+
+def test_counters_are_exact_under_threads(tmp_path):
+    cache = SharedMemoryCache(tmp_path / "threads.cache", 1 << 16, 64)
+    for key in range(0, 32, 2):
+        cache.put(key, key)
+
+    def lookups(seed: int) -> None:
+        rng = random.Random(seed)
+        for _ in range(2000):
+            cache.get(rng.randrange(32))
+
+    threads = [threading.Thread(target=lookups, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+    assert stats["hits"] > 0 and stats["misses"] > 0
+    cache.close()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.models import BehaviorRequest, HeatmapRequest
+from app.services import analysis_service
+
+# 各用例响应 JSON 的 SHA-256，由基线提交（86a81f0）的代码生成，用于确认性能改动未改变输出：
+#   cd <基线检出>/backend && PYTHONPATH=. python <本仓库>/backend/tests/test_snapshot.py 86a81f0
+# 评分逻辑有意变更时以 UPDATE_SNAPSHOTS=<说明> 重新运行本文件，由当前代码更新。
+SNAPSHOT_PATH = Path(__file__).parent / "fixtures" / "heatmap_snapshot.json"
+
+VIEWS = (
+    {"view": "year", "year": 2026},
+    {"view": "month", "year": 2027},
+    {"view": "day", "year": 2024, "month": 2},
+    {"view": "hour", "year": 2025, "month": 6, "day": 15},
+    # 立春交节当天，覆盖年柱、月柱在日内切换。
+    {"view": "hour", "year": 2024, "month": 2, "day": 4},
+)
+FOCUS_DATETIMES = ("2025-06-15T10:00:00", "2030-01-01T23:00:00")
+
+
+def _births() -> list[dict]:
+    rng = random.Random(7)
+    births = []
+    for index in range(12):
+        year, month, day = rng.randint(1950, 2010), rng.randint(1, 12), rng.randint(1, 28)
+        births.append(
+            {
+                "gender": rng.choice(["male", "female"]),
+                "calendar": "solar" if index % 4 else "lunar",
+                "birth_date": f"{year:04d}-{month:02d}-{day:02d}",
+                "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+            }
+        )
+    # 立春交节时刻与子时附近的出生时间。
+    births.append({"gender": "male", "calendar": "solar", "birth_date": "2024-02-04", "birth_time": "16:30:00"})
+    births.append({"gender": "female", "calendar": "solar", "birth_date": "1990-03-05", "birth_time": "23:30:00"})
+    return births
+
+
+def _birth_id(birth: dict) -> str:
+    return f"{birth['gender']}-{birth['calendar']}-{birth['birth_date']}T{birth['birth_time']}"
+
+
+def _digest(response) -> str:
+    # 只依赖 pydantic 模型导出，基线代码上同样可以计算。
+    canonical = json.dumps(json.loads(response.model_dump_json()), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _heatmap_digests() -> dict[str, str]:
+    # 不经响应缓存，切换引擎后重新计算；基线没有响应缓存，也没有 compute_heatmap_response。
+    compute = getattr(analysis_service, "compute_heatmap_response", analysis_service.build_heatmap_response)
+    digests = {}
+    for birth in _births():
+        for view in VIEWS:
+            key = "/".join([_birth_id(birth), *(str(value) for value in view.values())])
+            digests[key] = _digest(compute(HeatmapRequest(birth=birth, **view)))
+    return digests
+
+
+def _behavior_digests() -> dict[str, str]:
+    return {
+        f"{_birth_id(birth)}/behavior/{focus}": _digest(
+            analysis_service.build_behavior_response(BehaviorRequest(birth=birth, focus_datetime=focus))
+        )
+        for birth in _births()
+        for focus in FOCUS_DATETIMES
+    }
+
+
+def write_snapshot(generated_from: str) -> None:
+    payload = {"generated_from": generated_from, "heatmap": _heatmap_digests(), "behavior": _behavior_digests()}
+    SNAPSHOT_PATH.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+@pytest.fixture(scope="module")
+def snapshot() -> dict[str, dict[str, str]]:
+    if os.environ.get("UPDATE_SNAPSHOTS"):
+        write_snapshot(os.environ["UPDATE_SNAPSHOTS"])
+    return json.loads(SNAPSHOT_PATH.read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "reference"])
+def test_heatmap_matches_snapshot(snapshot, monkeypatch, engine):
+    monkeypatch.setattr(analysis_service, "HEATMAP_ENGINE", engine)
+    assert _heatmap_digests() == snapshot["heatmap"]
+
+
+def test_behavior_matches_snapshot(snapshot):
+    assert _behavior_digests() == snapshot["behavior"]
+
+
+if __name__ == "__main__":
+    write_snapshot(sys.argv[1])
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+BIRTH = {"gender": "female", "calendar": "solar", "birth_date": "1992-11-05", "birth_time": "07:30:00"}
+VIEW = {"view": "day", "year": 2025, "month": 4}
+
+
+def _records(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_stream_records(client):
+    response = client.post("/api/analysis/heatmap/stream", json={"birth": BIRTH, **VIEW})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = _records(response)
+    assert records[0]["type"] == "header"
+    assert records[0]["meta"]["normalization"] == "analytic"
+    assert records[-1]["type"] == "summary"
+    cells = [record for record in records if record["type"] == "cell"]
+    assert len(cells) == records[-1]["count"] == 30
+    flat = client.post("/api/analysis/heatmap", json={"birth": BIRTH, **VIEW}).json()
+    assert [cell["label"] for cell in cells] == [cell["label"] for cell in flat["cells"]]
+
+
+@pytest.mark.parametrize(
+    "option, message",
+    [
+        ({"format": "columnar"}, "format=columnar"),
+        ({"debug": True}, "debug"),
+        ({"normalization": "global"}, "normalization=global"),
+    ],
+)
+def test_unsupported_options_are_rejected(client, option, message):
+    response = client.post("/api/analysis/heatmap/stream", json={"birth": BIRTH, **VIEW, **option})
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
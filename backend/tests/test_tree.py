@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+BIRTH = {"gender": "female", "calendar": "lunar", "birth_date": "1985-08-09", "birth_time": "23:10:00"}
+NEXT_VIEW = {"year": "month", "month": "day", "day": "hour", "hour": None}
+
+
+def _flat(client, view: str, coordinates: dict) -> dict:
+    response = client.post("/api/analysis/heatmap", json={"birth": BIRTH, "view": view, **coordinates})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _assert_node_matches_flat(client, node: dict, coordinates: dict, depth: str) -> int:
+    # 每个节点与同坐标的平铺热力图逐格相同；子节点坐标取自父格子时间。
+    view = node["view"]
+    flat = _flat(client, view, coordinates)
+    assert node["next_view"] == NEXT_VIEW[view] == flat["next_view"]
+    assert node["cells"] == flat["cells"]
+    if view == depth:
+        assert node["children"] is None
+        return len(node["cells"])
+    assert len(node["children"]) == len(node["cells"])
+    leaves = 0
+    for cell, child in zip(node["cells"], node["children"]):
+        assert child["view"] == NEXT_VIEW[view]
+        moment = datetime.fromisoformat(cell["iso_datetime"])
+        leaves += _assert_node_matches_flat(client, child, {"year": moment.year, "month": moment.month, "day": moment.day}, depth)
+    return leaves
+
+
+@pytest.mark.parametrize(
+    "view, depth, coordinates, leaves",
+    [
+        ("year", "month", {"year": 2024}, None),
+        ("month", "day", {"year": 2024}, 366),
+        ("day", "hour", {"year": 2024, "month": 2}, 29 * 24),
+        ("hour", "hour", {"year": 2024, "month": 2, "day": 4}, 24),
+    ],
+)
+def test_tree_levels_match_flat_heatmaps(client, view, depth, coordinates, leaves):
+    response = client.post("/api/analysis/heatmap/tree", json={"birth": BIRTH, "view": view, "depth": depth, **coordinates})
+    assert response.status_code == 200
+    body = response.json()
+    flat = _flat(client, view, coordinates)
+    assert body["birth_pillars"] == flat["birth_pillars"]
+    assert body["meta"] == flat["meta"]
+    counted = _assert_node_matches_flat(client, body["root"], coordinates, depth)
+    if leaves is not None:
+        assert counted == leaves
+
+
+def test_tree_rejects_depth_above_view(client):
+    response = client.post("/api/analysis/heatmap/tree", json={"birth": BIRTH, "view": "day", "depth": "month", "year": 2024, "month": 1})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "depth 不能高于起始视图"
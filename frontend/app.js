@@ -6,6 +6,8 @@ const state = {
   month: null,
   day: null,
   birth: null,
+  // 时视图各格子的风险提示，进入时视图时一次性预取：iso 时间 -> { prompts, note }。
+  behaviorByIso: new Map(),
 };
 
 const viewLabels = {
@@ -22,6 +24,13 @@ const nextViewMap = {
   hour: null,
 };
 
+const viewCoordinates = {
+  year: ["year"],
+  month: ["year"],
+  day: ["year", "month"],
+  hour: ["year", "month", "day"],
+};
+
 const prevViewMap = {
   month: "year",
   day: "month",
@@ -132,6 +141,50 @@ function renderBirthPillars(pillars) {
   elements.birthPillars.textContent = `出生四柱：年 ${year} · 月 ${month} · 日 ${day} · 时 ${hour}`;
 }
 
+function pillarFromLabel(label) {
+  if (!label) {
+    return null;
+  }
+  return { stem: label[0], branch: label[1], label };
+}
+
+function cellsFromColumnar(data) {
+  const meta = data.meta ?? {};
+  const ganzhi = meta.ganzhi ?? [];
+  const tenGodKeys = meta.ten_god_keys ?? [];
+  const tenGodLabels = meta.ten_god_labels ?? {};
+  const pillarIndices = data.pillar_indices ?? {};
+  const layers = Object.keys(pillarIndices);
+  // 查找表中的柱对象只构造一次，各格共享引用。
+  const pillarTable = ganzhi.map(pillarFromLabel);
+  return (data.labels ?? []).map((label, i) => {
+    const scores = data.ten_god_scores?.[i] ?? [];
+    const pillars = {};
+    layers.forEach((layer) => {
+      pillars[layer] = pillarTable[pillarIndices[layer][i]] ?? null;
+    });
+    return {
+      label,
+      value: data.values[i],
+      iso_datetime: data.iso_datetimes[i],
+      ten_god_scores: tenGodKeys.map((key, j) => ({
+        key,
+        label: tenGodLabels[key] ?? key,
+        score: scores[j],
+      })),
+      pillars,
+    };
+  });
+}
+
+function heatmapCells(data) {
+  // 同时兼容逐格（cells）与列式（format=columnar）两种响应。
+  if (data.format === "columnar") {
+    return cellsFromColumnar(data);
+  }
+  return data.cells ?? [];
+}
+
 function renderHeatmap(cells, view) {
   elements.heatmapGrid.innerHTML = "";
   const keysByView = {
@@ -182,32 +235,49 @@ function heatColor(value) {
   return `hsl(${hue}, 70%, ${light}%)`;
 }
 
+function heatmapQuery() {
+  // 与后端 canonical_heatmap_query 规则一致：只带视图用到的坐标、省略默认值、按参数名排序，
+  // 同一视图总是得到同一 URL，便于浏览器与代理缓存复用。
+  const birth = state.birth;
+  const params = {
+    gender: birth.gender,
+    calendar: birth.calendar,
+    birth_date: birth.birth_date,
+    birth_time: birth.birth_time.length === 5 ? `${birth.birth_time}:00` : birth.birth_time,
+    view: state.view,
+    format: "columnar",
+  };
+  if (birth.calendar === "lunar" && birth.is_leap_month) {
+    params.is_leap_month = "true";
+  }
+  (viewCoordinates[state.view] ?? []).forEach((key) => {
+    if (state[key] !== null && state[key] !== undefined) {
+      params[key] = String(state[key]);
+    }
+  });
+  return new URLSearchParams(Object.keys(params).sort().map((key) => [key, params[key]])).toString();
+}
+
 async function fetchHeatmap() {
   if (!state.birth) {
     setStatus("请先填写出生信息并生成热力图。");
     return;
   }
   setStatus("计算中...");
-  const payload = {
-    birth: state.birth,
-    view: state.view,
-    year: state.year,
-    month: state.month,
-    day: state.day,
-  };
 
   try {
-    const response = await fetch(`${API_BASE}/api/analysis/heatmap`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(payload),
-    });
+    const response = await fetch(`${API_BASE}/api/analysis/heatmap?${heatmapQuery()}`);
     if (!response.ok) {
       const detail = await responseErrorDetail(response);
       throw new Error(detail);
     }
     const data = await response.json();
-    renderHeatmap(data.cells, data.view);
+    const cells = heatmapCells(data);
+    renderHeatmap(cells, data.view);
+    state.behaviorByIso = new Map();
+    if (data.view === "hour") {
+      prefetchBehaviorSeries(cells.map((cell) => cell.iso_datetime));
+    }
     renderBirthPillars(data.birth_pillars);
     if (elements.heatmapDefinition && data.definition) {
       elements.heatmapDefinition.textContent = data.definition;
@@ -223,11 +293,42 @@ async function fetchHeatmap() {
   }
 }
 
+async function prefetchBehaviorSeries(isoDatetimes) {
+  const birth = state.birth;
+  try {
+    const response = await fetch(`${API_BASE}/api/analysis/behavior/series`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ birth, focus_datetimes: isoDatetimes }),
+    });
+    if (!response.ok || state.birth !== birth) {
+      return;
+    }
+    const data = await response.json();
+    isoDatetimes.forEach((iso, index) => {
+      const point = data.points[index];
+      const prompts = Object.entries(data.labels).map(([key, label]) => ({
+        label,
+        risk_level: point.risk_levels[key],
+        relative_strength: point.relative_strengths[key],
+      }));
+      state.behaviorByIso.set(iso, { prompts, note: data.uncertainty_note });
+    });
+  } catch (err) {
+    // 预取失败时点击格子仍会逐个请求。
+  }
+}
+
 async function fetchBehavior(isoDatetime) {
   if (!state.birth) {
     resetBehavior("请先填写出生信息并生成热力图。");
     return;
   }
+  const cached = state.behaviorByIso.get(isoDatetime);
+  if (cached) {
+    renderBehavior(cached.prompts, cached.note);
+    return;
+  }
   resetBehavior("生成风险提示中...");
 
   try {
@@ -244,53 +345,57 @@ async function fetchBehavior(isoDatetime) {
       throw new Error(detail);
     }
     const data = await response.json();
-    elements.behaviorNote.textContent = data.uncertainty_note ?? "";
-    const humanMap = {
-      "资源获取结构": "资源/资金获取类",
-      "约束 / 责任结构": "规则/承诺/职责类",
-      "支持 / 缓冲结构": "学习/修复/准备类",
-      "输出 / 波动结构": "表达/产出/波动类",
-      "竞争 / 内耗结构": "竞争/对抗/消耗类",
-    };
-    const levelDetail = {
-      高: "结构波动更大，承载压力更高",
-      中: "结构波动与阻力中等",
-      低: "结构阻力较小，波动相对低",
-    };
-    const groups = {
-      low: { title: "宜（风险暴露较低）", items: [] },
-      mid: { title: "慎（风险暴露中等）", items: [] },
-      high: { title: "忌（风险暴露较高）", items: [] },
-    };
-    data.prompts.forEach((prompt) => {
-      const label = humanMap[prompt.label] ?? prompt.label;
-      const level = prompt.risk_level;
-      const percent = Number.isFinite(prompt.relative_strength)
-        ? ` · 相对占比 ${Math.round(prompt.relative_strength * 100)}%`
-        : "";
-      const detail = levelDetail[level] ?? `风险暴露${level}`;
-      const line = `${label}：${detail}${percent}`;
-      if (level === "高") {
-        groups.high.items.push(line);
-      } else if (level === "中") {
-        groups.mid.items.push(line);
-      } else {
-        groups.low.items.push(line);
-      }
-    });
-    elements.behaviorList.innerHTML = Object.values(groups)
-      .map((group) => {
-        const items = group.items.length
-          ? group.items.map((item) => `<div class="behavior-line">${item}</div>`).join("")
-          : '<div class="behavior-empty">暂无</div>';
-        return `<li class="behavior-group"><div class="behavior-group-title">${group.title}</div>${items}</li>`;
-      })
-      .join("");
+    renderBehavior(data.prompts, data.uncertainty_note);
   } catch (err) {
     resetBehavior(err?.message || "后端未连接，无法生成风险提示。");
   }
 }
 
+function renderBehavior(prompts, note) {
+  elements.behaviorNote.textContent = note ?? "";
+  const humanMap = {
+    "资源获取结构": "资源/资金获取类",
+    "约束 / 责任结构": "规则/承诺/职责类",
+    "支持 / 缓冲结构": "学习/修复/准备类",
+    "输出 / 波动结构": "表达/产出/波动类",
+    "竞争 / 内耗结构": "竞争/对抗/消耗类",
+  };
+  const levelDetail = {
+    高: "结构波动更大，承载压力更高",
+    中: "结构波动与阻力中等",
+    低: "结构阻力较小，波动相对低",
+  };
+  const groups = {
+    low: { title: "宜（风险暴露较低）", items: [] },
+    mid: { title: "慎（风险暴露中等）", items: [] },
+    high: { title: "忌（风险暴露较高）", items: [] },
+  };
+  prompts.forEach((prompt) => {
+    const label = humanMap[prompt.label] ?? prompt.label;
+    const level = prompt.risk_level;
+    const percent = Number.isFinite(prompt.relative_strength)
+      ? ` · 相对占比 ${Math.round(prompt.relative_strength * 100)}%`
+      : "";
+    const detail = levelDetail[level] ?? `风险暴露${level}`;
+    const line = `${label}：${detail}${percent}`;
+    if (level === "高") {
+      groups.high.items.push(line);
+    } else if (level === "中") {
+      groups.mid.items.push(line);
+    } else {
+      groups.low.items.push(line);
+    }
+  });
+  elements.behaviorList.innerHTML = Object.values(groups)
+    .map((group) => {
+      const items = group.items.length
+        ? group.items.map((item) => `<div class="behavior-line">${item}</div>`).join("")
+        : '<div class="behavior-empty">暂无</div>';
+      return `<li class="behavior-group"><div class="behavior-group-title">${group.title}</div>${items}</li>`;
+    })
+    .join("");
+}
+
 function onCellClick(cell, currentView) {
   const nextView = nextViewMap[currentView];
   const parsed = parseChinaIso(cell.iso_datetime);